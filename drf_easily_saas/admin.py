@@ -7,7 +7,12 @@ from .models import (
     StripePlanModel,
     StripeProductModel,
     StripeSubscriptionModel,
-    StripeSetupIntentModel
+    StripeSubscriptionItemModel,
+    StripeSetupIntentModel,
+    StripeSyncStateModel,
+    StripeWebhookInboxModel,
+    StripeProcessedEventModel,
+    StripeMirrorTombstoneModel,
 )
 
 # Firebase
@@ -25,4 +30,9 @@ admin.site.register(StripeInvoiceModel)
 admin.site.register(StripePlanModel)
 admin.site.register(StripeProductModel)
 admin.site.register(StripeSubscriptionModel)
-admin.site.register(StripeSetupIntentModel)
\ No newline at end of file
+admin.site.register(StripeSubscriptionItemModel)
+admin.site.register(StripeSetupIntentModel)
+admin.site.register(StripeSyncStateModel)
+admin.site.register(StripeWebhookInboxModel)
+admin.site.register(StripeProcessedEventModel)
+admin.site.register(StripeMirrorTombstoneModel)
\ No newline at end of file
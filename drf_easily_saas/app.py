@@ -1,12 +1,12 @@
-from django.apps import AppConfig
-from django.conf import settings
-from drf_easily_saas.schemas.config import validate_settings
-
-# -------------------------------------------- #
-    
-class DrfEasilyAuthConfig(AppConfig):
-    default_auto_field = "django.db.models.BigAutoField"
-    name = "drf_easily_saas"
-
-    def ready(self):
-        validate_settings(settings.EASILY)
+from django.apps import AppConfig
+from drf_easily_saas.settings import get_easily_config
+
+# -------------------------------------------- #
+    
+class DrfEasilyAuthConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "drf_easily_saas"
+
+    def ready(self):
+        # Fail fast on invalid settings: validated once per process, without initialising the providers
+        get_easily_config()
@@ -0,0 +1,53 @@
+import time
+import hashlib
+from typing import Any, Dict, Union
+
+# From package
+from drf_easily_saas.utils.cache import LRUCache
+
+
+# ---------------------------------------- TOKEN CACHE ---------------------------------------- #
+class TokenCache:
+    """
+    Cache of decoded (already verified) tokens keyed by a SHA-256 hash of the raw token.
+
+    An entry lives at most `revocation_check_interval` seconds, after which the token
+    is verified again against the provider (revocation check included). An entry never
+    outlives the `exp` claim of its token.
+
+    Args:
+    - max_size (int): Maximum number of tokens kept in memory
+    - revocation_check_interval (int): Seconds between two revocation checks of a token (0 disables the cache)
+    """
+    def __init__(self, max_size: int = 1024, revocation_check_interval: int = 300):
+        self.revocation_check_interval = revocation_check_interval
+        self._cache = LRUCache(max_size=max_size if revocation_check_interval > 0 else 0)
+
+    @staticmethod
+    def hash_token(token: str) -> str:
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+    def get(self, token: str) -> Union[Dict[str, Any], None]:
+        return self._cache.get(self.hash_token(token))
+
+    def set(self, token: str, decoded_token: Dict[str, Any]) -> None:
+        ttl = self.revocation_check_interval
+        exp = decoded_token.get('exp')
+        if exp is not None:
+            # Never keep a token after its expiration
+            ttl = min(ttl, exp - time.time())
+        if ttl <= 0:
+            return
+        self._cache.set(self.hash_token(token), decoded_token, ttl=ttl)
+
+    def invalidate_uid(self, uid: str) -> int:
+        """
+        Drop every cached token of a user (e.g. after its refresh tokens were revoked).
+        """
+        return self._cache.delete_where(lambda decoded: decoded.get('uid', decoded.get('sub')) == uid)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        return self._cache.stats()
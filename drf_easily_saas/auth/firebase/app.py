@@ -0,0 +1,46 @@
+import threading
+import firebase_admin
+from firebase_admin import credentials
+from asgiref.sync import sync_to_async
+
+# From package
+from drf_easily_saas import settings as easily_settings
+from drf_easily_saas.exceptions.firebase import InvalidFirebaseConfigurationError
+
+# ---------------------------------------- FIREBASE APP ---------------------------------------- #
+_firebase_app = None
+_firebase_app_lock = threading.Lock()
+
+def ensure_firebase_app() -> firebase_admin.App:
+    """
+    Return the default Firebase app, initialised on first use, once per process.
+
+    Only the app is initialised: the user import requested by the settings runs from
+    `syncfirebaseusers --if-configured`, never on the request path.
+    An app initialised by the project itself is used as is.
+    """
+    global _firebase_app
+    if _firebase_app is not None:
+        return _firebase_app
+
+    with _firebase_app_lock:
+        if _firebase_app is not None:
+            return _firebase_app
+        firebase_config = easily_settings.FIREBASE_CONFIG
+        if firebase_config is None:
+            raise InvalidFirebaseConfigurationError("Firebase config is required")
+        try:
+            app = firebase_admin.get_app()
+        except ValueError:
+            app = firebase_admin.initialize_app(credentials.Certificate(firebase_config.config))
+        _firebase_app = app
+    return app
+
+
+async def aensure_firebase_app() -> firebase_admin.App:
+    """
+    Async `ensure_firebase_app`: the first call runs it in a worker thread (it may read the config file).
+    """
+    if _firebase_app is not None:
+        return _firebase_app
+    return await sync_to_async(ensure_firebase_app)()
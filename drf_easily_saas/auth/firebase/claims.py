@@ -0,0 +1,191 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Union
+from firebase_admin import auth
+
+# Django
+from django.core.cache import caches
+
+# From package
+from drf_easily_saas import settings as easily_settings
+from drf_easily_saas.auth.firebase.app import ensure_firebase_app
+from drf_easily_saas.auth.firebase.protect import get_token_cache
+
+logger = logging.getLogger(__name__)
+
+# -------------------------------------------- #
+# Constants
+# -------------------------------------------- #
+CLAIMS_CACHE_PREFIX = 'drf_easily_saas:claims:'
+
+
+# -------------------------------------------- #
+# Claims coalescer
+# -------------------------------------------- #
+class _PendingWrite:
+    """
+    Claims of a uid waiting for the end of its debounce window.
+    """
+    def __init__(self, claims: Dict[str, Any]):
+        self.claims = claims
+        self.done = threading.Event()
+        self.written = False
+        self.error: Union[Exception, None] = None
+
+
+class ClaimsCoalescer:
+    """
+    Write the Firebase custom claims of users, coalescing the updates of a user.
+
+    The first update of a uid opens a debounce window: the updates of the same uid
+    submitted by other events during the window replace its claims, and only the last
+    ones are written when it closes. Every submitter waits for that write and gets its
+    error, so a failed write fails each of the coalesced events and they are delivered
+    again. Inside `batch()` (one Stripe event) the updates are kept until the block
+    ends, nothing is submitted when it raises.
+
+    The claims written are kept in a shared Django cache for a short time: identical
+    claims are not written again, without reading them back from Firebase. Every worker
+    sets the cache after its writes, so a change made by another worker is not skipped.
+    A write is `set_custom_user_claims` followed by `revoke_refresh_tokens`.
+
+    Args:
+    - window (float): Seconds the updates of a uid are coalesced (0 writes at once)
+    - cache_alias (str): Django cache alias holding the last written claims
+    - cache_ttl (int): Seconds the last written claims of a uid are remembered (0 disables the skip)
+    """
+    def __init__(self, window: float = 0.5, cache_alias: str = 'default', cache_ttl: int = 300):
+        self.window = window
+        self.cache_alias = cache_alias
+        self.cache_ttl = cache_ttl
+        self._local = threading.local()
+        self._pending: Dict[str, _PendingWrite] = {}
+        self._lock = threading.Lock()
+        self.writes = 0
+        self.skipped = 0
+        self.coalesced = 0
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    @staticmethod
+    def make_key(uid: str) -> str:
+        return f'{CLAIMS_CACHE_PREFIX}{uid}'
+
+    @contextmanager
+    def batch(self):
+        """
+        Keep the updates submitted by this thread until the block ends, then submit them.
+
+        Nested batches join the outer one. Nothing is submitted when the block raises.
+        """
+        if getattr(self._local, 'pending', None) is not None:
+            yield
+            return
+        self._local.pending = {}
+        try:
+            yield
+            pending = self._local.pending
+        finally:
+            self._local.pending = None
+        for uid, claims in pending.items():
+            self.submit(uid, claims)
+
+    def submit(self, uid: str, claims: Dict[str, Any]) -> bool:
+        """
+        Write the claims of a uid once its debounce window closes, or at the end of the current batch.
+
+        Returns False when the claims were not written now (kept for the batch, or already written).
+        Errors of the Admin SDK are raised.
+        """
+        pending = getattr(self._local, 'pending', None)
+        if pending is not None:
+            if uid in pending:
+                with self._lock:
+                    self.coalesced += 1
+            pending[uid] = claims
+            return False
+
+        with self._lock:
+            pending_write = self._pending.get(uid)
+            leader = pending_write is None
+            if leader:
+                pending_write = self._pending[uid] = _PendingWrite(claims)
+            else:
+                pending_write.claims = claims
+                self.coalesced += 1
+
+        if leader:
+            if self.window > 0:
+                time.sleep(self.window)
+            with self._lock:
+                # Later updates open a new window
+                del self._pending[uid]
+            try:
+                pending_write.written = self.write(uid, pending_write.claims)
+            except Exception as e:
+                pending_write.error = e
+            finally:
+                pending_write.done.set()
+        else:
+            pending_write.done.wait()
+
+        if pending_write.error is not None:
+            raise pending_write.error
+        return pending_write.written
+
+    def write(self, uid: str, claims: Dict[str, Any]) -> bool:
+        """
+        Write the claims of a uid now, return False when they were the last written.
+
+        Errors of the Admin SDK are raised.
+        """
+        if self.cache_ttl and self.cache.get(self.make_key(uid)) == claims:
+            with self._lock:
+                self.skipped += 1
+            return False
+
+        app = ensure_firebase_app()
+        auth.set_custom_user_claims(uid, claims, app=app)
+        # Force a new token so the claims are taken into account quickly:
+        # the user is signed out of every session
+        auth.revoke_refresh_tokens(uid, app=app)
+
+        # Cached tokens must not survive the revocation
+        get_token_cache().invalidate_uid(uid)
+        if self.cache_ttl:
+            self.cache.set(self.make_key(uid), claims, self.cache_ttl)
+        with self._lock:
+            self.writes += 1
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'pending': len(self._pending),
+            'writes': self.writes,
+            'skipped': self.skipped,
+            'coalesced': self.coalesced,
+        }
+
+
+_claims_coalescer = None
+_claims_coalescer_lock = threading.Lock()
+
+def get_claims_coalescer() -> ClaimsCoalescer:
+    """
+    Return the process-wide claims coalescer built from the Firebase settings.
+    """
+    global _claims_coalescer
+    if _claims_coalescer is None:
+        with _claims_coalescer_lock:
+            if _claims_coalescer is None:
+                firebase_config = easily_settings.FIREBASE_CONFIG
+                _claims_coalescer = ClaimsCoalescer() if firebase_config is None else ClaimsCoalescer(
+                    window=firebase_config.claims_debounce_window,
+                    cache_alias=firebase_config.claims_cache_alias,
+                    cache_ttl=firebase_config.claims_cache_ttl,
+                )
+    return _claims_coalescer
@@ -1,15 +1,41 @@
+import jwt
 from firebase_admin import auth
-from typing import List, Union
+from asgiref.sync import async_to_sync
+from typing import Callable, Iterator, List, Tuple, Union
 
 # Django
 from rest_framework import authentication
 from rest_framework import exceptions
-from django.conf import settings as dj_settings
 from django.contrib.auth.models import User
 
 # From package
+from drf_easily_saas import settings as easily_settings
 from drf_easily_saas.models import FirebaseUserInformations
 from drf_easily_saas.schemas.claims import ClaimsPayment
+from drf_easily_saas.auth.users import aget_or_create_user, get_or_create_user
+from drf_easily_saas.auth.sync import DEFAULT_SYNC_BATCH_SIZE, ProviderUser, sync_users
+from drf_easily_saas.auth.cache import TokenCache
+from drf_easily_saas.auth.firebase.app import aensure_firebase_app, ensure_firebase_app
+from drf_easily_saas.auth.firebase.verifier import get_token_verifier
+from drf_easily_saas.exceptions.firebase import InvalidFirebaseConfigurationError
+
+# ---------------------------------------- TOKEN CACHE ---------------------------------------- #
+_token_cache = None
+
+def get_token_cache() -> TokenCache:
+    """
+    Return the process-wide cache of verified Firebase tokens.
+    """
+    global _token_cache
+    if _token_cache is None:
+        firebase_config = easily_settings.FIREBASE_CONFIG
+        if firebase_config is None:
+            raise InvalidFirebaseConfigurationError('Firebase configuration not found.')
+        _token_cache = TokenCache(
+            max_size=firebase_config.token_cache_size,
+            revocation_check_interval=firebase_config.revocation_check_interval,
+        )
+    return _token_cache
 
 # ---------------------------------------- AUTHENTICATION ---------------------------------------- #
 class FirebaseAuthentication(authentication.BaseAuthentication):
@@ -22,7 +48,11 @@ class FirebaseAuthentication(authentication.BaseAuthentication):
         # Get token from any scheme (Bearer, JWT, etc.)
         token = auth_header.split(' ').pop()
         try:
-            decoded_token = auth.verify_id_token(token, check_revoked=True)
+            token_cache = get_token_cache()
+            decoded_token = token_cache.get(token)
+            if decoded_token is None:
+                decoded_token = auth.verify_id_token(token, check_revoked=True, app=ensure_firebase_app())
+                token_cache.set(token, decoded_token)
 
             # Extract user data
             uid = decoded_token['uid']
@@ -39,74 +69,100 @@ class FirebaseAuthentication(authentication.BaseAuthentication):
         except Exception as e:
             raise exceptions.AuthenticationFailed({'error': 'Could not authenticate.'})
 
-        user, created = User.objects.get_or_create(username=uid, email=email)
-        if created:
-            # Disable user password
-            user.set_unusable_password()
-            user.save()
-
-            # Firebase user informations (aud, email_verified, sign_in_provider)
-            firebase_user = FirebaseUserInformations.objects.create(
-                user=user,
-                email_verified=email_verified,
-                sign_in_provider=provider
-            )
-        return user, None
+        user = get_or_create_user(
+            uid,
+            email,
+            FirebaseUserInformations,
+            email_verified=email_verified,
+            sign_in_provider=provider
+        )
+        return user, decoded_token
+
+
+class AsyncFirebaseAuthentication(authentication.BaseAuthentication):
+    """
+    Firebase authentication for ASGI deployments.
+
+    `aauthenticate` verifies the token locally against certificates fetched with async
+    HTTP, checks its revocation once per `revocation_check_interval` and gets the user
+    with the async ORM. Async views and middlewares await it, sync views go through
+    `authenticate`, which runs it on the event loop.
+    """
+    def authenticate(self, request):
+        return async_to_sync(self.aauthenticate)(request)
+
+    async def aauthenticate(self, request):
+        auth_header = request.headers.get('Authorization')
+
+        if not auth_header:
+            return None
+
+        # Get token from any scheme (Bearer, JWT, etc.)
+        token = auth_header.split(' ').pop()
+        try:
+            token_cache = get_token_cache()
+            decoded_token = token_cache.get(token)
+            if decoded_token is None:
+                await aensure_firebase_app()
+                verifier = get_token_verifier()
+                decoded_token = await verifier.averify(token)
+                await verifier.acheck_revoked(decoded_token)
+                token_cache.set(token, decoded_token)
+
+            # Extract user data
+            uid = decoded_token['uid']
+            email = decoded_token['email']
+            email_verified = decoded_token['email_verified']
+            provider = decoded_token['firebase']['sign_in_provider']
+
+        except jwt.ExpiredSignatureError:
+            raise exceptions.AuthenticationFailed({'error': 'Expired authentication token.'})
+        except jwt.InvalidTokenError:
+            raise exceptions.AuthenticationFailed({'error': 'Invalid authentication token.'})
+        except auth.RevokedIdTokenError:
+            raise exceptions.AuthenticationFailed({'error': 'Revoked authentication token.'})
+        except Exception as e:
+            raise exceptions.AuthenticationFailed({'error': 'Could not authenticate.'})
+
+        user = await aget_or_create_user(
+            uid,
+            email,
+            FirebaseUserInformations,
+            email_verified=email_verified,
+            sign_in_provider=provider
+        )
+        return user, decoded_token
 
 # ---------------------------------------- FIREBASE UTILS ---------------------------------------- #
 
-def import_users() -> List[User]:
+def iter_firebase_users(page_size: int = 1000) -> Iterator[ProviderUser]:
     """
-    Import users from Firebase and sync with Django's User model.
+    Page through Firebase users once, yielding them as they come.
     """
-    new_users = False
-    deleted_users = False 
-
-    firebase_users = auth.list_users().iterate_all()
-    django_users = User.objects.all()
-
-    print("#"*100)
-    print("Firebase syncing users...")
-    for firebase_user in firebase_users:
-        if not firebase_user.email:
-            user, created = User.objects.get_or_create(username=firebase_user.uid)
-        else:
-            user, created = User.objects.get_or_create(username=firebase_user.uid, email=firebase_user.email)
-
-        if created:
-            new_users = True
-            user.set_unusable_password()
-            
-            user.save()
-
-            FirebaseUserInformations.objects.create(
-                user=user,
+    page = auth.list_users(max_results=page_size, app=ensure_firebase_app())
+    while page:
+        for firebase_user in page.users:
+            yield ProviderUser(
+                uid=firebase_user.uid,
+                email=firebase_user.email or '',
                 email_verified=firebase_user.email_verified,
-                sign_in_provider=firebase_user.provider_id
+                sign_in_provider=firebase_user.provider_id,
             )
-            # Message for each user
-            print(f'User sync > ID: {user.username} > Email: {user.email} > Created: {created}')
+        page = page.get_next_page()
 
-    # Delete users that are not in Firebase
-    for django_user in django_users:
-        try:
-            auth.get_user(django_user.username)
-        except auth.UserNotFoundError:
-            deleted_users = True    
-            django_user.delete()
-            print(f'User sync > ID: {django_user.username} > Deleted: True')
-
-    nbr_firebase_users = len([user for user in auth.list_users().iterate_all()])
-    nbr_django_users = len([user for user in User.objects.all()])
-
-    if nbr_django_users == nbr_firebase_users:
-        print("User sync > Synced successfully")
-        print(f'User sync > Total Django users: {nbr_django_users} > Total Firebase users: {nbr_firebase_users}')
-    else:
-        print("User sync > Sync failed")
-        print(f'User sync > Total Django users: {nbr_django_users} > Total Firebase users: {nbr_firebase_users}')
-    
-    print("#"*100)
-    print()
+
+def import_users(batch_size: int = DEFAULT_SYNC_BATCH_SIZE, log: Callable[[str], None] = print) -> Tuple[bool, bool]:
+    """
+    Import users from Firebase and sync with Django's User model.
+    """
+    log("#"*100)
+    new_users, deleted_users = sync_users(
+        iter_firebase_users(),
+        FirebaseUserInformations,
+        label="Firebase",
+        batch_size=batch_size,
+        log=log,
+    )
+    log("#"*100)
+    log("")
     return new_users, deleted_users
-    
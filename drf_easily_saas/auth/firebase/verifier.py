@@ -0,0 +1,94 @@
+import time
+import jwt
+from firebase_admin import auth
+from asgiref.sync import sync_to_async
+from typing import Any, Dict
+
+# From package
+from drf_easily_saas.auth.firebase.app import ensure_firebase_app
+from drf_easily_saas.auth.keys import AsyncKeySet, parse_x509_certificates
+from drf_easily_saas.exceptions.firebase import InvalidFirebaseConfigurationError
+
+# ---------------------------------------- CONSTANTS ---------------------------------------- #
+FIREBASE_CERTS_URL = 'https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com'
+FIREBASE_ISSUER = 'https://securetoken.google.com/'
+FIREBASE_ALGORITHM = 'RS256'
+FIREBASE_CERTS_REFRESH_INTERVAL = 3600
+
+
+# ---------------------------------------- VERIFIER ---------------------------------------- #
+class FirebaseTokenVerifier:
+    """
+    Verify Firebase ID tokens without blocking the event loop.
+
+    The signature, audience, issuer and dates are checked locally against the Google
+    public certificates, fetched with async HTTP and refreshed in the background
+    (following their `Cache-Control` max-age). Claims are returned as
+    `auth.verify_id_token` returns them (`uid` included).
+
+    Args:
+    - project_id (str): Firebase project ID
+    - certs_refresh_interval (int): Seconds the certificates are used when the response has no max-age
+    """
+    def __init__(self, project_id: str, certs_refresh_interval: int = FIREBASE_CERTS_REFRESH_INTERVAL):
+        self.project_id = project_id
+        self.issuer = FIREBASE_ISSUER + project_id
+        self.certs = AsyncKeySet(
+            FIREBASE_CERTS_URL,
+            parse=parse_x509_certificates,
+            refresh_interval=certs_refresh_interval,
+        )
+
+    async def averify(self, token: str) -> Dict[str, Any]:
+        """
+        Verify the signature, expiration, audience and issuer of an ID token and return its claims.
+        """
+        header = jwt.get_unverified_header(token)
+        if header.get('alg') != FIREBASE_ALGORITHM:
+            raise jwt.InvalidAlgorithmError(f"Algorithm {header.get('alg')} is not allowed")
+        key = await self.certs.get(header.get('kid'))
+        if key is None:
+            raise jwt.InvalidTokenError('Unknown Firebase signing key')
+
+        decoded_token = jwt.decode(
+            token,
+            key,
+            algorithms=[FIREBASE_ALGORITHM],
+            audience=self.project_id,
+            issuer=self.issuer,
+            options={'require': ['exp', 'iat', 'sub', 'auth_time']},
+        )
+        if not decoded_token['sub'] or len(decoded_token['sub']) > 128:
+            raise jwt.InvalidTokenError('Invalid Firebase ID token subject')
+        if decoded_token['auth_time'] > time.time():
+            raise jwt.ImmatureSignatureError('Firebase ID token authenticated in the future')
+        decoded_token['uid'] = decoded_token['sub']
+        return decoded_token
+
+    async def acheck_revoked(self, decoded_token: Dict[str, Any]) -> None:
+        """
+        Raise when the user is disabled or its tokens were revoked after this one was issued.
+
+        The Admin SDK only has a blocking client: the user is read in a worker thread,
+        callers should only check a token once in a while (see `TokenCache`).
+        """
+        user = await sync_to_async(auth.get_user, thread_sensitive=False)(decoded_token['uid'])
+        if user.disabled:
+            raise auth.UserDisabledError('The user record is disabled.')
+        if decoded_token['iat'] * 1000 < (user.tokens_valid_after_timestamp or 0):
+            raise auth.RevokedIdTokenError('The Firebase ID token has been revoked.')
+
+
+_verifier = None
+
+def get_token_verifier() -> FirebaseTokenVerifier:
+    """
+    Return the process-wide Firebase token verifier of the default Firebase app.
+    """
+    global _verifier
+    if _verifier is None:
+        project_id = ensure_firebase_app().project_id
+        if not project_id:
+            raise InvalidFirebaseConfigurationError('Firebase project id is not configured.')
+        _verifier = FirebaseTokenVerifier(project_id)
+    return _verifier
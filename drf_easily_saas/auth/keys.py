@@ -0,0 +1,140 @@
+import re
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Union
+
+import httpx
+import jwt
+from cryptography.x509 import load_pem_x509_certificate
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------- CONSTANTS ---------------------------------------- #
+KEYS_FETCH_TIMEOUT = 10
+# Minimum seconds between two fetches triggered by an unknown key id
+KEYS_MIN_REFRESH_INTERVAL = 30
+MAX_AGE_PATTERN = re.compile(r'max-age=(\d+)')
+
+
+# ---------------------------------------- PARSERS ---------------------------------------- #
+def parse_jwks(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Public keys of a JWKS document by key id (keys that cannot be used are skipped).
+    """
+    keys = {}
+    for jwk in data.get('keys', []):
+        try:
+            keys[jwk.get('kid')] = jwt.PyJWK(jwk).key
+        except jwt.PyJWKError:
+            continue
+    return keys
+
+
+def parse_x509_certificates(data: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Public keys of a {key id: PEM certificate} document (Google service accounts).
+    """
+    return {kid: load_pem_x509_certificate(pem.encode('utf-8')).public_key() for kid, pem in data.items()}
+
+
+# ---------------------------------------- REFRESH LOOP ---------------------------------------- #
+_refresh_loop = None
+_refresh_loop_lock = threading.Lock()
+
+def get_refresh_loop() -> asyncio.AbstractEventLoop:
+    """
+    Return the process-wide event loop running the key fetches, started on first use.
+
+    The sync authentications run on a new event loop closed after each request
+    (`async_to_sync`), a refresh scheduled on it would be cancelled with it.
+    """
+    global _refresh_loop
+    if _refresh_loop is None:
+        with _refresh_loop_lock:
+            if _refresh_loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='drf-easily-saas-keys', daemon=True).start()
+                _refresh_loop = loop
+    return _refresh_loop
+
+
+# ---------------------------------------- ASYNC KEY SET ---------------------------------------- #
+class AsyncKeySet:
+    """
+    Public signing keys fetched with async HTTP and refreshed in the background.
+
+    The keys are fetched on first use. Once they are older than the `max-age` of the
+    response (or `refresh_interval` without one), the current keys keep being served
+    while a refresh runs in the background. An unknown key id triggers an immediate
+    refresh, at most once every `KEYS_MIN_REFRESH_INTERVAL` seconds. The fetches run
+    on the process-wide refresh loop: concurrent requests share a single fetch, whatever
+    their event loop, and a background refresh outlives the loop of the request.
+
+    Args:
+    - url (str): URL of the keys document
+    - parse (Callable): Build the {key id: key} mapping from the JSON document
+    - refresh_interval (int): Seconds the keys are used before being refreshed
+    - headers (Dict[str, str]): Headers sent with the fetch
+    """
+    def __init__(
+        self,
+        url: str,
+        parse: Callable[[Any], Dict[str, Any]] = parse_jwks,
+        refresh_interval: int = 600,
+        headers: Union[Dict[str, str], None] = None,
+    ):
+        self.url = url
+        self.parse = parse
+        self.refresh_interval = refresh_interval
+        self.headers = headers
+        self._keys: Dict[str, Any] = {}
+        self._fetched_at = 0.0
+        self._expires_at = 0.0
+        self._future: Union[Future, None] = None
+        self._lock = threading.Lock()
+
+    async def get(self, kid: Union[str, None]) -> Any:
+        """
+        Return the key of a key id, None when it is still unknown after a refresh.
+        """
+        now = time.monotonic()
+        if not self._keys:
+            await self.refresh()
+        elif kid not in self._keys and now - self._fetched_at >= KEYS_MIN_REFRESH_INTERVAL:
+            await self.refresh()
+        elif now >= self._expires_at:
+            self._refresh_future()
+        return self._keys.get(kid)
+
+    async def refresh(self) -> None:
+        # Shielded: a cancelled request does not cancel the fetch other requests wait for
+        await asyncio.shield(asyncio.wrap_future(self._refresh_future()))
+
+    def _refresh_future(self) -> Future:
+        with self._lock:
+            future = self._future
+            if future is None or future.done():
+                future = self._future = asyncio.run_coroutine_threadsafe(self._fetch(), get_refresh_loop())
+                future.add_done_callback(self._log_failure)
+        return future
+
+    async def _fetch(self) -> None:
+        # A client per fetch: fetches are rare and a client cannot outlive its event loop
+        async with httpx.AsyncClient(timeout=KEYS_FETCH_TIMEOUT, headers=self.headers) as client:
+            response = await client.get(self.url)
+            response.raise_for_status()
+        keys = self.parse(response.json())
+
+        max_age = MAX_AGE_PATTERN.search(response.headers.get('cache-control', ''))
+        lifespan = int(max_age.group(1)) if max_age else self.refresh_interval
+        now = time.monotonic()
+        self._keys = keys
+        self._fetched_at = now
+        self._expires_at = now + lifespan
+
+    def _log_failure(self, future: Future) -> None:
+        if not future.cancelled() and future.exception() is not None:
+            logger.warning(f"Error fetching signing keys from {self.url}: {future.exception()}")
@@ -0,0 +1,56 @@
+import threading
+from typing import Dict, Tuple
+from supabase import Client, ClientOptions, create_client
+
+# From package
+from drf_easily_saas import settings as easily_settings
+from drf_easily_saas.exceptions.supabase import InvalidSupabaseConfigurationError
+
+# -------------------------------------------- #
+# Supabase clients
+# -------------------------------------------- #
+SUPABASE_KEY_ROLES = {
+    'anon': 'anon_key',
+    'service_role': 'service_role_key',
+}
+
+
+class SupabaseClientRegistry:
+    """
+    Thread-safe registry handing out one shared Supabase client per (url, key role).
+
+    A client is built on first use and reused afterwards, so its HTTP connections
+    are kept alive between calls. Shared clients never hold a user session
+    (no token refresh, no persisted session): they only make calls with their key.
+    """
+    def __init__(self):
+        self._clients: Dict[Tuple[str, str], Client] = {}
+        self._lock = threading.Lock()
+
+    def get(self, url: str, key: str, role: str) -> Client:
+        client = self._clients.get((url, role))
+        if client is None:
+            with self._lock:
+                client = self._clients.get((url, role))
+                if client is None:
+                    client = create_client(url, key, options=ClientOptions(auto_refresh_token=False, persist_session=False))
+                    self._clients[(url, role)] = client
+        return client
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clients.clear()
+
+
+_registry = SupabaseClientRegistry()
+
+def get_supabase_client(role: str = 'service_role') -> Client:
+    """
+    Return the shared Supabase client of a key role ('anon' or 'service_role') from the Supabase settings.
+    """
+    if role not in SUPABASE_KEY_ROLES:
+        raise InvalidSupabaseConfigurationError(f"Supabase key role {role} is not valid use {list(SUPABASE_KEY_ROLES)} instead")
+    supabase_config = easily_settings.SUPABASE_CONFIG
+    if supabase_config is None:
+        raise InvalidSupabaseConfigurationError("Supabase configuration not found")
+    return _registry.get(supabase_config.url, getattr(supabase_config, SUPABASE_KEY_ROLES[role]), role)
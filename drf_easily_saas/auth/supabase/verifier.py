@@ -0,0 +1,117 @@
+import jwt
+from typing import Any, Dict, Union
+
+# From package
+from drf_easily_saas import settings as easily_settings
+from drf_easily_saas.auth.keys import AsyncKeySet, parse_jwks
+from drf_easily_saas.exceptions.supabase import InvalidSupabaseConfigurationError
+
+# ---------------------------------------- CONSTANTS ---------------------------------------- #
+SUPABASE_JWKS_PATH = '/auth/v1/.well-known/jwks.json'
+SUPABASE_SYMMETRIC_ALGORITHMS = ['HS256']
+SUPABASE_ASYMMETRIC_ALGORITHMS = ['RS256', 'ES256', 'EdDSA']
+
+
+# ---------------------------------------- VERIFIER ---------------------------------------- #
+class SupabaseTokenVerifier:
+    """
+    Verify Supabase access tokens locally.
+
+    Tokens signed with the legacy JWT secret (HS256) are checked against `jwt_secret`.
+    Tokens signed with asymmetric keys are checked against the project JWKS, which is
+    fetched once and refreshed every `jwks_refresh_interval` seconds (or when an unknown
+    key id shows up). `averify` does the same without blocking the event loop: the
+    JWKS is fetched with async HTTP and refreshed in the background.
+
+    Args:
+    - url (str): Supabase URL
+    - jwt_secret (str): Supabase JWT secret (optional when the project uses asymmetric keys)
+    - anon_key (str): Supabase anonymous key, sent when fetching the JWKS
+    - audience (str): Expected `aud` claim
+    - jwks_refresh_interval (int): Seconds between two JWKS refreshes
+    """
+    def __init__(
+        self,
+        url: str,
+        jwt_secret: Union[str, None] = None,
+        anon_key: Union[str, None] = None,
+        audience: Union[str, None] = 'authenticated',
+        jwks_refresh_interval: int = 600,
+    ):
+        self.url = url.rstrip('/')
+        self.jwt_secret = jwt_secret
+        self.audience = audience
+        headers = {'apikey': anon_key} if anon_key else None
+        self.jwks_client = jwt.PyJWKClient(
+            self.url + SUPABASE_JWKS_PATH,
+            cache_keys=True,
+            lifespan=jwks_refresh_interval,
+            headers=headers,
+        )
+        self.async_keys = AsyncKeySet(
+            self.url + SUPABASE_JWKS_PATH,
+            parse=parse_jwks,
+            refresh_interval=jwks_refresh_interval,
+            headers=headers,
+        )
+
+    def get_key(self, token: str, algorithm: str) -> Any:
+        if algorithm in SUPABASE_SYMMETRIC_ALGORITHMS:
+            if not self.jwt_secret:
+                raise jwt.InvalidTokenError('Supabase JWT secret is not configured')
+            return self.jwt_secret
+        if algorithm in SUPABASE_ASYMMETRIC_ALGORITHMS:
+            return self.jwks_client.get_signing_key_from_jwt(token).key
+        raise jwt.InvalidAlgorithmError(f'Algorithm {algorithm} is not allowed')
+
+    async def aget_key(self, token: str, algorithm: str) -> Any:
+        if algorithm in SUPABASE_ASYMMETRIC_ALGORITHMS:
+            key = await self.async_keys.get(jwt.get_unverified_header(token).get('kid'))
+            if key is None:
+                raise jwt.InvalidTokenError('Unknown Supabase signing key')
+            return key
+        return self.get_key(token, algorithm)
+
+    def decode(self, token: str, key: Any, algorithm: str) -> Dict[str, Any]:
+        return jwt.decode(
+            token,
+            key,
+            algorithms=[algorithm],
+            audience=self.audience,
+            options={'require': ['exp', 'sub'], 'verify_aud': self.audience is not None},
+        )
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        """
+        Verify the signature, expiration and audience of a token and return its claims.
+        """
+        algorithm = jwt.get_unverified_header(token).get('alg')
+        return self.decode(token, self.get_key(token, algorithm), algorithm)
+
+    async def averify(self, token: str) -> Dict[str, Any]:
+        """
+        Async `verify`: the JWKS is never fetched on the event loop thread.
+        """
+        algorithm = jwt.get_unverified_header(token).get('alg')
+        return self.decode(token, await self.aget_key(token, algorithm), algorithm)
+
+
+_verifier = None
+
+def get_token_verifier() -> SupabaseTokenVerifier:
+    """
+    Return the process-wide Supabase token verifier built from the Supabase settings.
+    """
+    global _verifier
+    if _verifier is None:
+        supabase_config = easily_settings.SUPABASE_CONFIG
+        if supabase_config is None:
+            raise InvalidSupabaseConfigurationError('Supabase configuration not found.')
+        _verifier = SupabaseTokenVerifier(
+            supabase_config.url,
+            jwt_secret=supabase_config.jwt_secret,
+            anon_key=supabase_config.anon_key,
+            audience=supabase_config.jwt_audience,
+            jwks_refresh_interval=supabase_config.jwks_refresh_interval,
+        )
+    return _verifier
@@ -0,0 +1,196 @@
+import time
+import logging
+from contextlib import contextmanager
+from typing import Any, Callable, Iterable, Iterator, List, NamedTuple, Tuple, Type
+
+# Django
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import models, transaction
+
+# From package
+from drf_easily_saas.auth.users import invalidate_users
+from drf_easily_saas.utils.db import check_table_exists, check_table_empty
+from drf_easily_saas.utils.iterables import chunked
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------- CONSTANTS ---------------------------------------- #
+DEFAULT_SYNC_BATCH_SIZE = 500
+USER_IMPORT_LOCK_PREFIX = 'drf_easily_saas:user_import:'
+# A full import of a large project takes hours
+USER_IMPORT_LOCK_TIMEOUT = 6 * 3600
+
+
+# ---------------------------------------- PROVIDER USER ---------------------------------------- #
+class ProviderUser(NamedTuple):
+    """
+    Provider-agnostic view of a user coming from an authentication provider.
+    """
+    uid: str
+    email: str
+    email_verified: bool
+    sign_in_provider: str
+
+
+# ---------------------------------------- SYNC ---------------------------------------- #
+def _sync_batch(batch: List[ProviderUser], informations_model: Type[models.Model]) -> Tuple[int, int]:
+    """
+    Create the missing users of a batch and update the changed emails.
+    """
+    uids = [provider_user.uid for provider_user in batch]
+    existing = {
+        user.username: user
+        for user in User.objects.filter(username__in=uids).only('id', 'username', 'email')
+    }
+
+    new_users = []
+    updated_users = []
+    for provider_user in batch:
+        user = existing.get(provider_user.uid)
+        if user is None:
+            new_users.append(User(
+                username=provider_user.uid,
+                email=provider_user.email or '',
+                password=make_password(None),
+            ))
+        elif provider_user.email and user.email != provider_user.email:
+            user.email = provider_user.email
+            updated_users.append(user)
+
+    with transaction.atomic():
+        if new_users:
+            # ignore_conflicts: a concurrent first login may have created the user meanwhile
+            User.objects.bulk_create(new_users, ignore_conflicts=True)
+            new_uids = {user.username for user in new_users}
+            user_ids = dict(User.objects.filter(username__in=new_uids).values_list('username', 'id'))
+            informations_model.objects.bulk_create(
+                [
+                    informations_model(
+                        user_id=user_ids[provider_user.uid],
+                        email_verified=provider_user.email_verified,
+                        sign_in_provider=provider_user.sign_in_provider,
+                    )
+                    for provider_user in batch
+                    if provider_user.uid in new_uids and provider_user.uid in user_ids
+                ],
+                ignore_conflicts=True,
+            )
+        if updated_users:
+            User.objects.bulk_update(updated_users, ['email'])
+            invalidate_users([user.username for user in updated_users])
+    return len(new_users), len(updated_users)
+
+
+def sync_users(
+    provider_users: Iterable[ProviderUser],
+    informations_model: Type[models.Model],
+    label: str,
+    batch_size: int = DEFAULT_SYNC_BATCH_SIZE,
+    log: Callable[[str], None] = print,
+) -> Tuple[bool, bool]:
+    """
+    Stream provider users into Django's User model.
+
+    Users are written with `bulk_create`/`bulk_update` in batches of `batch_size`.
+    Once the provider stream is exhausted, the Django users linked to
+    `informations_model` whose uid was not seen are deleted (set difference).
+
+    Args:
+    - provider_users (Iterable[ProviderUser]): Users of the provider, consumed once
+    - informations_model (Model): Provider informations model (FirebaseUserInformations, ...)
+    - label (str): Provider name used in progress messages
+    - batch_size (int): Number of users written per batch
+    - log (Callable): Progress writer
+
+    Returns:
+    - new_users (bool): At least one user was created
+    - deleted_users (bool): At least one user was deleted
+    """
+    started_at = time.monotonic()
+    seen_uids = set()
+    created_count = 0
+    updated_count = 0
+
+    log(f"{label} syncing users...")
+    for batch in chunked(provider_users, batch_size):
+        seen_uids.update(provider_user.uid for provider_user in batch)
+        created, updated = _sync_batch(batch, informations_model)
+        created_count += created
+        updated_count += updated
+
+        elapsed = time.monotonic() - started_at
+        rate = len(seen_uids) / elapsed if elapsed else 0
+        log(f'User sync > Processed: {len(seen_uids)} > Created: {created_count} > Updated: {updated_count} > {rate:.0f} users/s')
+
+    # Delete users linked to the provider that are not in the provider anymore
+    linked_uids = informations_model.objects.values_list('user__username', flat=True).iterator(chunk_size=batch_size)
+    stale_uids = [uid for uid in linked_uids if uid not in seen_uids]
+    deleted_count = 0
+    for chunk in chunked(stale_uids, batch_size):
+        User.objects.filter(username__in=chunk).delete()
+        invalidate_users(chunk)
+        deleted_count += len(chunk)
+        log(f'User sync > Deleted: {deleted_count}')
+
+    elapsed = time.monotonic() - started_at
+    nbr_django_users = informations_model.objects.count()
+    nbr_provider_users = len(seen_uids)
+    if nbr_django_users == nbr_provider_users:
+        log("User sync > Synced successfully")
+    else:
+        log("User sync > Sync failed")
+    log(f'User sync > Total Django users: {nbr_django_users} > Total {label} users: {nbr_provider_users}')
+    log(f'User sync > Created: {created_count} > Updated: {updated_count} > Deleted: {deleted_count} > Duration: {elapsed:.1f}s')
+    return created_count > 0, deleted_count > 0
+
+
+@contextmanager
+def user_import_lock(label: str, alias: str = 'default') -> Iterator[bool]:
+    """
+    Lock held while the users of a provider are imported, so imports never overlap.
+
+    The lock lives in the Django cache `alias`: it is shared by every process when that
+    cache is (Redis, Memcached, database). Yields False when another import holds it.
+    """
+    cache = caches[alias]
+    key = f'{USER_IMPORT_LOCK_PREFIX}{label}'
+    acquired = cache.add(key, True, USER_IMPORT_LOCK_TIMEOUT)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            cache.delete(key)
+
+
+def import_configured_users(provider_config, informations_model: Type[models.Model], import_users: Callable[[], Any]) -> bool:
+    """
+    Run the user import requested by the provider settings, under `user_import_lock`.
+
+    Called by the `--if-configured` option of the user sync commands (deploy hook), never
+    on the request path: `import_users` imports every user while the informations table is
+    empty, `hot_reload_import` imports them again when it is not.
+
+    Args:
+    - provider_config (FirebaseConfig | SupabaseConfig): Validated provider settings
+    - informations_model (Model): Provider informations model (FirebaseUserInformations, ...)
+    - import_users (Callable): Provider import function
+
+    Returns:
+    - imported (bool): False when the settings request no import or another import is running
+    """
+    if provider_config is None or not (provider_config.import_users or provider_config.hot_reload_import):
+        return False
+    table_name = informations_model._meta.db_table
+    if not check_table_exists(table_name):
+        return False
+    with user_import_lock(table_name) as acquired:
+        if not acquired:
+            logger.info(f"Users of {table_name} are already being imported, skipped")
+            return False
+        empty = check_table_empty(table_name)
+        if (provider_config.import_users and empty) or (provider_config.hot_reload_import and not empty):
+            import_users()
+            return True
+    return False
@@ -0,0 +1,223 @@
+from typing import Iterable, Type, Union
+from asgiref.sync import sync_to_async
+
+# Django
+from django.contrib.auth.models import User
+from django.contrib.auth.hashers import make_password
+from django.core.cache import caches
+from django.db import models, transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils.functional import SimpleLazyObject
+
+# From package
+from drf_easily_saas import settings as easily_settings
+from drf_easily_saas.utils.cache import LRUCache
+
+# ---------------------------------------- CONSTANTS ---------------------------------------- #
+USER_CACHE_PREFIX = 'drf_easily_saas:user:'
+
+
+# ---------------------------------------- LAZY USER ---------------------------------------- #
+class LazyUser(SimpleLazyObject):
+    """
+    Authenticated user built from the user cache.
+
+    `pk`, `id`, `username` and `email` are available without any query, the
+    database row is only loaded when another attribute is accessed.
+    """
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, pk: int, username: str, email: str = ''):
+        super().__init__(lambda: User.objects.get(pk=pk))
+        self.__dict__.update(pk=pk, id=pk, username=username, email=email)
+
+    def __bool__(self):
+        return True
+
+    def __str__(self):
+        return self.username
+
+    def get_username(self):
+        return self.username
+
+
+# ---------------------------------------- USER CACHE ---------------------------------------- #
+class UserLookupCache:
+    """
+    Two-tier uid -> user id cache: a process-local LRU in front of a Django cache.
+
+    Args:
+    - alias (str): Django cache alias
+    - ttl (int): Seconds a mapping is kept in the Django cache (0 disables the cache)
+    - local_size (int): Maximum number of mappings kept in the process-local LRU
+    - local_ttl (int): Seconds a mapping is kept in the process-local LRU
+    """
+    def __init__(self, alias: str = 'default', ttl: int = 3600, local_size: int = 4096, local_ttl: int = 60):
+        self.alias = alias
+        self.ttl = ttl
+        self.local = LRUCache(max_size=local_size if ttl else 0, ttl=local_ttl)
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    @staticmethod
+    def make_key(uid: str) -> str:
+        return f'{USER_CACHE_PREFIX}{uid}'
+
+    def get(self, uid: str) -> Union[int, None]:
+        if not self.ttl:
+            return None
+        pk = self.local.get(uid)
+        if pk is None:
+            pk = self.shared.get(self.make_key(uid))
+            if pk is not None:
+                self.local.set(uid, pk)
+        return pk
+
+    def set(self, uid: str, pk: int) -> None:
+        if not self.ttl:
+            return
+        self.local.set(uid, pk)
+        self.shared.set(self.make_key(uid), pk, self.ttl)
+
+    async def aget(self, uid: str) -> Union[int, None]:
+        if not self.ttl:
+            return None
+        pk = self.local.get(uid)
+        if pk is None:
+            pk = await self.shared.aget(self.make_key(uid))
+            if pk is not None:
+                self.local.set(uid, pk)
+        return pk
+
+    async def aset(self, uid: str, pk: int) -> None:
+        if not self.ttl:
+            return
+        self.local.set(uid, pk)
+        await self.shared.aset(self.make_key(uid), pk, self.ttl)
+
+    def invalidate(self, uids: Iterable[str]) -> None:
+        uids = list(uids)
+        for uid in uids:
+            self.local.delete(uid)
+        if uids:
+            self.shared.delete_many([self.make_key(uid) for uid in uids])
+
+    def stats(self):
+        return self.local.stats()
+
+
+_user_cache = None
+
+def get_user_cache() -> UserLookupCache:
+    """
+    Return the process-wide user lookup cache built from the `user_cache` settings.
+    """
+    global _user_cache
+    if _user_cache is None:
+        cache_config = easily_settings.USER_CACHE_CONFIG
+        _user_cache = UserLookupCache(
+            alias=cache_config.alias,
+            ttl=cache_config.ttl,
+            local_size=cache_config.local_size,
+            local_ttl=cache_config.local_ttl,
+        )
+    return _user_cache
+
+
+# ---------------------------------------- LOOKUP ---------------------------------------- #
+def _get_or_create_user_row(
+    uid: str,
+    email: str,
+    informations_model: Type[models.Model],
+    email_verified: bool,
+    sign_in_provider: str,
+) -> User:
+    """
+    Get or create the user row and, on creation, its provider informations in one transaction.
+
+    The unusable password is set at creation, so a new user costs one insert instead
+    of an insert and an update.
+    """
+    with transaction.atomic():
+        user, created = User.objects.get_or_create(
+            username=uid,
+            defaults={'email': email, 'password': make_password(None)},
+        )
+        if created:
+            # Provider user informations (email_verified, sign_in_provider)
+            informations_model.objects.create(
+                user=user,
+                email_verified=email_verified,
+                sign_in_provider=sign_in_provider
+            )
+    return user
+
+
+def get_or_create_user(
+    uid: str,
+    email: str,
+    informations_model: Type[models.Model],
+    email_verified: bool,
+    sign_in_provider: str,
+) -> Union[User, LazyUser]:
+    """
+    Return the Django user of a provider uid, creating it on first login.
+
+    On a cache hit no query is made and a `LazyUser` is returned.
+    """
+    user_cache = get_user_cache()
+    pk = user_cache.get(uid)
+    if pk is not None:
+        return LazyUser(pk, uid, email)
+
+    user = _get_or_create_user_row(uid, email, informations_model, email_verified, sign_in_provider)
+    user_cache.set(uid, user.pk)
+    return user
+
+
+async def aget_or_create_user(
+    uid: str,
+    email: str,
+    informations_model: Type[models.Model],
+    email_verified: bool,
+    sign_in_provider: str,
+) -> Union[User, LazyUser]:
+    """
+    Async `get_or_create_user`.
+
+    On a cache hit no query is made and a `LazyUser` is returned (its row must then be
+    loaded from sync code). On a miss the transaction runs in the sync thread, as the
+    async ORM cannot hold one across several queries.
+    """
+    user_cache = get_user_cache()
+    pk = await user_cache.aget(uid)
+    if pk is not None:
+        return LazyUser(pk, uid, email)
+
+    user = await sync_to_async(_get_or_create_user_row)(uid, email, informations_model, email_verified, sign_in_provider)
+    await user_cache.aset(uid, user.pk)
+    return user
+
+
+# ---------------------------------------- INVALIDATION ---------------------------------------- #
+def invalidate_user(uid: str) -> None:
+    """
+    Forget the cached user id of a uid (call it when the user is deleted or renamed).
+    """
+    get_user_cache().invalidate([uid])
+
+
+def invalidate_users(uids: Iterable[str]) -> None:
+    """
+    Forget the cached user ids of several uids (used by the user sync).
+    """
+    get_user_cache().invalidate(uids)
+
+
+@receiver(post_delete, sender=User, dispatch_uid='drf_easily_saas_invalidate_user_cache')
+def _invalidate_deleted_user(sender, instance, **kwargs):
+    invalidate_user(instance.username)
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from drf_easily_saas.models import StripeCustomerModel
+from drf_easily_saas.payment.stripe.sync.customers import link_customer_users
+from drf_easily_saas.payment.stripe.sync.engine import DEFAULT_CHUNK_SIZE
+
+class Command(BaseCommand):
+    help = 'Link the mirrored Stripe customers to their users from the uid of their metadata'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Number of customers linked per database chunk')
+
+    def handle(self, *args, **kwargs):
+        self.stdout.write(self.style.NOTICE('Starting customer linking...'))
+        try:
+            unlinked = StripeCustomerModel.objects.filter(user__isnull=True, metadata__has_key='uid').order_by('id')
+            linked = 0
+            last_id = ''
+            # Keyset pagination: each chunk is read and linked in its own transaction
+            while True:
+                with transaction.atomic():
+                    rows = list(unlinked.filter(id__gt=last_id).values('id', 'metadata')[:kwargs['chunk_size']])
+                    if not rows:
+                        break
+                    linked += link_customer_users(rows)
+                last_id = rows[-1]['id']
+            self.stdout.write(self.style.SUCCESS(f'Successfully linked {linked} customers to their users.'))
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'Error linking customers: {e}'))
@@ -0,0 +1,69 @@
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from drf_easily_saas.payment.manager import StripeManager
+from drf_easily_saas.payment.stripe.inbox import claim_events, process_entry, requeue_dead_events
+
+class Command(BaseCommand):
+    """
+    Command to process the Stripe events stored in the webhook inbox (webhook_mode="queue")
+
+    Failed events are retried with exponential backoff and dead-lettered after
+    `webhook_max_attempts` attempts.
+
+    Usage:
+        python3 manage.py processstripewebhooks [--workers 4] [--batch-size 50] [--once] [--requeue-dead]
+    """
+    help = 'Process the Stripe webhook inbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Number of events processed concurrently')
+        parser.add_argument('--batch-size', type=int, default=50, help='Number of events claimed at once')
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='Seconds to wait when the inbox is empty')
+        parser.add_argument('--once', action='store_true', help='Exit once no event is due instead of polling')
+        parser.add_argument('--requeue-dead', action='store_true', help='Put the dead-lettered events back in the queue first')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError("--workers must be at least 1")
+
+        if options['requeue_dead']:
+            requeued = requeue_dead_events()
+            self.stdout.write(self.style.WARNING(f"{requeued} dead-lettered events requeued"))
+
+        self.stripe_manager = StripeManager()
+        totals = Counter()
+        started_at = time.monotonic()
+        try:
+            with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+                while True:
+                    entries = claim_events(options['batch_size'])
+                    if not entries:
+                        if options['once']:
+                            break
+                        time.sleep(options['poll_interval'])
+                        continue
+
+                    batch = Counter(executor.map(self.process, entries))
+                    totals.update(batch)
+                    self.stdout.write(self.style.SUCCESS(
+                        f"{len(entries)} events processed: "
+                        + ', '.join(f"{count} {status}" for status, count in sorted(batch.items()))
+                    ))
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING("Interrupted, claimed events will be retried after the processing timeout"))
+
+        elapsed = time.monotonic() - started_at
+        self.stdout.write(self.style.SUCCESS(
+            f"Stripe webhook inbox drained in {elapsed:.2f}s "
+            f"({totals['done']} done, {totals['retry']} scheduled for retry, {totals['dead']} dead-lettered)"
+        ))
+
+    def process(self, entry):
+        try:
+            return process_entry(entry, self.stripe_manager).status
+        finally:
+            # Worker threads keep their own database connection
+            close_old_connections()
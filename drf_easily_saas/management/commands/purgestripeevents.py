@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from drf_easily_saas.payment.stripe.dedup import get_processed_events
+from drf_easily_saas.payment.stripe.inbox import purge_inbox
+from drf_easily_saas.payment.stripe.mirror import purge_tombstones
+from drf_easily_saas import settings as easily_settings
+
+class Command(BaseCommand):
+    """
+    Command to delete the processed Stripe event ids, the done and dead-lettered webhook inbox
+    events and the mirror tombstones older than the retention
+
+    Usage:
+        python3 manage.py purgestripeevents [--days 30]
+    """
+    help = 'Purge the processed Stripe events index, the webhook inbox and the mirror tombstones'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=easily_settings.STRIPE_CONFIG.event_retention_days,
+            help='Keep the events processed during the last days',
+        )
+
+    def handle(self, *args, **options):
+        if options['days'] < 1:
+            raise CommandError("--days must be at least 1")
+        deleted = get_processed_events().purge(options['days'])
+        self.stdout.write(self.style.SUCCESS(f"{deleted} processed Stripe events purged"))
+        deleted = purge_inbox(options['days'])
+        self.stdout.write(self.style.SUCCESS(f"{deleted} done and dead-lettered Stripe webhook inbox events purged"))
+        deleted = purge_tombstones(options['days'])
+        self.stdout.write(self.style.SUCCESS(f"{deleted} Stripe mirror tombstones purged"))
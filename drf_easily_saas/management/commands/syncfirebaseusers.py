@@ -1,17 +1,35 @@
 from django.core.management.base import BaseCommand
-from firebase_admin import auth
 from django.contrib.auth.models import User
+from drf_easily_saas import settings as easily_settings
 from drf_easily_saas.models import FirebaseUserInformations
+from drf_easily_saas.auth.firebase.protect import import_users
+from drf_easily_saas.auth.sync import DEFAULT_SYNC_BATCH_SIZE, import_configured_users, user_import_lock
 
 class Command(BaseCommand):
     """
     Command to synchronise users from Firebase
-    
+
     Usage:
-        python3 manage.py syncfirebaseusers
+        python3 manage.py syncfirebaseusers [--batch-size 500] [--if-configured]
+
+    With --if-configured, the import requested by the settings (`import_users`,
+    `hot_reload_import`) is run: call it from the deploy or release step, once.
     """
     help = 'Users synchronisation from Firebase'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_SYNC_BATCH_SIZE,
+            help='Number of users written per database batch',
+        )
+        parser.add_argument(
+            '--if-configured',
+            action='store_true',
+            help='Only run the import requested by the import_users and hot_reload_import settings',
+        )
+
     def handle(self, *args, **options):
         header_message = """
 ########################################################
@@ -22,27 +40,26 @@ class Command(BaseCommand):
         """
         separator = "-" * 50
         self.stdout.write(self.style.SUCCESS(header_message))
-        firebase_users = auth.list_users().iterate_all()
-
-        for firebase_user in firebase_users:
-            if not firebase_user.email:
-                user, created = User.objects.get_or_create(username=firebase_user.uid)
-            else:
-                user, created = User.objects.get_or_create(username=firebase_user.uid, email=firebase_user.email)
-
-            if created:
-                user.set_unusable_password()
-                user.save()
-
-                FirebaseUserInformations.objects.create(
-                    user=user,
-                    email_verified=firebase_user.email_verified,
-                    sign_in_provider=firebase_user.provider_id
-                )
-                self.stdout.write(self.style.SUCCESS(f'User sync > ID: {user.username} > Email: {user.email}'))
+
+        log = lambda message: self.stdout.write(self.style.SUCCESS(message))
+        if options['if_configured']:
+            imported = import_configured_users(
+                easily_settings.FIREBASE_CONFIG,
+                FirebaseUserInformations,
+                lambda: import_users(batch_size=options['batch_size'], log=log),
+            )
+            if not imported:
+                self.stdout.write(self.style.NOTICE('No import requested by the settings or an import is already running'))
+                return
+        else:
+            with user_import_lock(FirebaseUserInformations._meta.db_table) as acquired:
+                if not acquired:
+                    self.stdout.write(self.style.ERROR('An import of the Firebase users is already running'))
+                    return
+                import_users(batch_size=options['batch_size'], log=log)
         self.stdout.write(self.style.SUCCESS('Users synchronisation completed'))
 
         user_count = User.objects.count()
 
         self.stdout.write(self.style.SUCCESS(separator))
-        self.stdout.write(self.style.SUCCESS(f'Users count: {user_count}'))
\ No newline at end of file
+        self.stdout.write(self.style.SUCCESS(f'Users count: {user_count}'))
@@ -0,0 +1,68 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from drf_easily_saas.payment.stripe.sync.engine import DEFAULT_CHUNK_SIZE
+from drf_easily_saas.payment.stripe.sync.pipeline import STRIPE_SYNC_RESOURCES, plan_stages, run_stripe_sync
+
+class Command(BaseCommand):
+    """
+    Command to synchronise products, plans, customers and subscriptions from Stripe
+
+    Products are synced before plans and customers before subscriptions,
+    independent branches run concurrently.
+
+    Usage:
+        python3 manage.py syncstripe [--workers 2] [--resources products,plans] [--incremental] [--dry-run]
+    """
+    help = 'Import all Stripe resources into the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Number of resources synced concurrently')
+        parser.add_argument(
+            '--resources',
+            default=','.join(STRIPE_SYNC_RESOURCES),
+            help=f"Comma separated resources to sync among {', '.join(STRIPE_SYNC_RESOURCES)}",
+        )
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Number of rows written per database chunk')
+        parser.add_argument('--incremental', action='store_true', help='Only fetch objects changed since the last synced event')
+        parser.add_argument('--dry-run', action='store_true', help='Print the execution plan without syncing')
+
+    def handle(self, *args, **kwargs):
+        resources = [resource.strip() for resource in kwargs['resources'].split(',') if resource.strip()]
+        unknown = [resource for resource in resources if resource not in STRIPE_SYNC_RESOURCES]
+        if unknown:
+            raise CommandError(f"Unknown resources: {', '.join(unknown)}")
+        if kwargs['workers'] < 1:
+            raise CommandError("--workers must be at least 1")
+
+        for index, stage in enumerate(plan_stages(resources), start=1):
+            self.stdout.write(self.style.NOTICE(f"Stage {index}: {', '.join(stage)}"))
+        if kwargs['dry_run']:
+            return
+
+        started_at = time.monotonic()
+        results = run_stripe_sync(
+            resources=resources,
+            workers=kwargs['workers'],
+            incremental=kwargs['incremental'],
+            chunk_size=kwargs['chunk_size'],
+            on_done=self.write_result,
+        )
+        elapsed = time.monotonic() - started_at
+
+        failed = [resource for resource, result in results.items() if result['status'] != 'done']
+        if failed:
+            self.stdout.write(self.style.ERROR(f"Stripe sync finished with errors in {elapsed:.2f}s (not synced: {', '.join(failed)})"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Successfully synced {', '.join(results)} from Stripe in {elapsed:.2f}s."))
+
+    def write_result(self, result):
+        resource = result['resource']
+        if result['status'] == 'done':
+            report = result['report']
+            self.stdout.write(self.style.SUCCESS(
+                f"{resource}: {report['rows']} rows upserted in {result['seconds']}s"
+            ))
+        elif result['status'] == 'skipped':
+            self.stdout.write(self.style.WARNING(f"{resource}: skipped, a dependency failed"))
+        else:
+            self.stdout.write(self.style.ERROR(f"{resource}: failed after {result['seconds']}s"))
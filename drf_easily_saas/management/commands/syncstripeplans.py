@@ -1,13 +1,28 @@
 from django.core.management.base import BaseCommand
 from drf_easily_saas.payment.stripe.sync.plans import import_stripe_plans
+from drf_easily_saas.payment.stripe.sync.engine import DEFAULT_CHUNK_SIZE
+from drf_easily_saas.payment.stripe.sync.incremental import sync_incremental
+from drf_easily_saas.models import StripeSyncStateModel
 
 class Command(BaseCommand):
     help = 'Import all Stripe plans into the database'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Number of rows written per database chunk')
+        parser.add_argument('--incremental', action='store_true', help='Only fetch objects changed since the last synced event')
+        parser.add_argument('--fetch-missing-parents', action='store_true', help='Fetch from Stripe the parents missing from the local mirror')
+
     def handle(self, *args, **kwargs):
         self.stdout.write(self.style.NOTICE('Starting plan import...'))
         try:
-            import_stripe_plans()
+            if kwargs['incremental']:
+                report = sync_incremental(StripeSyncStateModel.ObjectType.PLAN, chunk_size=kwargs['chunk_size'])
+            else:
+                report = import_stripe_plans(chunk_size=kwargs['chunk_size'], fetch_missing_parents=kwargs['fetch_missing_parents'])
+            if report:
+                self.stdout.write(self.style.NOTICE(f"{report['rows']} plans upserted in {report['chunks']} chunks ({report['total_seconds']}s)"))
+                if report.get('skipped'):
+                    self.stdout.write(self.style.WARNING(f"{report['skipped']} plans skipped because their parent is missing"))
             self.stdout.write(self.style.SUCCESS('Successfully imported plans from Stripe.'))
         except Exception as e:
             self.stdout.write(self.style.ERROR(f'Error importing plans: {e}'))
@@ -1,13 +1,31 @@
 from django.core.management.base import BaseCommand
 from drf_easily_saas.payment.stripe.sync.products import import_stripe_products
+from drf_easily_saas.payment.stripe.sync.engine import DEFAULT_CHUNK_SIZE
+from drf_easily_saas.payment.stripe.sync.incremental import sync_incremental
+from drf_easily_saas.models import StripeSyncStateModel
 
 class Command(BaseCommand):
     help = 'Import products from Stripe'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Number of rows written per database chunk')
+        parser.add_argument('--incremental', action='store_true', help='Only fetch objects changed since the last synced event')
+        parser.add_argument('--created-gte', type=int, default=None, help='Only import objects created at or after this unix timestamp')
+        parser.add_argument('--starting-after', default=None, help='Resume the import after this Stripe object id')
+
     def handle(self, *args, **kwargs):
         self.stdout.write(self.style.NOTICE('Starting product import...'))
         try:
-            import_stripe_products()
+            if kwargs['incremental']:
+                report = sync_incremental(StripeSyncStateModel.ObjectType.PRODUCT, chunk_size=kwargs['chunk_size'])
+            else:
+                report = import_stripe_products(
+                    chunk_size=kwargs['chunk_size'],
+                    created_gte=kwargs['created_gte'],
+                    starting_after=kwargs['starting_after'],
+                )
+            if report:
+                self.stdout.write(self.style.NOTICE(f"{report['rows']} products upserted in {report['chunks']} chunks ({report['total_seconds']}s)"))
             self.stdout.write(self.style.SUCCESS('Successfully imported products from Stripe.'))
         except Exception as e:
             self.stdout.write(self.style.ERROR(f'Error importing products: {e}'))
@@ -1,18 +1,35 @@
 from django.core.management.base import BaseCommand
-from supabase import create_client, Client
 from django.contrib.auth.models import User
+from drf_easily_saas import settings as easily_settings
 from drf_easily_saas.models import SupabaseUserInformations
-from django.conf import settings as dj_settings
+from drf_easily_saas.auth.supabase.protect import import_users
+from drf_easily_saas.auth.sync import DEFAULT_SYNC_BATCH_SIZE, import_configured_users, user_import_lock
 
 class Command(BaseCommand):
     """
     Command to synchronise users from Supabase
     
     Usage:
-        python3 manage.py syncsupabaseusers
+        python3 manage.py syncsupabaseusers [--batch-size 500] [--if-configured]
+
+    With --if-configured, the import requested by the settings (`import_users`,
+    `hot_reload_import`) is run: call it from the deploy or release step, once.
     """
     help = 'Users synchronisation from Supabase'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_SYNC_BATCH_SIZE,
+            help='Number of users written per database batch',
+        )
+        parser.add_argument(
+            '--if-configured',
+            action='store_true',
+            help='Only run the import requested by the import_users and hot_reload_import settings',
+        )
+
     def handle(self, *args, **options):
         header_message = """
 ########################################################
@@ -24,45 +41,23 @@ class Command(BaseCommand):
         separator = "-" * 50
         self.stdout.write(self.style.SUCCESS(header_message))
         
+        log = lambda message: self.stdout.write(self.style.SUCCESS(message))
         try:
-            # Get supabase config from Django settings
-            supabase_config = dj_settings.EASILY.get('supabase_config', {})
-            url = supabase_config.get('url')
-            service_role_key = supabase_config.get('service_role_key')
-            
-            if not url or not service_role_key:
-                self.stdout.write(self.style.ERROR('Supabase configuration not found or incomplete'))
-                return
-            
-            # Create supabase client with service role key for admin operations
-            supabase: Client = create_client(url, service_role_key)
-
-            # Get all users from Supabase Auth
-            response = supabase.auth.admin.list_users()
-            supabase_users = response.users if hasattr(response, 'users') else []
-
-            for supabase_user in supabase_users:
-                uid = supabase_user.id
-                email = supabase_user.email or ''
-                email_verified = supabase_user.email_confirmed or False
-                provider = supabase_user.app_metadata.get('provider', 'email') if supabase_user.app_metadata else 'email'
-                
-                if not email:
-                    user, created = User.objects.get_or_create(username=uid)
-                else:
-                    user, created = User.objects.get_or_create(username=uid, email=email)
-
-                if created:
-                    user.set_unusable_password()
-                    user.save()
-
-                    SupabaseUserInformations.objects.create(
-                        user=user,
-                        email_verified=email_verified,
-                        sign_in_provider=provider
-                    )
-                    self.stdout.write(self.style.SUCCESS(f'User sync > ID: {user.username} > Email: {user.email}'))
-                    
+            if options['if_configured']:
+                imported = import_configured_users(
+                    easily_settings.SUPABASE_CONFIG,
+                    SupabaseUserInformations,
+                    lambda: import_users(batch_size=options['batch_size'], log=log),
+                )
+                if not imported:
+                    self.stdout.write(self.style.NOTICE('No import requested by the settings or an import is already running'))
+                    return
+            else:
+                with user_import_lock(SupabaseUserInformations._meta.db_table) as acquired:
+                    if not acquired:
+                        self.stdout.write(self.style.ERROR('An import of the Supabase users is already running'))
+                        return
+                    import_users(batch_size=options['batch_size'], log=log)
         except Exception as e:
             self.stdout.write(self.style.ERROR(f'Error syncing users from Supabase: {str(e)}'))
             return
@@ -72,4 +67,4 @@ class Command(BaseCommand):
         user_count = User.objects.count()
 
         self.stdout.write(self.style.SUCCESS(separator))
-        self.stdout.write(self.style.SUCCESS(f'Users count: {user_count}'))
\ No newline at end of file
+        self.stdout.write(self.style.SUCCESS(f'Users count: {user_count}'))
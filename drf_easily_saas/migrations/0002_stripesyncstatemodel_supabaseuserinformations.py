@@ -0,0 +1,46 @@
+# Generated by Django 5.0.14 on 2026-10-18 08:22
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drf_easily_saas', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StripeSyncStateModel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_type', models.CharField(choices=[('customer', 'Customer'), ('product', 'Product'), ('plan', 'Plan'), ('subscription', 'Subscription')], max_length=50, unique=True, verbose_name='Object Type')),
+                ('last_event_id', models.CharField(blank=True, max_length=255, null=True, verbose_name='Last Event ID')),
+                ('last_event_created', models.DateTimeField(blank=True, null=True, verbose_name='Last Event Created')),
+                ('last_synced_at', models.DateTimeField(blank=True, null=True, verbose_name='Last Synced At')),
+            ],
+            options={
+                'verbose_name': 'Stripe Sync State',
+                'verbose_name_plural': 'Stripe Sync States',
+            },
+        ),
+        migrations.CreateModel(
+            name='SupabaseUserInformations',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('email_verified', models.BooleanField()),
+                ('sign_in_provider', models.CharField(max_length=255)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Supabase User Informations',
+                'verbose_name_plural': 'Supabase User Informations',
+                'unique_together': {('user', 'sign_in_provider')},
+            },
+        ),
+    ]
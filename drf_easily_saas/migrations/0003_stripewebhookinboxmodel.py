@@ -0,0 +1,34 @@
+# Generated by Django 5.0.14 on 2026-10-18 08:25
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drf_easily_saas', '0002_stripesyncstatemodel_supabaseuserinformations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StripeWebhookInboxModel',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('id', models.CharField(editable=False, max_length=255, primary_key=True, serialize=False, verbose_name='Event ID')),
+                ('type', models.CharField(max_length=255, verbose_name='Event Type')),
+                ('payload', models.JSONField(verbose_name='Payload')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('retry', 'Retry'), ('done', 'Done'), ('dead', 'Dead')], default='pending', max_length=20, verbose_name='Status')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Attempts')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Next Attempt At')),
+                ('last_error', models.TextField(blank=True, null=True, verbose_name='Last Error')),
+            ],
+            options={
+                'verbose_name': 'Stripe Webhook Inbox',
+                'verbose_name_plural': 'Stripe Webhook Inbox',
+                'ordering': ['next_attempt_at'],
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='stripe_inbox_due_idx')],
+            },
+        ),
+    ]
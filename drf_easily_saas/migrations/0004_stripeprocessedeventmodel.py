@@ -0,0 +1,25 @@
+# Generated by Django 5.0.14 on 2026-10-18 08:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drf_easily_saas', '0003_stripewebhookinboxmodel'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StripeProcessedEventModel',
+            fields=[
+                ('id', models.CharField(editable=False, max_length=255, primary_key=True, serialize=False, verbose_name='Event ID')),
+                ('type', models.CharField(max_length=255, verbose_name='Event Type')),
+                ('processed_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Processed At')),
+            ],
+            options={
+                'verbose_name': 'Stripe Processed Event',
+                'verbose_name_plural': 'Stripe Processed Events',
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.0.14 on 2026-10-18 08:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drf_easily_saas', '0004_stripeprocessedeventmodel'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stripecustomermodel',
+            name='last_event_created',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Last Event Created'),
+        ),
+        migrations.AddField(
+            model_name='stripeinvoicemodel',
+            name='last_event_created',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Last Event Created'),
+        ),
+        migrations.AddField(
+            model_name='stripeplanmodel',
+            name='last_event_created',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Last Event Created'),
+        ),
+        migrations.AddField(
+            model_name='stripeproductmodel',
+            name='last_event_created',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Last Event Created'),
+        ),
+        migrations.AddField(
+            model_name='stripesubscriptionmodel',
+            name='last_event_created',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Last Event Created'),
+        ),
+    ]
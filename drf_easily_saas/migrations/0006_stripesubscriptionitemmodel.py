@@ -0,0 +1,64 @@
+# Generated by Django 5.0.14 on 2026-10-18 08:40
+
+import django.db.models.deletion
+from datetime import datetime, timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_subscription_items(apps, schema_editor):
+    """
+    Build the item rows of the subscriptions already mirrored from their `items` JSON.
+    """
+    StripeSubscriptionModel = apps.get_model('drf_easily_saas', 'StripeSubscriptionModel')
+    StripeSubscriptionItemModel = apps.get_model('drf_easily_saas', 'StripeSubscriptionItemModel')
+    use_tz = getattr(settings, 'USE_TZ', False)
+
+    items = []
+    for subscription_id, subscription_items in StripeSubscriptionModel.objects.values_list('id', 'items').iterator(chunk_size=500):
+        for item in (subscription_items or {}).get('data', []):
+            price = item.get('plan') or item.get('price')
+            if not price:
+                continue
+            created = item.get('created')
+            if created is not None:
+                created = datetime.fromtimestamp(created, tz=timezone.utc) if use_tz else datetime.fromtimestamp(created)
+            items.append(StripeSubscriptionItemModel(
+                id=item['id'],
+                subscription_id=subscription_id,
+                plan_id=price['id'],
+                quantity=item.get('quantity'),
+                created=created,
+                metadata=item.get('metadata') or {},
+            ))
+        if len(items) >= 500:
+            StripeSubscriptionItemModel.objects.bulk_create(items, ignore_conflicts=True)
+            items = []
+    StripeSubscriptionItemModel.objects.bulk_create(items, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drf_easily_saas', '0005_stripecustomermodel_last_event_created_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StripeSubscriptionItemModel',
+            fields=[
+                ('id', models.CharField(editable=False, max_length=255, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField(blank=True, null=True, verbose_name='Quantity')),
+                ('created', models.DateTimeField(blank=True, null=True, verbose_name='Created')),
+                ('metadata', models.JSONField(blank=True, default=dict, verbose_name='Metadata')),
+                ('plan', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='subscription_items', to='drf_easily_saas.stripeplanmodel', verbose_name='Plan')),
+                ('subscription', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='subscription_items', to='drf_easily_saas.stripesubscriptionmodel', verbose_name='Subscription')),
+            ],
+            options={
+                'verbose_name': 'Stripe Subscription Item',
+                'verbose_name_plural': 'Stripe Subscription Items',
+                'indexes': [models.Index(fields=['plan', 'subscription'], name='stripe_item_plan_sub_idx'), models.Index(fields=['subscription', 'plan'], name='stripe_item_sub_plan_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_subscription_items, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.14 on 2026-10-18 08:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drf_easily_saas', '0006_stripesubscriptionitemmodel'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stripeproductmodel',
+            name='default_price_plan',
+            field=models.ForeignObject(from_fields=['default_price'], null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='drf_easily_saas.stripeplanmodel', to_fields=['id'], verbose_name='Default Price'),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.0.14 on 2026-10-18 08:44
+
+from django.db import migrations, models
+
+# PostgreSQL only (other backends cannot create or match these expressions):
+# btree on `metadata -> 'uid'` for `metadata__uid=...` lookups (for_uid), and
+# GIN on `metadata` for containment lookups (`metadata__contains={'uid': ...}`).
+POSTGRESQL_INDEXES = [
+    ('stripe_customer_uid_idx', 'drf_easily_saas_stripecustomermodel', """(("metadata" -> 'uid'))"""),
+    ('stripe_sub_uid_idx', 'drf_easily_saas_stripesubscriptionmodel', """(("metadata" -> 'uid'))"""),
+    ('stripe_customer_metadata_gin', 'drf_easily_saas_stripecustomermodel', 'USING gin ("metadata" jsonb_path_ops)'),
+    ('stripe_sub_metadata_gin', 'drf_easily_saas_stripesubscriptionmodel', 'USING gin ("metadata" jsonb_path_ops)'),
+]
+
+
+def create_postgresql_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, definition in POSTGRESQL_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {schema_editor.quote_name(name)} ON {schema_editor.quote_name(table)} {definition}'
+        )
+
+
+def drop_postgresql_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _, _ in POSTGRESQL_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {schema_editor.quote_name(name)}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drf_easily_saas', '0007_stripe_relation_accessors'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stripecustomermodel',
+            index=models.Index(fields=['email'], name='stripe_customer_email_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stripeplanmodel',
+            index=models.Index(condition=models.Q(('active', True)), fields=['product', '-created'], name='stripe_plan_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stripeproductmodel',
+            index=models.Index(condition=models.Q(('active', True)), fields=['-created'], name='stripe_product_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stripesubscriptionmodel',
+            index=models.Index(fields=['-current_period_end'], name='stripe_sub_period_end_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stripesubscriptionmodel',
+            index=models.Index(fields=['status', '-current_period_end'], name='stripe_sub_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stripesubscriptionmodel',
+            index=models.Index(fields=['customer', 'status'], name='stripe_sub_customer_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stripesubscriptionmodel',
+            index=models.Index(condition=models.Q(('status__in', ['trialing', 'active'])), fields=['-current_period_end'], name='stripe_sub_active_idx'),
+        ),
+        migrations.RunPython(create_postgresql_indexes, drop_postgresql_indexes),
+    ]
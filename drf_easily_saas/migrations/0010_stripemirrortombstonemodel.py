@@ -0,0 +1,28 @@
+# Generated by Django 5.0.14 on 2026-10-18 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drf_easily_saas', '0009_stripecustomermodel_user'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StripeMirrorTombstoneModel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=100, verbose_name='Model')),
+                ('object_id', models.CharField(max_length=255, verbose_name='Object ID')),
+                ('last_event_created', models.DateTimeField(verbose_name='Last Event Created')),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Deleted At')),
+            ],
+            options={
+                'verbose_name': 'Stripe Mirror Tombstone',
+                'verbose_name_plural': 'Stripe Mirror Tombstones',
+                'unique_together': {('model', 'object_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.0.14 on 2026-10-18 09:08
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drf_easily_saas', '0010_stripemirrortombstonemodel'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stripeprocessedeventmodel',
+            name='claimed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Claimed At'),
+        ),
+        # The events recorded before the status were all handled
+        migrations.AddField(
+            model_name='stripeprocessedeventmodel',
+            name='status',
+            field=models.CharField(choices=[('processing', 'Processing'), ('done', 'Done')], default='done', max_length=20, verbose_name='Status'),
+        ),
+        migrations.AlterField(
+            model_name='stripeprocessedeventmodel',
+            name='status',
+            field=models.CharField(choices=[('processing', 'Processing'), ('done', 'Done')], default='processing', max_length=20, verbose_name='Status'),
+        ),
+    ]
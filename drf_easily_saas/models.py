@@ -50,11 +50,95 @@ class SupabaseUserInformations(BaseModel):
 
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from drf_easily_saas.schemas.constants import STRIPE_ACTIVE_SUBSCRIPTION_STATUS_TYPES
+
+
+# _ QuerySets
+# Relations are resolved for a whole queryset with a fixed number of queries
+class StripeCustomerQuerySet(models.QuerySet):
+    def for_uid(self, uid: str):
+        """
+        Customers whose metadata holds this uid (indexed on PostgreSQL).
+        """
+        return self.filter(metadata__uid=uid)
+
+    def for_user(self, user):
+        """
+        Customers linked to a user (a User or its uid), through the `user` index.
+        """
+        if isinstance(user, str):
+            return self.filter(user__username=user)
+        return self.filter(user=user)
+
+    def with_plans(self):
+        """
+        Prefetch the subscriptions of the customers with their plans (two queries).
+        """
+        return self.prefetch_related(
+            models.Prefetch('subscriptions', queryset=StripeSubscriptionModel.objects.with_plans())
+        )
+
+    def with_active_subscription(self):
+        """
+        Customers having an active subscription, prefetched with its plans in `active_subscriptions`.
+        """
+        active_subscriptions = StripeSubscriptionModel.objects.active()
+        return self.filter(
+            models.Exists(active_subscriptions.filter(customer=models.OuterRef('pk')))
+        ).prefetch_related(
+            models.Prefetch('subscriptions', queryset=active_subscriptions.with_plans(), to_attr='active_subscriptions')
+        )
+
+
+class StripeProductQuerySet(models.QuerySet):
+    def with_default_price(self):
+        """
+        Join the default price of the products (no extra query).
+        """
+        return self.select_related('default_price_plan')
+
+    def with_plans(self):
+        return self.prefetch_related('plans')
+
+
+class StripeSubscriptionQuerySet(models.QuerySet):
+    def for_uid(self, uid: str):
+        """
+        Subscriptions whose metadata holds this uid (indexed on PostgreSQL).
+        """
+        return self.filter(metadata__uid=uid)
+
+    def for_user(self, user):
+        """
+        Subscriptions of every customer linked to a user (a User or its uid), one indexed join.
+        """
+        if isinstance(user, str):
+            return self.filter(customer__user__username=user)
+        return self.filter(customer__user=user)
+
+    def active(self):
+        return self.filter(status__in=STRIPE_ACTIVE_SUBSCRIPTION_STATUS_TYPES)
+
+    def with_plans(self):
+        """
+        Prefetch the items of the subscriptions with their plans (one query).
+        """
+        return self.prefetch_related(
+            models.Prefetch('subscription_items', queryset=StripeSubscriptionItemModel.objects.select_related('plan'))
+        )
+
+
+def _is_prefetched(instance: models.Model, relation: str) -> bool:
+    return relation in getattr(instance, '_prefetched_objects_cache', {})
+
+
 class StripeCustomerModel(models.Model):
     id = models.CharField(max_length=255, primary_key=True, editable=False, verbose_name=_("ID"))
-    # user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='stripe_customer', verbose_name=_("User"))
+    # A user gets a new customer on each checkout made with its email only: several customers per user
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='stripe_customers', verbose_name=_("User"))
     address = models.JSONField(null=True, blank=True, verbose_name=_("Address"))
     description = models.CharField(max_length=255, null=True, blank=True, verbose_name=_("Description"))
     email = models.EmailField(verbose_name=_("Email"))
@@ -62,10 +146,17 @@ class StripeCustomerModel(models.Model):
     name = models.CharField(max_length=255, null=True, blank=True, verbose_name=_("Name"))
     phone = models.CharField(max_length=255, null=True, blank=True, verbose_name=_("Phone"))
     shipping = models.JSONField(null=True, blank=True, verbose_name=_("Shipping"))
+    last_event_created = models.DateTimeField(null=True, blank=True, editable=False, verbose_name=_("Last Event Created"))
+
+    objects = StripeCustomerQuerySet.as_manager()
 
     class Meta:
         verbose_name = _("Stripe Customer")
         verbose_name_plural = _("Stripe Customers")
+        indexes = [
+            models.Index(fields=['email'], name='stripe_customer_email_idx'),
+        ]
+        # PostgreSQL only, see migration 0008: `metadata -> 'uid'` (for_uid) and GIN `metadata` (contains)
     
     def __str__(self):
         return f"{self.name} - {self.id}"
@@ -74,8 +165,12 @@ class StripeCustomerModel(models.Model):
         return StripeSubscriptionModel.objects.filter(customer=self)
     
     def get_plans(self):
+        if _is_prefetched(self, 'subscriptions'):
+            subscriptions = self.subscriptions.all()
+        else:
+            subscriptions = self.get_subscriptions().with_plans()
         plans = []
-        for subscription in self.get_subscriptions():
+        for subscription in subscriptions:
             plans.extend(subscription.get_plans())
         return plans
     
@@ -87,6 +182,16 @@ class StripeProductModel(models.Model):
     id = models.CharField(max_length=255, primary_key=True, editable=False, verbose_name=_("ID"))
     active = models.BooleanField(default=True, verbose_name=_("Active"))
     default_price = models.CharField(max_length=255, null=True, blank=True, verbose_name=_("Default Price"))
+    # Relation over the `default_price` column (no column of its own), used to join the price
+    default_price_plan = models.ForeignObject(
+        'StripePlanModel',
+        on_delete=models.DO_NOTHING,
+        from_fields=['default_price'],
+        to_fields=['id'],
+        null=True,
+        related_name='+',
+        verbose_name=_("Default Price"),
+    )
     description = models.TextField(null=True, blank=True, verbose_name=_("Description"))
     metadata = models.JSONField(default=dict, blank=True, verbose_name=_("Metadata"))
     name = models.CharField(max_length=255, verbose_name=_("Name"))
@@ -102,17 +207,23 @@ class StripeProductModel(models.Model):
     unit_label = models.CharField(max_length=50, null=True, blank=True, verbose_name=_("Unit Label"))
     updated = models.DateTimeField(verbose_name=_("Updated"))
     url = models.URLField(null=True, blank=True, verbose_name=_("URL"))
+    last_event_created = models.DateTimeField(null=True, blank=True, editable=False, verbose_name=_("Last Event Created"))
+
+    objects = StripeProductQuerySet.as_manager()
 
     class Meta:
         verbose_name = _("Stripe Product")
         verbose_name_plural = _("Stripe Products")
         ordering = ['-created']
+        indexes = [
+            models.Index(fields=['-created'], condition=models.Q(active=True), name='stripe_product_active_idx'),
+        ]
 
     def __str__(self):
         return self.name
     
     def get_default_price(self):
-        return StripePlanModel.objects.get(id=self.default_price)
+        return self.default_price_plan
     
     def get_plans(self):
         return StripePlanModel.objects.filter(product=self)
@@ -124,7 +235,7 @@ class StripeProductModel(models.Model):
         return StripePlanModel.objects.filter(product=self, active=False)
     
     def get_subscriptions(self):
-        return StripeSubscriptionModel.objects.filter(items__data__plan__product=self)
+        return StripeSubscriptionModel.objects.filter(subscription_items__plan__product=self).distinct()
 
 
 class StripePlanModel(models.Model):
@@ -164,11 +275,15 @@ class StripePlanModel(models.Model):
     transform_usage = models.JSONField(null=True, blank=True, verbose_name=_("Transform Usage"))
     trial_period_days = models.IntegerField(null=True, blank=True, verbose_name=_("Trial Period Days"))
     usage_type = models.CharField(max_length=10, choices=UsageType.choices, default=UsageType.LICENSED, verbose_name=_("Usage Type"))
+    last_event_created = models.DateTimeField(null=True, blank=True, editable=False, verbose_name=_("Last Event Created"))
 
     class Meta:
         verbose_name = _("Stripe Plan")
         verbose_name_plural = _("Stripe Plans")
         ordering = ['-created']
+        indexes = [
+            models.Index(fields=['product', '-created'], condition=models.Q(active=True), name='stripe_plan_active_idx'),
+        ]
 
     def __str__(self):
         return self.id
@@ -177,7 +292,7 @@ class StripePlanModel(models.Model):
         return self.product
     
     def get_subscriptions(self):
-        return StripeSubscriptionModel.objects.filter(items__data__plan__id=self.id)
+        return StripeSubscriptionModel.objects.filter(subscription_items__plan=self).distinct()
 
 
 class StripeSubscriptionModel(models.Model):
@@ -205,11 +320,26 @@ class StripeSubscriptionModel(models.Model):
     pending_setup_intent = models.CharField(max_length=255, null=True, blank=True, verbose_name=_("Pending Setup Intent"))
     pending_update = models.JSONField(null=True, blank=True, verbose_name=_("Pending Update"))
     status = models.CharField(max_length=50, choices=Status.choices, verbose_name=_("Status"))
+    last_event_created = models.DateTimeField(null=True, blank=True, editable=False, verbose_name=_("Last Event Created"))
+
+    objects = StripeSubscriptionQuerySet.as_manager()
 
     class Meta:
         verbose_name = _("Stripe Subscription")
         verbose_name_plural = _("Stripe Subscriptions")
         ordering = ['-current_period_end']
+        indexes = [
+            models.Index(fields=['-current_period_end'], name='stripe_sub_period_end_idx'),
+            models.Index(fields=['status', '-current_period_end'], name='stripe_sub_status_idx'),
+            models.Index(fields=['customer', 'status'], name='stripe_sub_customer_status_idx'),
+            # Active subscriptions only: a small index for `active()` listings and renewals
+            models.Index(
+                fields=['-current_period_end'],
+                condition=models.Q(status__in=STRIPE_ACTIVE_SUBSCRIPTION_STATUS_TYPES),
+                name='stripe_sub_active_idx',
+            ),
+        ]
+        # PostgreSQL only, see migration 0008: `metadata -> 'uid'` (for_uid) and GIN `metadata` (contains)
     
     def __str__(self):
         return self.id
@@ -218,10 +348,9 @@ class StripeSubscriptionModel(models.Model):
         return self.customer
     
     def get_plans(self):
-        plans = []
-        for item in self.items:
-            plans.append(StripePlanModel.objects.get(id=item['plan']['id']))
-        return plans
+        if _is_prefetched(self, 'subscription_items'):
+            return [item.plan for item in self.subscription_items.all()]
+        return list(StripePlanModel.objects.filter(subscription_items__subscription=self))
     
     def get_latest_invoice(self):
         return StripeInvoiceModel.objects.get(id=self.latest_invoice)
@@ -239,6 +368,29 @@ class StripeSubscriptionModel(models.Model):
         return self.metadata
 
 
+class StripeSubscriptionItemModel(models.Model):
+    id = models.CharField(max_length=255, primary_key=True, editable=False, verbose_name=_("ID"))
+    subscription = models.ForeignKey(StripeSubscriptionModel, on_delete=models.CASCADE, db_index=False, related_name='subscription_items', verbose_name=_("Subscription"))
+    # Prices can be mirrored after the subscriptions using them: no database constraint
+    plan = models.ForeignKey(StripePlanModel, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name='subscription_items', verbose_name=_("Plan"))
+    quantity = models.IntegerField(null=True, blank=True, verbose_name=_("Quantity"))
+    created = models.DateTimeField(null=True, blank=True, verbose_name=_("Created"))
+    metadata = models.JSONField(default=dict, blank=True, verbose_name=_("Metadata"))
+
+    class Meta:
+        verbose_name = _("Stripe Subscription Item")
+        verbose_name_plural = _("Stripe Subscription Items")
+        indexes = [
+            # Subscribers of a plan
+            models.Index(fields=['plan', 'subscription'], name='stripe_item_plan_sub_idx'),
+            # Plans of a subscription
+            models.Index(fields=['subscription', 'plan'], name='stripe_item_sub_plan_idx'),
+        ]
+
+    def __str__(self):
+        return self.id
+
+
 class StripeInvoiceModel(models.Model):
     class Status(models.TextChoices):
         DRAFT = 'draft', _('Draft')
@@ -259,6 +411,7 @@ class StripeInvoiceModel(models.Model):
     status = models.CharField(max_length=50, choices=Status.choices, verbose_name=_("Status"))
     hosted_invoice_url = models.URLField(null=True, blank=True, verbose_name=_("Hosted Invoice URL"))
     subscription = models.ForeignKey(StripeSubscriptionModel, null=True, blank=True, on_delete=models.SET_NULL, related_name='invoices', verbose_name=_("Subscription"))
+    last_event_created = models.DateTimeField(null=True, blank=True, editable=False, verbose_name=_("Last Event Created"))
 
     class Meta:
         verbose_name = _("Stripe Invoice")
@@ -324,3 +477,89 @@ class StripeSetupIntentModel(models.Model):
 
     def get_usage(self):
         return self.usage
+
+
+class StripeSyncStateModel(models.Model):
+    class ObjectType(models.TextChoices):
+        CUSTOMER = 'customer', _('Customer')
+        PRODUCT = 'product', _('Product')
+        PLAN = 'plan', _('Plan')
+        SUBSCRIPTION = 'subscription', _('Subscription')
+
+    object_type = models.CharField(max_length=50, unique=True, choices=ObjectType.choices, verbose_name=_("Object Type"))
+    last_event_id = models.CharField(max_length=255, null=True, blank=True, verbose_name=_("Last Event ID"))
+    last_event_created = models.DateTimeField(null=True, blank=True, verbose_name=_("Last Event Created"))
+    last_synced_at = models.DateTimeField(null=True, blank=True, verbose_name=_("Last Synced At"))
+
+    class Meta:
+        verbose_name = _("Stripe Sync State")
+        verbose_name_plural = _("Stripe Sync States")
+
+    def __str__(self):
+        return f"{self.object_type} - {self.last_event_id}"
+
+
+class StripeWebhookInboxModel(BaseModel):
+    class Status(models.TextChoices):
+        PENDING = 'pending', _('Pending')
+        PROCESSING = 'processing', _('Processing')
+        RETRY = 'retry', _('Retry')
+        DONE = 'done', _('Done')
+        DEAD = 'dead', _('Dead')
+
+    id = models.CharField(max_length=255, primary_key=True, editable=False, verbose_name=_("Event ID"))
+    type = models.CharField(max_length=255, verbose_name=_("Event Type"))
+    payload = models.JSONField(verbose_name=_("Payload"))
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING, verbose_name=_("Status"))
+    attempts = models.PositiveIntegerField(default=0, verbose_name=_("Attempts"))
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name=_("Next Attempt At"))
+    last_error = models.TextField(null=True, blank=True, verbose_name=_("Last Error"))
+
+    class Meta:
+        verbose_name = _("Stripe Webhook Inbox")
+        verbose_name_plural = _("Stripe Webhook Inbox")
+        ordering = ['next_attempt_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='stripe_inbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.id} - {self.type} - {self.status}"
+
+
+class StripeProcessedEventModel(models.Model):
+    class Status(models.TextChoices):
+        PROCESSING = 'processing', _('Processing')
+        DONE = 'done', _('Done')
+
+    id = models.CharField(max_length=255, primary_key=True, editable=False, verbose_name=_("Event ID"))
+    type = models.CharField(max_length=255, verbose_name=_("Event Type"))
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PROCESSING, verbose_name=_("Status"))
+    # Start of the current claim, a processing claim older than the lease can be taken over
+    claimed_at = models.DateTimeField(default=timezone.now, verbose_name=_("Claimed At"))
+    processed_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name=_("Processed At"))
+
+    class Meta:
+        verbose_name = _("Stripe Processed Event")
+        verbose_name_plural = _("Stripe Processed Events")
+
+    def __str__(self):
+        return f"{self.id} - {self.type} - {self.status}"
+
+
+class StripeMirrorTombstoneModel(models.Model):
+    """
+    Deletion of a mirrored Stripe object, kept so older events delivered late do not recreate it.
+    """
+    model = models.CharField(max_length=100, verbose_name=_("Model"))
+    object_id = models.CharField(max_length=255, verbose_name=_("Object ID"))
+    last_event_created = models.DateTimeField(verbose_name=_("Last Event Created"))
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name=_("Deleted At"))
+
+    class Meta:
+        verbose_name = _("Stripe Mirror Tombstone")
+        verbose_name_plural = _("Stripe Mirror Tombstones")
+        unique_together = ('model', 'object_id')
+
+    def __str__(self):
+        return f"{self.model} - {self.object_id}"
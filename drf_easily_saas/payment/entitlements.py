@@ -0,0 +1,241 @@
+import time
+import logging
+from typing import Any, Dict, FrozenSet, Iterable, NamedTuple, Union
+
+# Django
+from django.core.cache import caches
+
+# From package
+from drf_easily_saas import settings as easily_settings
+from drf_easily_saas.models import StripeSubscriptionModel
+from drf_easily_saas.schemas.constants import STRIPE_ACTIVE_SUBSCRIPTION_STATUS_TYPES
+from drf_easily_saas.utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------- CONSTANTS ---------------------------------------- #
+ENTITLEMENT_CACHE_PREFIX = 'drf_easily_saas:entitlement:'
+
+
+# ---------------------------------------- ENTITLEMENT ---------------------------------------- #
+class Entitlement(NamedTuple):
+    """
+    What the subscriptions of a user give access to.
+
+    An entitlement without status means the user has no known subscription.
+    """
+    status: Union[str, None] = None
+    customer_id: Union[str, None] = None
+    subscription_id: Union[str, None] = None
+    plan_ids: FrozenSet[str] = frozenset()
+    current_period_end: Union[float, None] = None
+
+    @property
+    def is_active(self) -> bool:
+        if self.status not in STRIPE_ACTIVE_SUBSCRIPTION_STATUS_TYPES:
+            return False
+        return self.current_period_end is None or self.current_period_end > time.time()
+
+    def has_plan(self, *plan_ids: str) -> bool:
+        """
+        True when an active subscription includes one of the plans (price ids).
+        """
+        return self.is_active and not self.plan_ids.isdisjoint(plan_ids)
+
+
+NO_ENTITLEMENT = Entitlement()
+
+
+def entitlement_from_claims(decoded_token: Union[Dict[str, Any], None]) -> Union[Entitlement, None]:
+    """
+    Entitlement carried by the claims of a verified token, None when the token has none.
+
+    Firebase custom claims are top-level claims, Supabase ones live in `app_metadata`, which
+    only the service role can write. `user_metadata` is writable by the user itself and is
+    never read.
+    """
+    if not isinstance(decoded_token, dict):
+        return None
+    claims = decoded_token if 'plan_id' in decoded_token else decoded_token.get('app_metadata') or {}
+    if not claims.get('status') or not claims.get('plan_id'):
+        return None
+    return Entitlement(
+        status=claims['status'],
+        customer_id=claims.get('customer_id'),
+        subscription_id=claims.get('subscription_id'),
+        plan_ids=frozenset([claims['plan_id']]),
+    )
+
+
+def entitlement_from_mirror(uid: str) -> Union[Entitlement, None]:
+    """
+    Entitlement computed from the mirrored subscriptions of a user, None when none is mirrored.
+
+    Subscriptions are found through every customer linked to the user (one indexed join),
+    customers mirrored before the link existed are linked by `linkstripecustomers`.
+    Active subscriptions win over the others, their plans are merged across customers.
+    """
+    subscriptions = list(
+        StripeSubscriptionModel.objects
+        .for_user(uid)
+        .values('id', 'customer_id', 'status', 'items', 'current_period_end')
+    )
+    if not subscriptions:
+        return None
+
+    active = [sub for sub in subscriptions if sub['status'] in STRIPE_ACTIVE_SUBSCRIPTION_STATUS_TYPES]
+    selected = active or subscriptions[:1]
+    plan_ids = frozenset(
+        item['plan']['id']
+        for sub in selected
+        for item in (sub['items'] or {}).get('data', [])
+        if item.get('plan')
+    )
+    main = max(selected, key=lambda sub: sub['current_period_end'])
+    return Entitlement(
+        status=main['status'],
+        customer_id=main['customer_id'],
+        subscription_id=main['id'],
+        plan_ids=plan_ids,
+        current_period_end=main['current_period_end'].timestamp(),
+    )
+
+
+# ---------------------------------------- ENTITLEMENT CACHE ---------------------------------------- #
+class EntitlementCache:
+    """
+    Two-tier uid -> entitlement cache: a process-local LRU in front of a Django cache.
+
+    Args:
+    - alias (str): Django cache alias
+    - ttl (int): Seconds an entitlement is kept in the Django cache (0 disables the cache)
+    - local_size (int): Maximum number of entitlements kept in the process-local LRU
+    - local_ttl (int): Seconds an entitlement is kept in the process-local LRU (bounds how
+      long another process serves an entitlement refreshed by a webhook)
+    """
+    def __init__(self, alias: str = 'default', ttl: int = 3600, local_size: int = 4096, local_ttl: int = 30):
+        self.alias = alias
+        self.ttl = ttl
+        self.local_ttl = local_ttl
+        self.local = LRUCache(max_size=local_size if ttl else 0, ttl=local_ttl)
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    @staticmethod
+    def make_key(uid: str) -> str:
+        return f'{ENTITLEMENT_CACHE_PREFIX}{uid}'
+
+    def get(self, uid: str) -> Union[Entitlement, None]:
+        if not self.ttl:
+            return None
+        entitlement = self.local.get(uid)
+        if entitlement is None:
+            entitlement = self.shared.get(self.make_key(uid))
+            if entitlement is not None:
+                self.local.set(uid, entitlement)
+        return entitlement
+
+    def set(self, uid: str, entitlement: Entitlement, ttl: Union[float, None] = None) -> None:
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if not self.ttl or ttl <= 0:
+            return
+        self.local.set(uid, entitlement, ttl=min(ttl, self.local_ttl))
+        self.shared.set(self.make_key(uid), entitlement, max(int(ttl), 1))
+
+    def invalidate(self, uids: Iterable[str]) -> None:
+        uids = list(uids)
+        for uid in uids:
+            self.local.delete(uid)
+        if uids:
+            self.shared.delete_many([self.make_key(uid) for uid in uids])
+
+    def stats(self):
+        return self.local.stats()
+
+
+_entitlement_cache = None
+
+def get_entitlement_cache() -> EntitlementCache:
+    """
+    Return the process-wide entitlement cache built from the `entitlement_cache` settings.
+    """
+    global _entitlement_cache
+    if _entitlement_cache is None:
+        cache_config = easily_settings.ENTITLEMENT_CACHE_CONFIG
+        _entitlement_cache = EntitlementCache(
+            alias=cache_config.alias,
+            ttl=cache_config.ttl,
+            local_size=cache_config.local_size,
+            local_ttl=cache_config.local_ttl,
+        )
+    return _entitlement_cache
+
+
+# ---------------------------------------- LOOKUP ---------------------------------------- #
+def get_entitlement(user, decoded_token: Union[Dict[str, Any], None] = None) -> Entitlement:
+    """
+    Return the entitlement of a user, without query on a cache hit.
+
+    On a miss, the claims of the verified token are used when they carry a subscription
+    (cached until the token expires), the local mirror otherwise. Webhooks write the
+    entitlements computed from the mirror, which then take precedence over the claims:
+    their cache ttl is at least the lifetime of a token, so a token issued before the
+    change has expired when they do.
+
+    Args:
+    - user (User): Authenticated user, its username is the provider uid
+    - decoded_token (dict): Verified token claims (`request.auth` of the package authentications)
+    """
+    uid = user.username
+    entitlement_cache = get_entitlement_cache()
+    entitlement = entitlement_cache.get(uid)
+    if entitlement is not None:
+        return entitlement
+
+    entitlement = entitlement_from_claims(decoded_token)
+    if entitlement is not None:
+        entitlement_cache.set(uid, entitlement, ttl=decoded_token.get('exp', time.time() + entitlement_cache.ttl) - time.time())
+        return entitlement
+
+    entitlement = entitlement_from_mirror(uid) or NO_ENTITLEMENT
+    entitlement_cache.set(uid, entitlement)
+    return entitlement
+
+
+# ---------------------------------------- INVALIDATION ---------------------------------------- #
+def invalidate_entitlement(uid: str) -> None:
+    """
+    Forget the cached entitlement of a user (it is recomputed on its next request).
+    """
+    get_entitlement_cache().invalidate([uid])
+
+
+def refresh_entitlement(uid: str) -> Union[Entitlement, None]:
+    """
+    Recompute the entitlement of a user from the local mirror and cache it.
+
+    When nothing is mirrored for the user yet, the cached entitlement is dropped instead.
+    """
+    entitlement = entitlement_from_mirror(uid)
+    if entitlement is None:
+        invalidate_entitlement(uid)
+    else:
+        get_entitlement_cache().set(uid, entitlement)
+    return entitlement
+
+
+def refresh_subscription_entitlement(subscription) -> None:
+    """
+    Refresh the entitlement of the user of a Stripe subscription (called by the webhooks).
+
+    Errors are logged: a cache failure must not fail the webhook.
+    """
+    uid = (subscription.get('metadata') or {}).get('uid')
+    if not uid:
+        return
+    try:
+        refresh_entitlement(uid)
+    except Exception as e:
+        logger.error(f"Error refreshing the entitlement of {uid}: {e}")
@@ -1,8 +1,10 @@
 import stripe
 import json
-from typing import Union, List, Dict, Any
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Union, List, Dict, Any, Tuple
 # Drf Easily Saas
-from drf_easily_saas.settings import AUTH_PROVIDER, PAYMENT_PROVIDER, STRIPE_CONFIG, EASILY_CONFIG, FRONTEND_URL
+from drf_easily_saas import settings as easily_settings
 
 # Drf Easily Saas exceptions
 from drf_easily_saas.exceptions.stripe import StripePaymentProcessingError
@@ -11,26 +13,35 @@ from drf_easily_saas.schemas.claims import FirebaseClaimsPayment, SupabaseClaims
 
 # User methods and classes
 from drf_easily_saas.models import User, StripeSubscriptionModel
+from drf_easily_saas.payment.stripe.client import get_stripe_client
+from drf_easily_saas.payment.stripe.dedup import get_processed_events
+from drf_easily_saas.payment.stripe.registry import WebhookHandlerRegistry, stripe_webhook_handler
+from drf_easily_saas.payment.stripe.mirror import mirror_event
+from drf_easily_saas.payment.stripe.sync.customers import link_customer_user
+from drf_easily_saas.payment.entitlements import invalidate_entitlement, refresh_subscription_entitlement
+from drf_easily_saas.auth.firebase.claims import get_claims_coalescer
+
+logger = logging.getLogger(__name__)
 
 
 # Ici je vais créer une classe qui va gérer les paiements avec Stripe et LemonSqueezy, 
 # aussi elle gérera la synchronisation des utilisateurs avec le provider d'authentification défini dans les settings.
 class PaymentManager:
     def __init__(self):
-        self.payment_provider = PAYMENT_PROVIDER
-        self.auth_provider = AUTH_PROVIDER
+        self.payment_provider = easily_settings.PAYMENT_PROVIDER
+        self.auth_provider = easily_settings.AUTH_PROVIDER
 
 
-class StripeManager(PaymentManager):
+class StripeManager(PaymentManager, WebhookHandlerRegistry):
     def __init__(self):
-        self.config = STRIPE_CONFIG
-        self.frontend_url = FRONTEND_URL
+        self.config = easily_settings.STRIPE_CONFIG
+        self.frontend_url = easily_settings.FRONTEND_URL
         self.webhook_verif_strategy = self.config.webhook_verif_strategy
         self.endpoint_secret = self.config.endpoint_secret
         self.public_key = self.config.public_key
 
-        # Initialize Stripe
-        stripe.api_key = self.config.secret_key
+        # Every Stripe call goes through the pooled process-wide client
+        self.client = get_stripe_client()
         super().__init__()
 
 
@@ -47,7 +58,7 @@ class StripeManager(PaymentManager):
             print(subscription_schema_valid.to_dict())
             # Add user informations to metadata if not already present
             # BUG: You did not provide an API key. You need to provide your API key in the Authorization header,
-            session = stripe.checkout.Session.create(**subscription_schema_valid.to_dict())
+            session = self.client.checkout.sessions.create(params=subscription_schema_valid.to_dict())
         except stripe.error.StripeError as e:
             print(e)
             raise StripePaymentProcessingError(str(e))
@@ -74,7 +85,7 @@ class StripeManager(PaymentManager):
         """
         try:
             event = stripe.Event.construct_from(
-                json.loads(payload), stripe.api_key
+                json.loads(payload), self.config.secret_key
             )
         except ValueError as e:
             # Invalid payload
@@ -103,46 +114,70 @@ class StripeManager(PaymentManager):
     # Webhooks handler
     # ---------------- #
     def handle_stripe_event(self, event: dict):
-        event_type = self._normalize_event_type(event['type'])
-        event_data = event['data']['object']
+        """
+        Run the handlers registered for the event type.
 
-        handler = getattr(self, f"handle_{event_type}", None)
-        
-        if handler is None:
-            raise Exception(f"Webhook handler for {event_type} not found")
+        Event types without handler are acknowledged and ignored, so Stripe does not retry them.
+        A handler fails by raising or by returning None: the event is then released and
+        StripePaymentProcessingError is raised, so Stripe (or the inbox worker) delivers it again.
+        A delivery of an event still processed elsewhere raises too, and is acknowledged only
+        once the event is done.
+        """
+        handlers = self.get_handlers(event['type'])
+        if not handlers:
+            logger.debug(f"No webhook handler for {event['type']}, event {event['id']} ignored")
+            return None
+
+        # Stripe delivers at least once: skip the events already handled
+        processed_events = get_processed_events()
+        if not processed_events.claim(event['id'], event['type']):
+            logger.debug(f"Stripe event {event['id']} already processed, skipped")
+            return None
 
-        return handler(event_data)
+        try:
+            # Claims updates of the event are written before it is remembered, failures raise
+            with get_claims_coalescer().batch():
+                results = [handler(self, event) for handler in handlers]
+        except Exception:
+            processed_events.release(event['id'])
+            raise
+        if any(result is None for result in results):
+            processed_events.release(event['id'])
+            raise StripePaymentProcessingError(f"Stripe event {event['id']} ({event['type']}) could not be handled")
+        processed_events.remember(event['id'])
+        return results[0]
 
     # Handle the event Checkouts
     # -------------------------------------------- #
-    def handle_checkout_session_async_payment_failed(self, session):
+    @stripe_webhook_handler('checkout.session.async_payment_failed')
+    def handle_checkout_session_async_payment_failed(self, event):
         print('Payment failed')
         # Traitez l'échec du paiement ici
         return True
 
-    def handle_checkout_session_async_payment_succeeded(self, session):
+    @stripe_webhook_handler('checkout.session.async_payment_succeeded')
+    def handle_checkout_session_async_payment_succeeded(self, event):
         print('Payment succeeded')
         # Traitez la réussite du paiement ici
         return True
 
-    def handle_checkout_session_completed(self, event_data) -> Union[StripeSubscriptionModel, None]:
-        session_ = event_data
+    @stripe_webhook_handler('checkout.session.completed')
+    def handle_checkout_session_completed(self, event) -> Union[StripeSubscriptionModel, None]:
+        session_ = event['data']['object']
         # Mets à jour le profile de l'utilisateur dans Firebase
         uid = session_['metadata']['uid']
-        subscription_id = session_['subscription']
-
-        # [Stripe] Add uid in customer metadata
-        customer = self._add_customer_metadata(session_['customer'], {'uid': uid})
+        subscription_id = self._object_id(session_['subscription'])
 
-        # [Stripe] ajoute les metadata à l'abonnement de l'utilisateur dans Stripe
-        # Ajoute: uid
-        subscription = self._add_subscribtion_meta(subscription_id, {'uid': uid})
+        # [Stripe] Add uid in customer and subscription metadata
+        customer, subscription = self._add_checkout_metadata(session_, {'uid': uid})
+        # Link the mirrored customer to the user (otherwise linked when its event is mirrored)
+        link_customer_user(self._object_id(customer), uid)
+        # The subscription events that follow write the new entitlement
+        invalidate_entitlement(uid)
 
         # Selon la configuration mise en place pour le provider d'authentification
         # Ajoute les claims au bon provider
-        if self.auth_provider == "cognito":
-            pass
-        elif self.auth_provider == "firebase":
+        if self.auth_provider == "firebase":
             # [Firebase] Ajoute les custom claims au user dans Firebase
             # Cela aura pour effet de mettre à jour le token de l'utilisateur et de le deconnecter de toutes ses sessions
             custom_claims = FirebaseClaimsPayment(
@@ -158,7 +193,7 @@ class StripeManager(PaymentManager):
                 print('Error adding subscription to the database')
                 return None
         elif self.auth_provider == "supabase":
-            # [Supabase] Ajoute les custom claims au user dans Supabase via user metadata
+            # [Supabase] Ajoute les custom claims au user dans Supabase via app metadata
             custom_claims = SupabaseClaimsPayment(
                 status=subscription.status,
                 customer_id=customer.id,
@@ -172,30 +207,50 @@ class StripeManager(PaymentManager):
                 print('Error adding subscription to the database')
                 return None
         else:
-            print("Auth provider not matching")
-            return None
+            # No claims for the other providers (cognito, keycloak, auth0): the entitlement is read from the mirror
+            logger.debug(f"No subscription claims for auth provider {self.auth_provider}, event {event['id']} acknowledged")
+            return subscription
 
-    def handle_checkout_session_expired(self, session):
+    @stripe_webhook_handler('checkout.session.expired')
+    def handle_checkout_session_expired(self, event):
         print('Payment expired')
         # Traitez l'expiration du paiement ici
-        return None
+        return True
 
     # -------------------------------------------- #
     # Handle the event Subscriptions
     # -------------------------------------------- #
-    def handle_customer_subscription_created(self, subscription):
+    @stripe_webhook_handler('customer.subscription.created')
+    def handle_customer_subscription_created(self, event):
         print('Subscription created')
-        # Traitez la création de l'abonnement ici
-        return True
+        written = self._mirror_event(event)
+        refresh_subscription_entitlement(event['data']['object'])
+        return written
 
-    def handle_customer_subscription_updated(self, subscription):
+    @stripe_webhook_handler('customer.subscription.updated')
+    def handle_customer_subscription_updated(self, event):
         print('Subscription updated')
-        # Traitez la mise à jour de l'abonnement ici
-        return True
+        written = self._mirror_event(event)
+        refresh_subscription_entitlement(event['data']['object'])
+        return written
+
+    @stripe_webhook_handler(
+        'customer.subscription.paused',
+        'customer.subscription.resumed',
+        'customer.subscription.pending_update_applied',
+        'customer.subscription.pending_update_expired',
+    )
+    def handle_customer_subscription_changed(self, event):
+        written = self._mirror_event(event)
+        refresh_subscription_entitlement(event['data']['object'])
+        return written
 
-    def handle_customer_subscription_deleted(self, event_data):
+    @stripe_webhook_handler('customer.subscription.deleted')
+    def handle_customer_subscription_deleted(self, event):
         print('Subscription deleted')
-        subscription = event_data
+        subscription = event['data']['object']
+        mirror_event(event)
+        refresh_subscription_entitlement(subscription)
 
         # Mets à jour le profile de l'utilisateur dans Firebase
         uid = subscription['metadata']['uid']
@@ -203,9 +258,7 @@ class StripeManager(PaymentManager):
 
         # Selon la configuration mise en place pour le provider d'authentification
         # Ajoute les claims au bon provider
-        if self.auth_provider == "cognito":
-            pass
-        elif self.auth_provider == "firebase":
+        if self.auth_provider == "firebase":
             # [Firebase] Ajoute les custom claims au user dans Firebase
             # Cela aura pour effet de mettre à jour le token de l'utilisateur et de le deconnecter de toutes ses sessions
             custom_claims = FirebaseClaimsPayment(
@@ -222,7 +275,7 @@ class StripeManager(PaymentManager):
                 print('Error adding subscription to the state')
                 return None
         elif self.auth_provider == "supabase":
-            # [Supabase] Ajoute les custom claims au user dans Supabase via user metadata
+            # [Supabase] Ajoute les custom claims au user dans Supabase via app metadata
             custom_claims = SupabaseClaimsPayment(
                 status=subscription.status,
                 customer_id=subscription.customer,
@@ -237,38 +290,110 @@ class StripeManager(PaymentManager):
                 print('Error adding subscription to the state')
                 return None
         else:
-            print("Auth provider not matching")
-            return None
+            # No claims for the other providers (cognito, keycloak, auth0): the entitlement is read from the mirror
+            logger.debug(f"No subscription claims for auth provider {self.auth_provider}, event {event['id']} acknowledged")
+            return subscription
+
+    # -------------------------------------------- #
+    # Handle the event Customers, Products, Prices and Invoices
+    # -------------------------------------------- #
+    # The event payload holds the whole object: it is written to the local mirror without API call
+    @stripe_webhook_handler('customer.created', 'customer.updated', 'customer.deleted')
+    def handle_customer(self, event):
+        return self._mirror_event(event)
+
+    @stripe_webhook_handler('product.created', 'product.updated', 'product.deleted')
+    def handle_product(self, event):
+        return self._mirror_event(event)
+
+    @stripe_webhook_handler(
+        'price.created', 'price.updated', 'price.deleted',
+        'plan.created', 'plan.updated', 'plan.deleted',
+    )
+    def handle_price(self, event):
+        return self._mirror_event(event)
+
+    @stripe_webhook_handler(
+        'invoice.created',
+        'invoice.updated',
+        'invoice.finalized',
+        'invoice.finalization_failed',
+        'invoice.paid',
+        'invoice.payment_failed',
+        'invoice.payment_succeeded',
+        'invoice.payment_action_required',
+        'invoice.marked_uncollectible',
+        'invoice.voided',
+        'invoice.sent',
+        'invoice.deleted',
+    )
+    def handle_invoice(self, event):
+        return self._mirror_event(event)
 
     # -------------------------------------------- #
     # Private methods
     # -------------------------------------------- #
-    # _ Subscription methods
-    def _add_subscribtion_meta(self, subscription_id: int , metadata: dict) -> Union[stripe.Subscription, None]:
-        subscription = stripe.Subscription.retrieve(subscription_id)
-        subscription.metadata = metadata
-        subscription.save()
-        if subscription.metadata == metadata:
+    # _ Checkout methods
+    def _add_checkout_metadata(self, session, metadata: dict) -> Tuple[Union[stripe.Customer, None], Union[stripe.Subscription, None]]:
+        """
+        Add metadata to the customer and the subscription of a checkout session.
+
+        Objects expanded on the session that already carry the metadata are used as is,
+        the others are updated with one `modify` call each, sent concurrently.
+        """
+        customer = session['customer']
+        subscription = session['subscription']
+        futures = {}
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            if not self._has_metadata(customer, metadata):
+                futures['customer'] = executor.submit(self._add_customer_metadata, self._object_id(customer), metadata)
+            if not self._has_metadata(subscription, metadata):
+                futures['subscription'] = executor.submit(self._add_subscribtion_meta, self._object_id(subscription), metadata)
+        if 'customer' in futures:
+            customer = futures['customer'].result()
+        if 'subscription' in futures:
+            subscription = futures['subscription'].result()
+        return customer, subscription
+
+    # _ Subscription methods
+    def _add_subscribtion_meta(self, subscription_id: str, metadata: dict) -> Union[stripe.Subscription, None]:
+        subscription = self.client.subscriptions.update(subscription_id, params={'metadata': metadata})
+        if self._has_metadata(subscription, metadata):
             return subscription
         return None
     
     def _get_subscribtion_meta(self, subscription_id: int) -> Union[stripe.Subscription, None]:
-        subscription = stripe.Subscription.retrieve(subscription_id)
+        subscription = self.client.subscriptions.retrieve(subscription_id)
         return subscription.metadata
     
     # _ Customer methods
-    def _add_customer_metadata(self, customer_id: int, metadata: dict) -> Union[stripe.Customer, None]:
-        customer = stripe.Customer.retrieve(customer_id)
-        customer.metadata = metadata
-        customer.save()
-        if customer.metadata == metadata:
+    def _add_customer_metadata(self, customer_id: str, metadata: dict) -> Union[stripe.Customer, None]:
+        customer = self.client.customers.update(customer_id, params={'metadata': metadata})
+        if self._has_metadata(customer, metadata):
             return customer
         return None
     
     def _get_customer_metadata(self, customer_id: int) -> Union[stripe.Customer, None]:
-        customer = stripe.Customer.retrieve(customer_id)
+        customer = self.client.customers.retrieve(customer_id)
         return customer.metadata
 
     # _ Utils
-    def _normalize_event_type(self, event_type: str) -> str:
-        return event_type.replace('.', '_')
\ No newline at end of file
+    @staticmethod
+    def _mirror_event(event) -> bool:
+        # Objects the mirror does not keep (one-time prices) are not a failure
+        written = mirror_event(event)
+        return True if written is None else written
+
+    @staticmethod
+    def _object_id(value) -> Union[str, None]:
+        # Expandable fields hold either an id or the expanded object
+        if isinstance(value, dict):
+            return value['id']
+        return value
+
+    @staticmethod
+    def _has_metadata(stripe_object, metadata: dict) -> bool:
+        if not isinstance(stripe_object, dict):
+            return False
+        current = stripe_object.get('metadata') or {}
+        return all(current.get(key) == value for key, value in metadata.items())
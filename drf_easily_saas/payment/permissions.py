@@ -0,0 +1,46 @@
+from typing import Iterable
+
+# Django
+from rest_framework import permissions
+
+# From package
+from drf_easily_saas.payment.entitlements import Entitlement, get_entitlement
+
+
+# ---------------------------------------- PERMISSIONS ---------------------------------------- #
+class HasActiveSubscription(permissions.BasePermission):
+    """
+    Allow users with an active (or trialing) subscription.
+
+    The entitlement is read from the entitlement cache: no query once it is cached.
+    """
+    message = {'error': 'An active subscription is required.'}
+
+    def has_permission(self, request, view):
+        if not request.user or not request.user.is_authenticated:
+            return False
+        return self.has_entitlement(get_entitlement(request.user, request.auth), view)
+
+    def has_entitlement(self, entitlement: Entitlement, view) -> bool:
+        return entitlement.is_active
+
+
+class HasPlan(HasActiveSubscription):
+    """
+    Allow users with an active subscription to one of the required plans (price ids).
+
+    The plans are given with `HasPlan.of(...)` or by the `required_plans` attribute of the view.
+
+    Usage:
+        permission_classes = [HasPlan.of('price_pro', 'price_team')]
+    """
+    message = {'error': 'Your subscription does not include this feature.'}
+    plans: Iterable[str] = ()
+
+    @classmethod
+    def of(cls, *plans: str):
+        return type(cls.__name__, (cls,), {'plans': frozenset(plans)})
+
+    def has_entitlement(self, entitlement: Entitlement, view) -> bool:
+        plans = self.plans or getattr(view, 'required_plans', ())
+        return entitlement.has_plan(*plans)
@@ -0,0 +1,67 @@
+import threading
+from typing import Union
+
+import requests
+import stripe
+from requests.adapters import HTTPAdapter
+
+# From package
+from drf_easily_saas import settings as easily_settings
+
+
+# -------------------------------------------- #
+# Stripe client
+# -------------------------------------------- #
+def build_stripe_client(config=None) -> stripe.StripeClient:
+    """
+    Build a StripeClient sending every request through one pooled HTTP session.
+
+    The session keeps its connections alive between calls and is shared by all the
+    threads of the process (sync workers, webhook workers), up to `http_pool_size`
+    connections. Failed requests are retried by stripe-python with an exponential,
+    jittered backoff.
+
+    Args:
+    - config (StripeConfig): Stripe settings (keys, timeouts, retries, pool size), STRIPE_CONFIG by default
+    """
+    config = config or easily_settings.STRIPE_CONFIG
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=config.http_pool_size, max_retries=0)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+    http_client = stripe.RequestsClient(
+        timeout=(config.http_connect_timeout, config.http_read_timeout),
+        session=session,
+    )
+    base_addresses = {'api': config.api_base} if config.api_base else {}
+    return stripe.StripeClient(
+        config.secret_key,
+        base_addresses=base_addresses,
+        max_network_retries=config.http_max_retries,
+        http_client=http_client,
+    )
+
+
+_stripe_client = None
+_stripe_client_lock = threading.Lock()
+
+def get_stripe_client() -> stripe.StripeClient:
+    """
+    Return the process-wide StripeClient, built on first use.
+    """
+    global _stripe_client
+    if _stripe_client is None:
+        with _stripe_client_lock:
+            if _stripe_client is None:
+                _stripe_client = build_stripe_client()
+    return _stripe_client
+
+
+def reset_stripe_client(client: Union[stripe.StripeClient, None] = None) -> None:
+    """
+    Replace the process-wide StripeClient (None rebuilds it from the settings on next use).
+    """
+    global _stripe_client
+    with _stripe_client_lock:
+        _stripe_client = client
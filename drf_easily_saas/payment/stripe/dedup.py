@@ -0,0 +1,124 @@
+import logging
+from datetime import timedelta
+from typing import Union
+
+# Django
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+# From package
+from drf_easily_saas import settings as easily_settings
+from drf_easily_saas.models import StripeProcessedEventModel
+from drf_easily_saas.exceptions.stripe import StripePaymentProcessingError
+
+logger = logging.getLogger(__name__)
+
+# -------------------------------------------- #
+# Constants
+# -------------------------------------------- #
+# A processing claim older than this (worker killed mid-handler) can be taken over.
+# Shorter than the inbox PROCESSING_TIMEOUT, so a reclaimed inbox entry takes the claim over.
+CLAIM_LEASE = timedelta(minutes=5)
+
+
+# -------------------------------------------- #
+# Processed events index
+# -------------------------------------------- #
+class ProcessedEventIndex:
+    """
+    Remember the Stripe events already handled so redeliveries are skipped.
+
+    An event is claimed by inserting its id in StripeProcessedEventModel with the
+    `processing` status: the primary key makes concurrent deliveries of the same event
+    fail on the database, so only one of them runs the handler. The claim becomes
+    `done` once the handlers succeeded (`remember`), or is deleted when they failed
+    (`release`). A `processing` claim left by a killed worker is taken over once its
+    lease expired. An optional Django cache answers the common duplicate case
+    without a query.
+
+    Args:
+    - cache_alias (str): Django cache alias used in front of the database (None disables it)
+    - retention_days (int): Days an event id is remembered
+    """
+    key_prefix = 'drf_easily_saas:stripe_event:'
+
+    def __init__(self, cache_alias: Union[str, None] = None, retention_days: int = 30):
+        self.cache_alias = cache_alias
+        self.retention = timedelta(days=retention_days)
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias] if self.cache_alias else None
+
+    def claim(self, event_id: str, event_type: str, lease: timedelta = CLAIM_LEASE) -> bool:
+        """
+        Claim the event for processing, return False when it was already processed.
+
+        Raises StripePaymentProcessingError while another delivery holds a live claim,
+        so this delivery is retried instead of acknowledged.
+        """
+        if self.cache is not None and self.cache.get(self.key_prefix + event_id):
+            return False
+        now = timezone.now()
+        try:
+            with transaction.atomic():
+                StripeProcessedEventModel.objects.create(id=event_id, type=event_type, claimed_at=now)
+            return True
+        except IntegrityError:
+            pass
+
+        # Take over the claim of a worker killed mid-handler
+        if StripeProcessedEventModel.objects.filter(
+            id=event_id,
+            status=StripeProcessedEventModel.Status.PROCESSING,
+            claimed_at__lt=now - lease,
+        ).update(claimed_at=now):
+            logger.warning(f"Stripe event {event_id} claim expired, taken over")
+            return True
+        if StripeProcessedEventModel.objects.filter(id=event_id, status=StripeProcessedEventModel.Status.DONE).exists():
+            self.cache_done(event_id)
+            return False
+        raise StripePaymentProcessingError(f"Stripe event {event_id} is being processed")
+
+    def release(self, event_id: str) -> None:
+        """
+        Forget an event whose handler failed so the next delivery runs it again.
+        """
+        StripeProcessedEventModel.objects.filter(id=event_id).delete()
+        if self.cache is not None:
+            self.cache.delete(self.key_prefix + event_id)
+
+    def remember(self, event_id: str) -> None:
+        """
+        Mark a claimed event as processed.
+        """
+        StripeProcessedEventModel.objects.filter(id=event_id).update(status=StripeProcessedEventModel.Status.DONE)
+        self.cache_done(event_id)
+
+    def cache_done(self, event_id: str) -> None:
+        if self.cache is not None:
+            self.cache.set(self.key_prefix + event_id, True, timeout=int(self.retention.total_seconds()))
+
+    def purge(self, retention_days: Union[int, None] = None) -> int:
+        """
+        Delete the event ids older than the retention, return the number of rows deleted.
+        """
+        retention = timedelta(days=retention_days) if retention_days is not None else self.retention
+        deleted, _ = StripeProcessedEventModel.objects.filter(processed_at__lt=timezone.now() - retention).delete()
+        return deleted
+
+
+_processed_events = None
+
+def get_processed_events() -> ProcessedEventIndex:
+    """
+    Return the process-wide processed events index built from the Stripe config.
+    """
+    global _processed_events
+    if _processed_events is None:
+        _processed_events = ProcessedEventIndex(
+            cache_alias=easily_settings.STRIPE_CONFIG.event_dedup_cache,
+            retention_days=easily_settings.STRIPE_CONFIG.event_retention_days,
+        )
+    return _processed_events
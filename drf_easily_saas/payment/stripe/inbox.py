@@ -0,0 +1,133 @@
+import random
+import stripe
+import logging
+import traceback
+from datetime import timedelta
+from typing import Any, Dict, List, Tuple
+
+# Django
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+# From package
+from drf_easily_saas import settings as easily_settings
+from drf_easily_saas.models import StripeWebhookInboxModel
+
+logger = logging.getLogger(__name__)
+
+# -------------------------------------------- #
+# Constants
+# -------------------------------------------- #
+# Events left in processing longer than this (crashed worker) are claimed again
+PROCESSING_TIMEOUT = timedelta(minutes=10)
+# Upper bound of the delay between two attempts
+MAX_RETRY_DELAY = timedelta(hours=6)
+
+
+# -------------------------------------------- #
+# Ingestion
+# -------------------------------------------- #
+def enqueue_event(event: Dict[str, Any]) -> Tuple[StripeWebhookInboxModel, bool]:
+    """
+    Persist a verified Stripe event in the inbox.
+
+    Stripe redeliveries of an event already in the inbox are ignored.
+
+    Returns:
+    - (entry, created)
+    """
+    return StripeWebhookInboxModel.objects.get_or_create(
+        id=event['id'],
+        defaults={'type': event['type'], 'payload': event},
+    )
+
+
+# -------------------------------------------- #
+# Worker
+# -------------------------------------------- #
+def claim_events(batch_size: int = 50) -> List[StripeWebhookInboxModel]:
+    """
+    Lock the due events and mark them as processing.
+
+    Rows are selected with SKIP LOCKED where the database supports it, so several
+    workers can drain the inbox without claiming the same event.
+    """
+    now = timezone.now()
+    due = (
+        Q(status__in=[StripeWebhookInboxModel.Status.PENDING, StripeWebhookInboxModel.Status.RETRY], next_attempt_at__lte=now)
+        | Q(status=StripeWebhookInboxModel.Status.PROCESSING, updated_at__lt=now - PROCESSING_TIMEOUT)
+    )
+    with transaction.atomic():
+        entries = list(
+            StripeWebhookInboxModel.objects
+            .select_for_update(skip_locked=True)
+            .filter(due)
+            .order_by('next_attempt_at')[:batch_size]
+        )
+        for entry in entries:
+            entry.status = StripeWebhookInboxModel.Status.PROCESSING
+            entry.attempts += 1
+            # bulk_update skips auto_now, the claim time is used by PROCESSING_TIMEOUT
+            entry.updated_at = now
+        StripeWebhookInboxModel.objects.bulk_update(entries, ['status', 'attempts', 'updated_at'])
+    return entries
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """
+    Exponential backoff with jitter: a random delay between backoff and backoff * 2^(attempts - 1).
+    """
+    backoff = easily_settings.STRIPE_CONFIG.webhook_retry_backoff
+    ceiling = min(backoff * 2 ** (attempts - 1), MAX_RETRY_DELAY.total_seconds())
+    return timedelta(seconds=random.uniform(backoff, max(ceiling, backoff)))
+
+
+def process_entry(entry: StripeWebhookInboxModel, stripe_manager) -> StripeWebhookInboxModel:
+    """
+    Run the webhook handler of a claimed event and record the outcome.
+
+    A failed event is scheduled again with backoff, after `webhook_max_attempts`
+    attempts it is dead-lettered and kept with its last error.
+    """
+    try:
+        event = stripe.Event.construct_from(entry.payload, easily_settings.STRIPE_CONFIG.secret_key)
+        stripe_manager.handle_stripe_event(event)
+    except Exception as e:
+        entry.last_error = traceback.format_exc()
+        if entry.attempts >= easily_settings.STRIPE_CONFIG.webhook_max_attempts:
+            entry.status = StripeWebhookInboxModel.Status.DEAD
+            logger.error(f"Stripe event {entry.id} ({entry.type}) dead-lettered after {entry.attempts} attempts: {e}")
+        else:
+            entry.status = StripeWebhookInboxModel.Status.RETRY
+            entry.next_attempt_at = timezone.now() + retry_delay(entry.attempts)
+            logger.warning(f"Stripe event {entry.id} ({entry.type}) failed, attempt {entry.attempts}: {e}")
+    else:
+        entry.status = StripeWebhookInboxModel.Status.DONE
+        entry.last_error = None
+    entry.save(update_fields=['status', 'next_attempt_at', 'last_error', 'updated_at'])
+    return entry
+
+
+def purge_inbox(retention_days: int) -> int:
+    """
+    Delete the done and dead-lettered events last updated before the retention, return the number of rows deleted.
+
+    Pending, retried and processing events are kept whatever their age.
+    """
+    deleted, _ = StripeWebhookInboxModel.objects.filter(
+        status__in=[StripeWebhookInboxModel.Status.DONE, StripeWebhookInboxModel.Status.DEAD],
+        updated_at__lt=timezone.now() - timedelta(days=retention_days),
+    ).delete()
+    return deleted
+
+
+def requeue_dead_events() -> int:
+    """
+    Put the dead-lettered events back in the queue with a fresh attempts counter.
+    """
+    return StripeWebhookInboxModel.objects.filter(status=StripeWebhookInboxModel.Status.DEAD).update(
+        status=StripeWebhookInboxModel.Status.PENDING,
+        attempts=0,
+        next_attempt_at=timezone.now(),
+    )
@@ -0,0 +1,207 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Type, Union
+
+# Django
+from django.db import IntegrityError, models, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+# From package
+from drf_easily_saas.models import (
+    StripeCustomerModel,
+    StripeInvoiceModel,
+    StripeMirrorTombstoneModel,
+    StripePlanModel,
+    StripeProductModel,
+    StripeSubscriptionModel,
+)
+from drf_easily_saas.payment.stripe.sync.engine import stripe_timestamp
+from drf_easily_saas.payment.stripe.sync.customers import link_customer_users, normalize_customer
+from drf_easily_saas.payment.stripe.sync.products import normalize_product
+from drf_easily_saas.payment.stripe.sync.plans import normalize_plan, normalize_price
+from drf_easily_saas.payment.stripe.sync.subscriptions import normalize_subscription, write_subscription_items
+from drf_easily_saas.payment.stripe.sync.invoices import normalize_invoice
+
+logger = logging.getLogger(__name__)
+
+# -------------------------------------------- #
+# Mirror targets
+# -------------------------------------------- #
+# Keyed by the `object` attribute of the event payload.
+# `parents` lists (field, model, required): a missing required parent gets a placeholder
+# row filled by its own events or the next sync, a missing optional parent is set to None.
+# `on_write` optionally writes what depends on a written row (subscription items, customer user link).
+MIRROR_TARGETS = {
+    'customer': {
+        'model': StripeCustomerModel,
+        'normalize': normalize_customer,
+        'parents': [],
+        'on_write': link_customer_users,
+    },
+    'product': {
+        'model': StripeProductModel,
+        'normalize': normalize_product,
+        'parents': [],
+    },
+    'plan': {
+        'model': StripePlanModel,
+        'normalize': normalize_plan,
+        'parents': [('product_id', StripeProductModel, True)],
+    },
+    'price': {
+        'model': StripePlanModel,
+        'normalize': normalize_price,
+        'parents': [('product_id', StripeProductModel, True)],
+    },
+    'subscription': {
+        'model': StripeSubscriptionModel,
+        'normalize': normalize_subscription,
+        'parents': [('customer_id', StripeCustomerModel, True)],
+        'on_write': write_subscription_items,
+    },
+    'invoice': {
+        'model': StripeInvoiceModel,
+        'normalize': normalize_invoice,
+        'parents': [
+            ('customer_id', StripeCustomerModel, True),
+            ('subscription_id', StripeSubscriptionModel, False),
+        ],
+    },
+}
+
+
+def _placeholder(model: Type[models.Model], event_created: datetime) -> Dict[str, Any]:
+    if model is StripeProductModel:
+        return {'name': '', 'object': 'product', 'created': event_created, 'updated': event_created}
+    return {'email': ''}
+
+
+# -------------------------------------------- #
+# Ordered writes
+# -------------------------------------------- #
+def _is_newer(event_created: datetime) -> Q:
+    return Q(last_event_created__isnull=True) | Q(last_event_created__lte=event_created)
+
+
+def _tombstones(model: Type[models.Model], object_id: str):
+    return StripeMirrorTombstoneModel.objects.filter(model=model._meta.label, object_id=object_id)
+
+
+def write_through(model: Type[models.Model], row: Dict[str, Any], event_created: datetime) -> bool:
+    """
+    Upsert `row` unless the mirror already holds the state of a more recent event.
+
+    The update is conditional on `last_event_created`, so events handled out of
+    order never overwrite newer state. A row is not created again when its deletion
+    was mirrored from a more recent event.
+
+    Returns:
+    - written (bool): False when the event was older than the stored state or deletion
+    """
+    fields = {field: value for field, value in row.items() if field != 'id'}
+    fields['last_event_created'] = event_created
+    if model.objects.filter(_is_newer(event_created), id=row['id']).update(**fields):
+        return True
+    if model.objects.filter(id=row['id']).exists():
+        return False
+    if _tombstones(model, row['id']).filter(last_event_created__gte=event_created).exists():
+        return False
+    try:
+        with transaction.atomic():
+            model.objects.create(id=row['id'], **fields)
+    except IntegrityError:
+        if not model.objects.filter(id=row['id']).exists():
+            raise
+        # Created concurrently by another event of the same object
+        return write_through(model, row, event_created)
+    return True
+
+
+def delete_through(model: Type[models.Model], object_id: str, event_created: datetime) -> bool:
+    """
+    Delete a mirror row unless it holds the state of a more recent event.
+
+    A tombstone keeps the deletion (even of a row never mirrored), so the older
+    events of the object delivered afterwards are rejected by `write_through`.
+
+    Returns:
+    - deleted (bool): False when the row holds the state of a more recent event
+    """
+    deleted, _ = model.objects.filter(_is_newer(event_created), id=object_id).delete()
+    if not deleted and model.objects.filter(id=object_id).exists():
+        return False
+    _, created = StripeMirrorTombstoneModel.objects.get_or_create(
+        model=model._meta.label, object_id=object_id, defaults={'last_event_created': event_created},
+    )
+    if not created:
+        _tombstones(model, object_id).filter(last_event_created__lt=event_created).update(last_event_created=event_created)
+    return True
+
+
+def purge_tombstones(retention_days: int) -> int:
+    """
+    Delete the tombstones older than the retention, return the number of rows deleted.
+
+    Stripe stops retrying an event after 3 days, older tombstones reject nothing.
+    """
+    deleted, _ = StripeMirrorTombstoneModel.objects.filter(deleted_at__lt=timezone.now() - timedelta(days=retention_days)).delete()
+    return deleted
+
+
+def _resolve_parents(target: Dict[str, Any], row: Dict[str, Any], event_created: datetime) -> bool:
+    """
+    Create the placeholders of the missing required parents, unset the missing optional ones.
+
+    Returns:
+    - resolved (bool): False when a required parent was deleted
+    """
+    for field, parent_model, required in target['parents']:
+        parent_id = row.get(field)
+        if not parent_id or parent_model.objects.filter(id=parent_id).exists():
+            continue
+        if required:
+            if _tombstones(parent_model, parent_id).exists():
+                logger.info(f"{parent_model.__name__} {parent_id} was deleted, {row['id']} not mirrored")
+                return False
+            parent_model.objects.get_or_create(id=parent_id, defaults=_placeholder(parent_model, event_created))
+            logger.info(f"{parent_model.__name__} {parent_id} not mirrored yet, placeholder created")
+        else:
+            row[field] = None
+    return True
+
+
+# -------------------------------------------- #
+# Webhook write-through
+# -------------------------------------------- #
+def mirror_event(event) -> Union[bool, None]:
+    """
+    Write the object carried by a webhook event in its local mirror model.
+
+    The event payload already holds the full object, no Stripe API call is made.
+
+    Returns:
+    - written (bool): False when a newer state is already stored, None when the object is not mirrored
+    """
+    stripe_object = event['data']['object']
+    target = MIRROR_TARGETS.get(stripe_object.get('object'))
+    if target is None or not stripe_object.get('id'):
+        return None
+    # One-time prices have no plan counterpart
+    if stripe_object['object'] == 'price' and not stripe_object.get('recurring'):
+        return None
+
+    event_created = stripe_timestamp(event['created'])
+    with transaction.atomic():
+        if event['type'].endswith('.deleted') and stripe_object['object'] != 'subscription':
+            return delete_through(target['model'], stripe_object['id'], event_created)
+
+        row = target['normalize'](stripe_object)
+        if not _resolve_parents(target, row, event_created):
+            return False
+        written = write_through(target['model'], row, event_created)
+        if written and 'on_write' in target:
+            target['on_write']([row])
+    if not written:
+        logger.info(f"{event['type']} {event['id']} is older than the mirrored or deleted {stripe_object['id']}, skipped")
+    return written
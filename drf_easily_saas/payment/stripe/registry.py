@@ -0,0 +1,74 @@
+from typing import Any, Callable, Dict, Tuple, Union
+
+# -------------------------------------------- #
+# Webhook handlers registry
+# -------------------------------------------- #
+HANDLER_ATTRIBUTE = '_stripe_event_types'
+
+
+def stripe_webhook_handler(*event_types: str) -> Callable:
+    """
+    Mark a manager method as the handler of one or several Stripe event types.
+
+    Usage:
+        class MyStripeManager(StripeManager):
+            @stripe_webhook_handler('invoice.paid', 'invoice.payment_failed')
+            def handle_invoice(self, event):
+                ...
+    """
+    def decorator(func: Callable) -> Callable:
+        setattr(func, HANDLER_ATTRIBUTE, getattr(func, HANDLER_ATTRIBUTE, ()) + event_types)
+        return func
+    return decorator
+
+
+class WebhookHandlerRegistry:
+    """
+    Build the event type -> handlers table once, when the class is created.
+
+    A subclass inherits the table of its parent and adds its own decorated methods,
+    overriding a handler method keeps its event types. Every class owns a copy of
+    the table: handlers registered on a class apply to it and to the subclasses
+    created afterwards.
+
+    Handlers are called with `(manager, event)`.
+    """
+    _event_handlers: Dict[str, Tuple[Callable[[Any, Any], Any], ...]] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        own = vars(cls)
+        # A method redefined without the decorator keeps the event types of the parent method
+        handlers = {
+            event_type: tuple(own.get(handler.__name__, handler) for handler in existing)
+            for event_type, existing in cls._event_handlers.items()
+        }
+        for name, attr in own.items():
+            for event_type in getattr(attr, HANDLER_ATTRIBUTE, ()):
+                existing = tuple(handler for handler in handlers.get(event_type, ()) if handler.__name__ != name)
+                handlers[event_type] = existing + (attr,)
+        cls._event_handlers = handlers
+
+    @classmethod
+    def register_handler(cls, event_type: str, handler: Union[Callable, None] = None, replace: bool = False):
+        """
+        Register an extra handler for an event type, or replace its handlers with `replace=True`.
+
+        Can be used as a decorator:
+            @StripeManager.register_handler('invoice.paid')
+            def notify_invoice_paid(manager, event):
+                ...
+        """
+        if handler is None:
+            def decorator(func: Callable) -> Callable:
+                cls.register_handler(event_type, func, replace=replace)
+                return func
+            return decorator
+
+        existing = () if replace else cls._event_handlers.get(event_type, ())
+        cls._event_handlers = {**cls._event_handlers, event_type: existing + (handler,)}
+        return handler
+
+    @classmethod
+    def get_handlers(cls, event_type: str) -> Tuple[Callable[[Any, Any], Any], ...]:
+        return cls._event_handlers.get(event_type, ())
@@ -1,25 +1,95 @@
-from datetime import datetime
-from drf_easily_saas import settings
-from drf_easily_saas.models import StripeCustomerModel
 import stripe
+from typing import Any, Dict, Iterable, Iterator, List, Union
+from drf_easily_saas.models import StripeCustomerModel, User
+from drf_easily_saas.payment.stripe.client import get_stripe_client
+from drf_easily_saas.payment.stripe.sync.engine import BatchUpserter, DEFAULT_CHUNK_SIZE, list_params
 
-stripe.api_key = settings.STRIPE_CONFIG.secret_key
 
-def import_stripe_customers(limit: int = 100):
+def normalize_customer(cust) -> Dict[str, Any]:
+    return {
+        'id': cust['id'],
+        'address': cust.get('address'),
+        'description': cust.get('description'),
+        'email': cust.get('email') or '',
+        'metadata': cust.get('metadata', {}),
+        'name': cust.get('name'),
+        'phone': cust.get('phone'),
+        'shipping': cust.get('shipping'),
+    }
+
+def link_customer_users(rows: List[Dict[str, Any]]) -> int:
+    """
+    Link the customer rows to the users whose uid (username) is in their metadata.
+
+    Two queries per call whatever the number of rows. A user can be linked to several
+    customers, the links of its other customers are kept. Rows without uid, or whose
+    user is unknown, are left as they are.
+
+    Returns:
+    - linked (int): Number of customers linked
+    """
+    uids = {row['id']: (row.get('metadata') or {}).get('uid') for row in rows}
+    user_ids = dict(User.objects.filter(username__in={uid for uid in uids.values() if uid}).values_list('username', 'id'))
+    if not user_ids:
+        return 0
+    linked = [
+        StripeCustomerModel(id=customer_id, user_id=user_ids[uid])
+        for customer_id, uid in uids.items()
+        if uid in user_ids
+    ]
+    StripeCustomerModel.objects.bulk_update(linked, ['user'])
+    return len(linked)
+
+def link_customer_user(customer_id: str, uid: str) -> bool:
+    """
+    Link a customer to the user of `uid` (checkout).
+
+    Returns:
+    - linked (bool): False when the user or the customer is not mirrored yet
+    """
+    user_id = User.objects.filter(username=uid).values_list('id', flat=True).first()
+    if user_id is None:
+        return False
+    return StripeCustomerModel.objects.filter(id=customer_id).update(user_id=user_id) > 0
+
+def fetch_stripe_customers(ids: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """
+    Fetch the given customers from Stripe (the list endpoint has no ids filter).
+
+    Deleted and unknown customers are not returned, other Stripe errors are raised.
+    """
+    for customer_id in ids:
+        try:
+            cust = get_stripe_client().customers.retrieve(customer_id)
+        except stripe.InvalidRequestError as e:
+            if e.code != 'resource_missing':
+                raise
+            continue
+        if not cust.get('deleted'):
+            yield normalize_customer(cust)
+
+def import_stripe_customers(
+    limit: int = 100,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    created_gte: Union[int, None] = None,
+    starting_after: Union[str, None] = None,
+):
+    """
+    Stream every Stripe customer into the local mirror.
+
+    Pages are fetched lazily with auto_paging_iter() so memory stays constant.
+    `created_gte` and `starting_after` allow importing large accounts in resumable
+    chunks: on failure, the id of the last written customer is printed and can be
+    passed back as `starting_after`.
+    """
+    upserter = None
     try:
-        customers = stripe.Customer.list(limit=limit)
-        for cust in customers['data']:
-            StripeCustomerModel.objects.update_or_create(
-                id=cust['id'],
-                defaults={
-                    'address': cust.get('address'),
-                    'description': cust.get('description'),
-                    'email': cust.get('email'),
-                    'metadata': cust.get('metadata', {}),
-                    'name': cust.get('name'),
-                    'phone': cust.get('phone'),
-                    'shipping': cust.get('shipping'),
-                }
-            )
+        customers = get_stripe_client().customers.list(params=list_params(limit, created_gte, starting_after))
+        with BatchUpserter(StripeCustomerModel, chunk_size=chunk_size, on_flush=link_customer_users) as upserter:
+            for cust in customers.auto_paging_iter():
+                upserter.add(normalize_customer(cust))
+        return upserter.report()
     except Exception as e:
-        print(f"An error occurred: {e}")
\ No newline at end of file
+        print(f"An error occurred: {e}")
+        if upserter and upserter.last_id:
+            print(f"Resume the import with starting_after={upserter.last_id}")
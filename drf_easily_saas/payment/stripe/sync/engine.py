@@ -0,0 +1,216 @@
+import time
+import logging
+from datetime import datetime, timezone as dt_timezone
+from typing import Any, Callable, Dict, Iterable, List, Set, Type, Union
+
+# Django
+from django.conf import settings as dj_settings
+from django.db import models, transaction
+
+# From package
+from drf_easily_saas.utils.iterables import chunked
+
+logger = logging.getLogger(__name__)
+
+# -------------------------------------------- #
+# Constants
+# -------------------------------------------- #
+DEFAULT_CHUNK_SIZE = 500
+
+
+# -------------------------------------------- #
+# Utils
+# -------------------------------------------- #
+def stripe_timestamp(value: Union[int, None]) -> Union[datetime, None]:
+    """
+    Convert a Stripe unix timestamp to a datetime matching the USE_TZ setting.
+    """
+    if value is None:
+        return None
+    if getattr(dj_settings, 'USE_TZ', False):
+        return datetime.fromtimestamp(value, tz=dt_timezone.utc)
+    return datetime.fromtimestamp(value)
+
+
+def list_params(limit: int = 100, created_gte: Union[int, None] = None, starting_after: Union[str, None] = None, **extra) -> Dict[str, Any]:
+    """
+    Build the parameters of a Stripe list call with optional resume cursors.
+
+    Args:
+    - limit (int): Page size requested from Stripe
+    - created_gte (int): Only list objects created at or after this unix timestamp
+    - starting_after (str): Resume the listing after this object id
+    """
+    params = {'limit': limit, **extra}
+    if created_gte is not None:
+        params['created'] = {'gte': created_gte}
+    if starting_after:
+        params['starting_after'] = starting_after
+    return params
+
+
+# -------------------------------------------- #
+# Batched upsert
+# -------------------------------------------- #
+class BatchUpserter:
+    """
+    Collect normalized rows and write them with one INSERT ... ON CONFLICT per chunk.
+
+    Each chunk is written with `bulk_create(update_conflicts=True, unique_fields=['id'])`
+    inside its own transaction.
+
+    Args:
+    - model (Model): Mirror model receiving the rows
+    - update_fields (List[str]): Fields updated on conflict (default: every key of the rows but `id`)
+    - chunk_size (int): Number of rows written per chunk
+    - on_flush (Callable): Optional `on_flush(rows)` called in the transaction of each chunk (child tables)
+
+    Usage:
+        with BatchUpserter(StripeCustomerModel) as upserter:
+            for customer in customers:
+                upserter.add(normalize_customer(customer))
+        upserter.report()
+    """
+    def __init__(
+        self,
+        model: Type[models.Model],
+        update_fields: Union[List[str], None] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        on_flush: Union[Callable[[List[Dict[str, Any]]], None], None] = None,
+    ):
+        self.model = model
+        self.update_fields = update_fields
+        self.chunk_size = chunk_size
+        self.on_flush = on_flush
+        self._rows: List[Dict[str, Any]] = []
+        self.rows = 0
+        self.chunks = 0
+        self.last_id = None
+        self.seconds = 0.0
+        self._started_at = time.monotonic()
+
+    def add(self, row: Dict[str, Any]) -> None:
+        self._rows.append(row)
+        if len(self._rows) >= self.chunk_size:
+            self.flush()
+
+    def extend(self, rows: Iterable[Dict[str, Any]]) -> None:
+        for row in rows:
+            self.add(row)
+
+    def flush(self) -> None:
+        if not self._rows:
+            return
+        rows, self._rows = self._rows, []
+        update_fields = self.update_fields or [field for field in rows[0] if field != 'id']
+
+        started_at = time.monotonic()
+        with transaction.atomic():
+            self.model.objects.bulk_create(
+                [self.model(**row) for row in rows],
+                update_conflicts=True,
+                unique_fields=['id'],
+                update_fields=update_fields,
+            )
+            if self.on_flush is not None:
+                self.on_flush(rows)
+        self.seconds += time.monotonic() - started_at
+        self.rows += len(rows)
+        self.chunks += 1
+        self.last_id = rows[-1]['id']
+        logger.debug(f"{self.model.__name__}: {self.rows} rows upserted")
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            'model': self.model.__name__,
+            'rows': self.rows,
+            'chunks': self.chunks,
+            'last_id': self.last_id,
+            'write_seconds': round(self.seconds, 3),
+            'total_seconds': round(time.monotonic() - self._started_at, 3),
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+        report = self.report()
+        logger.info(
+            f"{report['model']}: {report['rows']} rows upserted in {report['chunks']} chunks "
+            f"({report['write_seconds']}s writing, {report['total_seconds']}s total)"
+        )
+        return False
+
+
+# -------------------------------------------- #
+# Foreign keys
+# -------------------------------------------- #
+class ParentResolver:
+    """
+    Resolve the parent ids referenced by child rows (plan -> product, subscription -> customer).
+
+    The ids of the parent table are preloaded once with a single `values_list` query
+    (mirror primary keys are the Stripe ids), so resolving a row is an O(1) set lookup.
+    Missing parents can optionally be fetched from Stripe and upserted in a batch: the
+    ids Stripe does not return (deleted parents) are kept in `missing`, the ids of a
+    failed fetch in `failed`.
+
+    Args:
+    - model (Model): Parent mirror model
+    - fetch_missing (Callable): Optional `fetch_missing(ids) -> Iterable[row]` returning normalized parent rows
+    """
+    def __init__(self, model: Type[models.Model], fetch_missing: Union[Callable[[Set[str]], Iterable[Dict[str, Any]]], None] = None):
+        self.model = model
+        self.fetch_missing = fetch_missing
+        self.known = set(model.objects.values_list('id', flat=True).iterator(chunk_size=DEFAULT_CHUNK_SIZE))
+        self.missing: Set[str] = set()
+        self.failed: Set[str] = set()
+        self.fetched = 0
+
+    def resolve(self, ids: Iterable[str]) -> None:
+        unknown = {parent_id for parent_id in ids if parent_id} - self.known - self.missing - self.failed
+        if not unknown:
+            return
+        if self.fetch_missing:
+            try:
+                rows = list(self.fetch_missing(unknown))
+            except Exception as e:
+                logger.warning(f"{self.model.__name__}: fetching {len(unknown)} missing parents failed: {e}")
+                self.failed |= unknown
+                return
+            with BatchUpserter(self.model) as upserter:
+                upserter.extend(rows)
+            self.known.update(row['id'] for row in rows)
+            self.fetched += upserter.rows
+        self.missing |= unknown - self.known
+
+    def __contains__(self, parent_id: str) -> bool:
+        return parent_id in self.known
+
+
+def upsert_children(
+    rows: Iterable[Dict[str, Any]],
+    upserter: BatchUpserter,
+    parent_field: str,
+    resolver: ParentResolver,
+) -> int:
+    """
+    Feed child rows to `upserter`, skipping the rows whose parent cannot be resolved.
+
+    Parents are resolved one chunk of rows at a time so missing ones are fetched in batches.
+
+    Returns:
+    - skipped (int): Number of rows skipped because of a missing parent
+    """
+    skipped = 0
+    for chunk in chunked(rows, upserter.chunk_size):
+        resolver.resolve({row[parent_field] for row in chunk})
+        for row in chunk:
+            if row[parent_field] in resolver:
+                upserter.add(row)
+            else:
+                skipped += 1
+                logger.warning(f"{upserter.model.__name__} {row['id']}: {resolver.model.__name__} {row[parent_field]} not found, skipped")
+    return skipped
@@ -0,0 +1,215 @@
+import logging
+from datetime import timedelta
+from typing import Any, Dict, List, Tuple, Union
+
+# Django
+from django.utils import timezone
+
+# From package
+from drf_easily_saas.models import (
+    StripeCustomerModel,
+    StripePlanModel,
+    StripeProductModel,
+    StripeSubscriptionModel,
+    StripeSyncStateModel,
+)
+from drf_easily_saas.payment.stripe.client import get_stripe_client
+from drf_easily_saas.payment.stripe.mirror import delete_through
+from drf_easily_saas.payment.stripe.sync.engine import (
+    BatchUpserter,
+    DEFAULT_CHUNK_SIZE,
+    ParentResolver,
+    stripe_timestamp,
+    upsert_children,
+)
+from drf_easily_saas.payment.stripe.sync.customers import (
+    fetch_stripe_customers,
+    import_stripe_customers,
+    link_customer_users,
+    normalize_customer,
+)
+from drf_easily_saas.payment.stripe.sync.products import fetch_stripe_products, import_stripe_products, normalize_product
+from drf_easily_saas.payment.stripe.sync.plans import import_stripe_plans, normalize_plan
+from drf_easily_saas.payment.stripe.sync.subscriptions import (
+    import_stripe_subscriptions,
+    normalize_subscription,
+    write_subscription_items,
+)
+
+logger = logging.getLogger(__name__)
+
+
+# -------------------------------------------- #
+# Constants
+# -------------------------------------------- #
+# Stripe keeps events for 30 days, older high-water marks fall back to a full import
+STRIPE_EVENT_RETENTION = timedelta(days=29)
+
+SYNC_TARGETS = {
+    StripeSyncStateModel.ObjectType.CUSTOMER: {
+        'model': StripeCustomerModel,
+        'normalize': normalize_customer,
+        'full_import': import_stripe_customers,
+        'types': ['customer.created', 'customer.updated'],
+        'deleted_types': ['customer.deleted'],
+        'on_flush': link_customer_users,
+    },
+    StripeSyncStateModel.ObjectType.PRODUCT: {
+        'model': StripeProductModel,
+        'normalize': normalize_product,
+        'full_import': import_stripe_products,
+        'types': ['product.created', 'product.updated'],
+        'deleted_types': ['product.deleted'],
+    },
+    StripeSyncStateModel.ObjectType.PLAN: {
+        'model': StripePlanModel,
+        'normalize': normalize_plan,
+        'full_import': import_stripe_plans,
+        'types': ['plan.created', 'plan.updated'],
+        'deleted_types': ['plan.deleted'],
+        'parent': ('product_id', StripeProductModel, fetch_stripe_products),
+    },
+    StripeSyncStateModel.ObjectType.SUBSCRIPTION: {
+        'model': StripeSubscriptionModel,
+        'normalize': normalize_subscription,
+        'full_import': import_stripe_subscriptions,
+        'types': [
+            'customer.subscription.created',
+            'customer.subscription.updated',
+            'customer.subscription.deleted',
+            'customer.subscription.paused',
+            'customer.subscription.resumed',
+        ],
+        'deleted_types': [],
+        'parent': ('customer_id', StripeCustomerModel, fetch_stripe_customers),
+        'on_flush': write_subscription_items,
+    },
+}
+
+
+# -------------------------------------------- #
+# Incremental sync
+# -------------------------------------------- #
+def _latest_event(types: List[str]):
+    events = get_stripe_client().events.list(params={'limit': 1, 'types': types})
+    return events['data'][0] if events['data'] else None
+
+
+def _apply_events(target: Dict[str, Any], state: StripeSyncStateModel, chunk_size: int) -> Tuple[Dict[str, Any], Union[int, None]]:
+    """
+    Replay the events newer than the high-water mark on the local mirror.
+
+    Deletions go through `delete_through`, so they leave tombstones. Parents missing from
+    the mirror are fetched from Stripe. A parent Stripe reports as deleted is final: its
+    children are deleted from the mirror and both are tombstoned. The rows whose parent
+    could not be fetched (Stripe error) are replayed by the next run.
+
+    Returns:
+    - report (dict): Upsert report
+    - retry_from (int): Creation timestamp of the oldest event held for the next run, None when none was
+    """
+    model = target['model']
+    params = {
+        'limit': 100,
+        'types': target['types'] + target['deleted_types'],
+        'created': {'gte': int(state.last_event_created.timestamp())},
+    }
+
+    # Events are listed newest first: the first event seen for an object holds its latest state
+    latest_objects = {}
+    event_created = {}
+    deleted_ids = set()
+    for event in get_stripe_client().events.list(params=params).auto_paging_iter():
+        if event['id'] == state.last_event_id:
+            break
+        stripe_object = event['data']['object']
+        if stripe_object['id'] in latest_objects or stripe_object['id'] in deleted_ids:
+            continue
+        event_created[stripe_object['id']] = event['created']
+        if event['type'] in target['deleted_types']:
+            deleted_ids.add(stripe_object['id'])
+        else:
+            latest_objects[stripe_object['id']] = stripe_object
+
+    rows = [target['normalize'](stripe_object) for stripe_object in latest_objects.values()]
+    retry_from = None
+    with BatchUpserter(model, chunk_size=chunk_size, on_flush=target.get('on_flush')) as upserter:
+        if 'parent' in target:
+            parent_field, parent_model, fetch_missing = target['parent']
+            parents = ParentResolver(parent_model, fetch_missing)
+            upsert_children(rows, upserter, parent_field, parents)
+        else:
+            upserter.extend(rows)
+
+    held = orphans = 0
+    if 'parent' in target:
+        for row in rows:
+            if row[parent_field] in parents:
+                continue
+            if row[parent_field] in parents.failed:
+                held += 1
+                retry_from = event_created[row['id']] if retry_from is None else min(retry_from, event_created[row['id']])
+                continue
+            # The parent was deleted in Stripe, the row can never be written
+            orphans += 1
+            created = stripe_timestamp(event_created[row['id']])
+            delete_through(model, row['id'], created)
+            if row[parent_field]:
+                delete_through(parent_model, row[parent_field], created)
+    for object_id in deleted_ids:
+        delete_through(model, object_id, stripe_timestamp(event_created[object_id]))
+
+    report = upserter.report()
+    report['deleted'] = len(deleted_ids)
+    if 'parent' in target:
+        report['skipped'] = held
+        report['orphans'] = orphans
+        report['parents_fetched'] = parents.fetched
+    return report, retry_from
+
+
+def sync_incremental(object_type: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Dict[str, Any]:
+    """
+    Sync one Stripe object type from its persisted high-water mark.
+
+    Without a mark (first run) or when the mark is older than the Stripe events
+    retention, a full import is done. Otherwise only the objects changed since the
+    last synced event are fetched, through the Events API.
+
+    Args:
+    - object_type (str): One of StripeSyncStateModel.ObjectType
+    - chunk_size (int): Number of rows written per database chunk
+    """
+    target = SYNC_TARGETS[object_type]
+    state, _ = StripeSyncStateModel.objects.get_or_create(object_type=object_type)
+
+    # Read the position of the event stream before syncing so no change is missed
+    latest_event = _latest_event(target['types'] + target['deleted_types'])
+
+    expired = (
+        state.last_event_created is None
+        or state.last_event_created < timezone.now() - STRIPE_EVENT_RETENTION
+    )
+    if expired:
+        logger.info(f"{object_type}: no usable high-water mark, running a full import")
+        report = target['full_import'](chunk_size=chunk_size)
+        if report is None:
+            # The full import failed, keep the previous mark
+            return None
+        report['mode'] = 'full'
+    else:
+        report, retry_from = _apply_events(target, state, chunk_size)
+        report['mode'] = 'incremental'
+        if retry_from is not None:
+            # Do not move the mark past an event held by a Stripe error, the next run replays it
+            logger.warning(f"{object_type}: {report['skipped']} objects held by Stripe errors, high-water mark kept before them")
+            latest_event = {'id': None, 'created': retry_from}
+
+    if latest_event is not None:
+        state.last_event_id = latest_event['id']
+        state.last_event_created = stripe_timestamp(latest_event['created'])
+    elif state.last_event_created is None:
+        state.last_event_created = timezone.now()
+    state.last_synced_at = timezone.now()
+    state.save()
+    return report
@@ -0,0 +1,19 @@
+from typing import Any, Dict
+from drf_easily_saas.models import StripeInvoiceModel
+from drf_easily_saas.payment.stripe.sync.engine import stripe_timestamp
+
+def normalize_invoice(invoice) -> Dict[str, Any]:
+    return {
+        'id': invoice['id'],
+        'auto_advance': bool(invoice.get('auto_advance')),
+        'currency': invoice['currency'],
+        'current_period_end': stripe_timestamp(invoice['period_end']),
+        'current_period_start': stripe_timestamp(invoice['period_start']),
+        'customer_id': invoice['customer'],
+        'description': invoice.get('description'),
+        'lines': invoice['lines'],
+        'metadata': invoice.get('metadata', {}),
+        'status': invoice.get('status') or StripeInvoiceModel.Status.DRAFT,
+        'hosted_invoice_url': invoice.get('hosted_invoice_url'),
+        'subscription_id': invoice.get('subscription'),
+    }
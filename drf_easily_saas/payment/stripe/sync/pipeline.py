@@ -0,0 +1,143 @@
+import time
+import logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Union
+
+# Django
+from django.db import connections
+
+# From package
+from drf_easily_saas.models import StripeSyncStateModel
+from drf_easily_saas.payment.stripe.sync.engine import DEFAULT_CHUNK_SIZE
+from drf_easily_saas.payment.stripe.sync.customers import import_stripe_customers
+from drf_easily_saas.payment.stripe.sync.products import import_stripe_products
+from drf_easily_saas.payment.stripe.sync.plans import import_stripe_plans
+from drf_easily_saas.payment.stripe.sync.subscriptions import import_stripe_subscriptions
+from drf_easily_saas.payment.stripe.sync.incremental import sync_incremental
+
+logger = logging.getLogger(__name__)
+
+# -------------------------------------------- #
+# Resources graph
+# -------------------------------------------- #
+# Each resource lists the resources that must be synced before it
+STRIPE_SYNC_RESOURCES = {
+    'products': {
+        'import': import_stripe_products,
+        'object_type': StripeSyncStateModel.ObjectType.PRODUCT,
+        'depends_on': [],
+    },
+    'plans': {
+        'import': import_stripe_plans,
+        'object_type': StripeSyncStateModel.ObjectType.PLAN,
+        'depends_on': ['products'],
+    },
+    'customers': {
+        'import': import_stripe_customers,
+        'object_type': StripeSyncStateModel.ObjectType.CUSTOMER,
+        'depends_on': [],
+    },
+    'subscriptions': {
+        'import': import_stripe_subscriptions,
+        'object_type': StripeSyncStateModel.ObjectType.SUBSCRIPTION,
+        'depends_on': ['customers'],
+    },
+}
+
+
+def plan_stages(resources: List[str]) -> List[List[str]]:
+    """
+    Group the selected resources in stages: a stage only depends on earlier stages.
+
+    Dependencies that are not selected are ignored.
+    """
+    remaining = [resource for resource in STRIPE_SYNC_RESOURCES if resource in resources]
+    done = set()
+    stages = []
+    while remaining:
+        stage = [
+            resource for resource in remaining
+            if all(dep in done or dep not in remaining for dep in STRIPE_SYNC_RESOURCES[resource]['depends_on'])
+        ]
+        stages.append(stage)
+        done.update(stage)
+        remaining = [resource for resource in remaining if resource not in done]
+    return stages
+
+
+# -------------------------------------------- #
+# Runner
+# -------------------------------------------- #
+def _run_resource(resource: str, incremental: bool, chunk_size: int) -> Dict[str, Any]:
+    started_at = time.monotonic()
+    try:
+        if incremental:
+            report = sync_incremental(STRIPE_SYNC_RESOURCES[resource]['object_type'], chunk_size=chunk_size)
+        else:
+            report = STRIPE_SYNC_RESOURCES[resource]['import'](chunk_size=chunk_size)
+    finally:
+        # Every worker thread owns its database connections
+        connections.close_all()
+    return {'resource': resource, 'report': report, 'seconds': round(time.monotonic() - started_at, 3)}
+
+
+def run_stripe_sync(
+    resources: Union[List[str], None] = None,
+    workers: int = 2,
+    incremental: bool = False,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    on_done: Union[Callable[[Dict[str, Any]], None], None] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Run the Stripe importers as a dependency-ordered graph.
+
+    Products run before plans and customers before subscriptions, independent
+    branches run concurrently in a thread pool of `workers` threads. A resource is
+    skipped when one of its dependencies failed.
+
+    Args:
+    - resources (List[str]): Resources to sync (default: all of STRIPE_SYNC_RESOURCES)
+    - workers (int): Number of worker threads
+    - incremental (bool): Use the incremental sync instead of a full import
+    - chunk_size (int): Number of rows written per database chunk
+    - on_done (Callable): Called with the result of each resource as soon as it finishes
+
+    Returns:
+    - results (Dict[str, Dict]): Result of each resource (`report`, `seconds`, `status`)
+    """
+    selected = [resource for resource in STRIPE_SYNC_RESOURCES if resources is None or resource in resources]
+    results: Dict[str, Dict[str, Any]] = {}
+    pending = {
+        resource: [dep for dep in STRIPE_SYNC_RESOURCES[resource]['depends_on'] if dep in selected]
+        for resource in selected
+    }
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        running = {}
+        while pending or running:
+            # Submit every resource whose dependencies are done
+            for resource, deps in list(pending.items()):
+                if any(results.get(dep, {}).get('status') in ('failed', 'skipped') for dep in deps):
+                    results[resource] = {'resource': resource, 'report': None, 'seconds': 0, 'status': 'skipped'}
+                    del pending[resource]
+                    if on_done:
+                        on_done(results[resource])
+                elif all(dep in results for dep in deps):
+                    running[executor.submit(_run_resource, resource, incremental, chunk_size)] = resource
+                    del pending[resource]
+            if not running:
+                continue
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                resource = running.pop(future)
+                try:
+                    result = future.result()
+                    result['status'] = 'done' if result['report'] is not None else 'failed'
+                except Exception as e:
+                    logger.error(f"Stripe sync of {resource} failed: {e}")
+                    result = {'resource': resource, 'report': None, 'seconds': 0, 'status': 'failed'}
+                results[resource] = result
+                if on_done:
+                    on_done(result)
+    return results
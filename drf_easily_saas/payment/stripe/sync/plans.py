@@ -1,52 +1,88 @@
-import stripe
 import logging
-from drf_easily_saas import settings
+from typing import Any, Dict
 from drf_easily_saas.models import StripePlanModel, StripeProductModel
-from datetime import datetime
+from drf_easily_saas.payment.stripe.client import get_stripe_client
+from drf_easily_saas.payment.stripe.sync.engine import (
+    BatchUpserter,
+    DEFAULT_CHUNK_SIZE,
+    ParentResolver,
+    stripe_timestamp,
+    upsert_children,
+)
+from drf_easily_saas.payment.stripe.sync.products import fetch_stripe_products
 
 logger = logging.getLogger(__name__)
 
-stripe.api_key = settings.STRIPE_CONFIG.secret_key
 
-def import_stripe_plans(limit: int = 100):
+def normalize_plan(stripe_plan) -> Dict[str, Any]:
+    return {
+        'id': stripe_plan['id'],
+        'active': stripe_plan['active'],
+        'amount': stripe_plan.get('amount'),
+        'amount_decimal': stripe_plan.get('amount_decimal'),
+        'currency': stripe_plan['currency'],
+        'interval': stripe_plan['interval'],
+        'interval_count': stripe_plan['interval_count'],
+        'billing_scheme': stripe_plan['billing_scheme'],
+        'created': stripe_timestamp(stripe_plan['created']),
+        'livemode': stripe_plan['livemode'],
+        'metadata': stripe_plan.get('metadata', {}),
+        'nickname': stripe_plan.get('nickname'),
+        'product_id': stripe_plan['product'],
+        'tiers_mode': stripe_plan.get('tiers_mode'),
+        'transform_usage': stripe_plan.get('transform_usage'),
+        'trial_period_days': stripe_plan.get('trial_period_days'),
+        'usage_type': stripe_plan['usage_type'],
+    }
+
+def normalize_price(stripe_price) -> Dict[str, Any]:
+    """
+    Map a recurring Stripe price on the plan mirror (recurring prices and plans share their ids).
+    """
+    recurring = stripe_price['recurring']
+    return {
+        'id': stripe_price['id'],
+        'active': stripe_price['active'],
+        'amount': stripe_price.get('unit_amount'),
+        'amount_decimal': stripe_price.get('unit_amount_decimal'),
+        'currency': stripe_price['currency'],
+        'interval': recurring['interval'],
+        'interval_count': recurring['interval_count'],
+        'billing_scheme': stripe_price['billing_scheme'],
+        'created': stripe_timestamp(stripe_price['created']),
+        'livemode': stripe_price['livemode'],
+        'metadata': stripe_price.get('metadata', {}),
+        'nickname': stripe_price.get('nickname'),
+        'product_id': stripe_price['product'],
+        'tiers_mode': stripe_price.get('tiers_mode'),
+        'transform_usage': stripe_price.get('transform_quantity'),
+        'trial_period_days': recurring.get('trial_period_days'),
+        'usage_type': recurring.get('usage_type') or StripePlanModel.UsageType.LICENSED,
+    }
+
+def import_stripe_plans(limit: int = 100, chunk_size: int = DEFAULT_CHUNK_SIZE, fetch_missing_parents: bool = False):
+    """
+    Stream every Stripe plan into the local mirror.
+
+    Product ids are resolved against the product ids preloaded once for the run.
+    Plans whose product is missing are skipped, unless `fetch_missing_parents`
+    is set, in which case the missing products are fetched from Stripe in batches.
+    """
     try:
-        plans = stripe.Plan.list(limit=limit)
+        plans = get_stripe_client().plans.list(params={'limit': limit})
         logger.info(f"Importing {len(plans)} plans from Stripe")
-        for stripe_plan in plans.auto_paging_iter():
-            product_id = stripe_plan['product']
-            if product_id:
-                product = StripeProductModel.objects.get(
-                    id=product_id
-                )
-                logger.error(f"Product {product_id} is found.")
-                if not product:
-                    logger.error(f"Product {product_id} not found.")
-                    continue
-
-            StripePlanModel.objects.update_or_create(
-                id=stripe_plan['id'],
-                defaults={
-                    'active': stripe_plan['active'],
-                    'amount': stripe_plan.get('amount'),
-                    'amount_decimal': stripe_plan.get('amount_decimal'),
-                    'currency': stripe_plan['currency'],
-                    'interval': stripe_plan['interval'],
-                    'interval_count': stripe_plan['interval_count'],
-                    'billing_scheme': stripe_plan['billing_scheme'],
-                    'created': datetime.fromtimestamp(stripe_plan['created']),
-                    'livemode': stripe_plan['livemode'],
-                    'metadata': stripe_plan.get('metadata', {}),
-                    'nickname': stripe_plan.get('nickname'),
-                    'product': product,
-                    'tiers_mode': stripe_plan.get('tiers_mode'),
-                    'transform_usage': stripe_plan.get('transform_usage'),
-                    'trial_period_days': stripe_plan.get('trial_period_days'),
-                    'usage_type': stripe_plan['usage_type'],
-                }
+        products = ParentResolver(StripeProductModel, fetch_stripe_products if fetch_missing_parents else None)
+        with BatchUpserter(StripePlanModel, chunk_size=chunk_size) as upserter:
+            skipped = upsert_children(
+                (normalize_plan(stripe_plan) for stripe_plan in plans.auto_paging_iter()),
+                upserter,
+                'product_id',
+                products,
             )
-            logger.info(f"Plan {stripe_plan['id']} imported successfully.")
         print("Plans imported successfully.")
+        report = upserter.report()
+        report.update(skipped=skipped, parents_fetched=products.fetched)
+        return report
     except Exception as e:
         logger.error(f"An error occurred: {e}")
         print(f"An error occurred: {e}")
-
@@ -1,35 +1,62 @@
-from datetime import datetime
-from drf_easily_saas import settings
+from typing import Any, Dict, Iterable, Iterator, Union
 from drf_easily_saas.models import StripeProductModel
-import stripe
+from drf_easily_saas.payment.stripe.client import get_stripe_client
+from drf_easily_saas.payment.stripe.sync.engine import BatchUpserter, DEFAULT_CHUNK_SIZE, list_params, stripe_timestamp
+from drf_easily_saas.utils.iterables import chunked
 
-stripe.api_key = settings.STRIPE_CONFIG.secret_key
 
-def import_stripe_products(limit: int = 100):
+def normalize_product(prod) -> Dict[str, Any]:
+    return {
+        'id': prod['id'],
+        'active': prod.get('active', True),
+        'default_price': prod.get('default_price'),
+        'description': prod.get('description'),
+        'metadata': prod.get('metadata', {}),
+        'name': prod.get('name'),
+        'object': prod.get('object'),
+        'created': stripe_timestamp(prod.get('created')),
+        'images': prod.get('images', []),
+        'livemode': prod.get('livemode', False),
+        'marketing_features': prod.get('metadata', {}).get('marketing_features', []),
+        'package_dimensions': prod.get('package_dimensions'),
+        'shippable': prod.get('shippable'),
+        'statement_descriptor': prod.get('statement_descriptor'),
+        'tax_code': prod.get('tax_code'),
+        'unit_label': prod.get('unit_label'),
+        'updated': stripe_timestamp(prod.get('updated')),
+        'url': prod.get('url'),
+    }
+
+def fetch_stripe_products(ids: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """
+    Fetch the given products from Stripe, 100 ids per list call.
+    """
+    for chunk in chunked(ids, 100):
+        for prod in get_stripe_client().products.list(params={'ids': chunk, 'limit': 100}).auto_paging_iter():
+            yield normalize_product(prod)
+
+def import_stripe_products(
+    limit: int = 100,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    created_gte: Union[int, None] = None,
+    starting_after: Union[str, None] = None,
+):
+    """
+    Stream every Stripe product into the local mirror.
+
+    Pages are fetched lazily with auto_paging_iter() so memory stays constant.
+    `created_gte` and `starting_after` allow importing large accounts in resumable
+    chunks: on failure, the id of the last written product is printed and can be
+    passed back as `starting_after`.
+    """
+    upserter = None
     try:
-        products = stripe.Product.list(limit=limit)
-        for prod in products['data']:
-            StripeProductModel.objects.update_or_create(
-                id=prod['id'],
-                defaults={
-                    'active': prod.get('active', True),
-                    'default_price': prod.get('default_price'),
-                    'description': prod.get('description'),
-                    'metadata': prod.get('metadata', {}),
-                    'name': prod.get('name'),
-                    'object': prod.get('object'),
-                    'created': datetime.fromtimestamp(prod.get('created')),
-                    'images': prod.get('images', []),
-                    'livemode': prod.get('livemode', False),
-                    'marketing_features': prod.get('metadata', {}).get('marketing_features', []),
-                    'package_dimensions': prod.get('package_dimensions'),
-                    'shippable': prod.get('shippable'),
-                    'statement_descriptor': prod.get('statement_descriptor'),
-                    'tax_code': prod.get('tax_code'),
-                    'unit_label': prod.get('unit_label'),
-                    'updated': datetime.fromtimestamp(prod.get('updated')),
-                    'url': prod.get('url'),
-                }
-            )
+        products = get_stripe_client().products.list(params=list_params(limit, created_gte, starting_after))
+        with BatchUpserter(StripeProductModel, chunk_size=chunk_size) as upserter:
+            for prod in products.auto_paging_iter():
+                upserter.add(normalize_product(prod))
+        return upserter.report()
     except Exception as e:
-        print(f"An error occurred: {e}")
\ No newline at end of file
+        print(f"An error occurred: {e}")
+        if upserter and upserter.last_id:
+            print(f"Resume the import with starting_after={upserter.last_id}")
@@ -1,44 +1,97 @@
-from datetime import datetime
-from drf_easily_saas import settings
-from drf_easily_saas.models import StripeSubscriptionModel, StripeCustomerModel
-import stripe
+from typing import Any, Dict, List
+from drf_easily_saas.models import StripeSubscriptionModel, StripeSubscriptionItemModel, StripeCustomerModel
+from drf_easily_saas.payment.stripe.client import get_stripe_client
+from drf_easily_saas.payment.stripe.sync.engine import (
+    BatchUpserter,
+    DEFAULT_CHUNK_SIZE,
+    ParentResolver,
+    stripe_timestamp,
+    upsert_children,
+)
+from drf_easily_saas.payment.stripe.sync.customers import fetch_stripe_customers
 import logging
 
 logger = logging.getLogger(__name__)
 
-stripe.api_key = settings.STRIPE_CONFIG.secret_key
 
-def import_stripe_subscriptions(limit: int = 100):
+def normalize_subscription(sub) -> Dict[str, Any]:
+    return {
+        'id': sub['id'],
+        'cancel_at_period_end': sub['cancel_at_period_end'],
+        'currency': sub['currency'],
+        'current_period_end': stripe_timestamp(sub['current_period_end']),
+        'current_period_start': stripe_timestamp(sub['current_period_start']),
+        'customer_id': sub['customer'],
+        'default_payment_method': sub['default_payment_method'],
+        'description': sub.get('description'),
+        'items': sub['items'],
+        'latest_invoice': sub.get('latest_invoice'),
+        'metadata': sub.get('metadata', {}),
+        'pending_setup_intent': sub.get('pending_setup_intent'),
+        'pending_update': sub.get('pending_update'),
+        'status': sub['status'],
+    }
+
+def normalize_subscription_items(row: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Item rows of a normalized subscription row.
+    """
+    items = []
+    for item in (row['items'] or {}).get('data', []):
+        price = item.get('plan') or item.get('price')
+        if not price:
+            continue
+        items.append({
+            'id': item['id'],
+            'subscription_id': row['id'],
+            'plan_id': price['id'],
+            'quantity': item.get('quantity'),
+            'created': stripe_timestamp(item.get('created')),
+            'metadata': item.get('metadata') or {},
+        })
+    return items
+
+def write_subscription_items(rows: List[Dict[str, Any]]) -> None:
+    """
+    Replace the items of the given subscription rows with the ones they hold.
+
+    One delete of the removed items and one INSERT ... ON CONFLICT for the others.
+    """
+    items = [item for row in rows for item in normalize_subscription_items(row)]
+    (
+        StripeSubscriptionItemModel.objects
+        .filter(subscription_id__in=[row['id'] for row in rows])
+        .exclude(id__in=[item['id'] for item in items])
+        .delete()
+    )
+    if items:
+        StripeSubscriptionItemModel.objects.bulk_create(
+            [StripeSubscriptionItemModel(**item) for item in items],
+            update_conflicts=True,
+            unique_fields=['id'],
+            update_fields=['subscription_id', 'plan_id', 'quantity', 'created', 'metadata'],
+        )
+
+def import_stripe_subscriptions(limit: int = 100, chunk_size: int = DEFAULT_CHUNK_SIZE, fetch_missing_parents: bool = False):
+    """
+    Stream every Stripe subscription into the local mirror.
+
+    Customer ids are resolved against the customer ids preloaded once for the run.
+    Subscriptions whose customer is missing are skipped, unless `fetch_missing_parents`
+    is set, in which case the missing customers are fetched from Stripe.
+    """
     try:
-        subscriptions = stripe.Subscription.list(limit=limit)
-        # print(subscriptions['data'])
-        for sub in subscriptions.auto_paging_iter():
-            customer_id = sub['customer']
-            if customer_id:
-                customer = StripeCustomerModel.objects.get(
-                    id=customer_id
-                )
-                logger.error(f"Customer {customer_id} is found.")
-                if not customer:
-                    logger.error(f"Customer {customer_id} not found.")
-                    continue
-            StripeSubscriptionModel.objects.update_or_create(
-                id=sub['id'],
-                defaults={
-                    'cancel_at_period_end': sub['cancel_at_period_end'],
-                    'currency': sub['currency'],
-                    'current_period_end': datetime.fromtimestamp(sub['current_period_end']),
-                    'current_period_start': datetime.fromtimestamp(sub['current_period_start']),
-                    'customer': customer,
-                    'default_payment_method': sub['default_payment_method'],
-                    'description': sub.get('description'),
-                    'items': sub['items'],
-                    'latest_invoice': sub.get('latest_invoice'),
-                    'metadata': sub.get('metadata', {}),
-                    'pending_setup_intent': sub.get('pending_setup_intent'),
-                    'pending_update': sub.get('pending_update'),
-                    'status': sub['status'],
-                }
+        subscriptions = get_stripe_client().subscriptions.list(params={'limit': limit})
+        customers = ParentResolver(StripeCustomerModel, fetch_stripe_customers if fetch_missing_parents else None)
+        with BatchUpserter(StripeSubscriptionModel, chunk_size=chunk_size, on_flush=write_subscription_items) as upserter:
+            skipped = upsert_children(
+                (normalize_subscription(sub) for sub in subscriptions.auto_paging_iter()),
+                upserter,
+                'customer_id',
+                customers,
             )
+        report = upserter.report()
+        report.update(skipped=skipped, parents_fetched=customers.fetched)
+        return report
     except Exception as e:
-        print(f"An error occurred: {e}")
\ No newline at end of file
+        print(f"An error occurred: {e}")
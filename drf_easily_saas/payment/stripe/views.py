@@ -1,23 +1,30 @@
+import json
 from drf_spectacular.utils import extend_schema
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 
+# Django
+from django.utils.functional import cached_property
+
 # From package
 from drf_easily_saas.utils.urls import concat_urls
-from drf_easily_saas.settings import EASILY_CONFIG, STRIPE_CONFIG, STRIPE_SUBSCRIPTION_CONFIG
+from drf_easily_saas import settings as easily_settings
 from drf_easily_saas.payment.stripe.serializers import CheckoutSerializer, CheckoutSessionSerializer
 from drf_easily_saas.exceptions.stripe import StripePaymentProcessingError
 from drf_easily_saas.payment.manager import StripeManager
-
-frontend_url = EASILY_CONFIG.frontend_url
+from drf_easily_saas.payment.stripe.inbox import enqueue_event
 
 # -------------------------------------------- #
 # Checkout
 # -------------------------------------------- #
 class CheckoutView(APIView):
     serializer_class = CheckoutSerializer
-    stripe_manager = StripeManager()
+
+    @cached_property
+    def stripe_manager(self):
+        # Built on the first request: importing the URLconf must not read the Stripe settings
+        return StripeManager()
 
     @extend_schema(
         request=CheckoutSerializer,
@@ -52,8 +59,8 @@ class CheckoutView(APIView):
                 },
             ],
             'mode': 'subscription',
-            'success_url': concat_urls(frontend_url, success_url),
-            'cancel_url': concat_urls(frontend_url, cancel_url),
+            'success_url': concat_urls(easily_settings.FRONTEND_URL, success_url),
+            'cancel_url': concat_urls(easily_settings.FRONTEND_URL, cancel_url),
             'metadata': {
                 'uid': uid,
                 'user_email': user_email,
@@ -68,17 +75,31 @@ class CheckoutView(APIView):
 # -------------------------------------------- #
     
 class WebhookView(APIView):
+    """
+    Receive the Stripe webhooks.
+
+    With `webhook_mode="queue"` the verified event is only stored in the inbox and
+    acknowledged at once, the `processstripewebhooks` worker runs the handlers.
+    """
     permission_classes = []
+
+    @cached_property
+    def stripe_manager(self):
+        return StripeManager()
     
     def post(self, request):
-        stripe_manager = StripeManager()
         payload = request.body
+        sig_header = request.META.get('HTTP_STRIPE_SIGNATURE')
+
+        # Verify the event by using the endpoint secret
+        event_is_valid = self.stripe_manager.verify_webhook(payload, sig_header)
+
+        if not event_is_valid:
+            return Response({"message": "Invalid payload"}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Verify the event by using the endpoint secret
-        event_is_valid = stripe_manager.verify_webhook(payload)
+        if easily_settings.STRIPE_CONFIG.webhook_mode == "queue":
+            enqueue_event(json.loads(payload))
+            return Response({"received": True}, status=status.HTTP_200_OK)
 
-        if event_is_valid:
-            event = stripe_manager.handle_stripe_event(event_is_valid)
-            return Response(event, status=status.HTTP_200_OK)
-        else:
-            return Response({"message": "Invalid payload"}, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        event = self.stripe_manager.handle_stripe_event(event_is_valid)
+        return Response(event, status=status.HTTP_200_OK)
@@ -0,0 +1,54 @@
+from pydantic import BaseModel, field_validator
+
+# Drf Easily Saas
+from drf_easily_saas.exceptions.config import InvalidConfigurationError
+
+
+# -------------------------------------------- #
+# User cache settings schema validation
+# -------------------------------------------- #
+class UserCacheConfig(BaseModel):
+    """
+    This class is used to validate the user lookup cache configuration.
+
+    Args:
+    - alias (str): Django cache alias holding the uid -> user id mapping
+    - ttl (int): Seconds a mapping is kept in the Django cache (0 disables the cache)
+    - local_size (int): Maximum number of mappings kept in the process-local LRU
+    - local_ttl (int): Seconds a mapping is kept in the process-local LRU
+    """
+    alias: str = "default"
+    ttl: int = 3600
+    local_size: int = 4096
+    local_ttl: int = 60
+
+    @field_validator('ttl', 'local_size', 'local_ttl')
+    def validate_positive(cls, v):
+        if v < 0:
+            raise InvalidConfigurationError("User cache settings must be positive integers")
+        return v
+
+
+# -------------------------------------------- #
+# Entitlement cache settings schema validation
+# -------------------------------------------- #
+class EntitlementCacheConfig(BaseModel):
+    """
+    This class is used to validate the subscription entitlement cache configuration.
+
+    Args:
+    - alias (str): Django cache alias holding the uid -> entitlement mapping
+    - ttl (int): Seconds an entitlement is kept in the Django cache (0 disables the cache)
+    - local_size (int): Maximum number of entitlements kept in the process-local LRU
+    - local_ttl (int): Seconds an entitlement is kept in the process-local LRU
+    """
+    alias: str = "default"
+    ttl: int = 3600
+    local_size: int = 4096
+    local_ttl: int = 30
+
+    @field_validator('ttl', 'local_size', 'local_ttl')
+    def validate_positive(cls, v):
+        if v < 0:
+            raise InvalidConfigurationError("Entitlement cache settings must be positive integers")
+        return v
@@ -90,42 +90,22 @@ class FirebaseClaimsPayment(ClaimsPayment):
             raise ValidationError("UID cannot be empty")
         return v
     
-    def update_state_token(cls, claims: ClaimsPayment, subscription: stripe.Subscription) -> Union[auth.UserRecord, None]:
+    def update_state_token(cls, claims: ClaimsPayment, subscription: stripe.Subscription) -> Union[dict, None]:
         """
         Add custom claims to a Firebase user.
         """
         # Validate claims
         if not claims:
             return None
-        # Add custom claims
-        auth.set_custom_user_claims(cls.uid, claims.dict())
-        # Check if claims are added
-        if auth.get_user(cls.uid).custom_claims == claims.dict():
+        # Add custom claims, updates of the same user within the debounce window are coalesced
+        # and the claims last written are not written again. Write errors are raised so the
+        # event is not marked as processed.
+        # The write revokes the refresh tokens: the user has to sign in again to get the new claims
+        from drf_easily_saas.auth.firebase.claims import get_claims_coalescer
+        custom_claims = claims.dict()
+        if get_claims_coalescer().submit(cls.uid, custom_claims):
             print('Custom claims added to the user in firebase')
-            # Ici on force la mise à jour du token pour que les nouvelles informations soient prises en compte
-            # Ce qui à pour effet deconnecter le user de toutes ses sessions sur tous les devices
-            # Il devra se reconnecter pour obtenir un nouveau token
-            # Cela assure que les nouvelles informations sont prises en compte rapidement
-            auth.revoke_refresh_tokens(cls.uid)
-
-             # Get the user from the database with the uid
-            user = User.objects.get(username=cls.uid)
-
-            # Add or update the subscription to the database
-            # sub_table = Subscription.objects.update_or_create(
-            #     user=user,
-            #     provider='STRIPE',
-            #     defaults={
-            #         'subscription_id': subscription.id,
-            #         'status': subscription.status,
-            #         'plan_id': subscription.plan.id,
-            #         'customer_id': subscription.customer,
-            #     }
-            # )
-            # if sub_table:
-            #     print(f'Subscription added to the database and custom claims added to the user')
-            #     return sub_table
-        return None
+        return custom_claims
 
 
 class SupabaseClaimsPayment(ClaimsPayment):
@@ -157,33 +137,28 @@ class SupabaseClaimsPayment(ClaimsPayment):
     
     def update_state_token(cls, claims: ClaimsPayment, subscription: stripe.Subscription) -> Union[dict, None]:
         """
-        Add custom claims to a Supabase user via user metadata.
+        Add custom claims to a Supabase user via app metadata (only writable by the service role).
         """
         # Validate claims
         if not claims:
             return None
             
-        # Get supabase config from Django settings
-        from django.conf import settings as dj_settings
-        supabase_config = dj_settings.EASILY.get('supabase_config', {})
-        url = supabase_config.get('url')
-        service_role_key = supabase_config.get('service_role_key')
-        
-        if not url or not service_role_key:
+        from drf_easily_saas.auth.supabase.clients import get_supabase_client
+        from drf_easily_saas.exceptions.supabase import InvalidSupabaseConfigurationError
+        try:
+            # Shared supabase client with service role key for admin operations
+            supabase = get_supabase_client('service_role')
+        except InvalidSupabaseConfigurationError:
             print('Supabase configuration not found')
             return None
-            
-        from supabase import create_client
-        # Create supabase client with service role key for admin operations
-        supabase = create_client(url, service_role_key)
         
         try:
-            # Update user metadata with subscription claims
-            user_metadata = claims.dict()
+            # Update app metadata with subscription claims: user metadata can be written by the user itself
+            app_metadata = claims.dict()
             response = supabase.auth.admin.update_user_by_id(
                 cls.uid,
                 {
-                    "user_metadata": user_metadata
+                    "app_metadata": app_metadata
                 }
             )
             
@@ -13,6 +13,7 @@ from drf_easily_saas.schemas.constants import (
 from drf_easily_saas.schemas.stripe import StripeConfig
 from drf_easily_saas.schemas.firebase import FirebaseConfig
 from drf_easily_saas.schemas.supabase import SupabaseConfig
+from drf_easily_saas.schemas.cache import EntitlementCacheConfig, UserCacheConfig
 # Exceptions
 from drf_easily_saas.exceptions.config import InvalidConfigurationError
 
@@ -28,6 +29,8 @@ class EasilyConfig(BaseModel):
     firebase_config: FirebaseConfig = None
     supabase_config: SupabaseConfig = None
     stripe_config: StripeConfig = None
+    user_cache: UserCacheConfig = UserCacheConfig()
+    entitlement_cache: EntitlementCacheConfig = EntitlementCacheConfig()
     
     @field_validator('auth_provider')
     def validate_auth_provider(cls, v):
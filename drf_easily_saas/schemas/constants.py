@@ -10,5 +10,7 @@ AUTH_VALID_PROVIDER=['firebase', 'supabase', 'keycloak', 'cognito', 'auth0']
 PAYMENT_VALID_PROVIDER=['stripe', 'lemonsqueezy']
 # _ Stripe
 STRIPE_VERIF_STRATEGY = ['secret', 'apikey']
+STRIPE_WEBHOOK_MODES = ['sync', 'queue']
 STRIPE_PAYMENT_METHODS_ALLOWED = ['card', 'paypal']
-STRIPE_SUBSCRIPTION_STATUS_TYPES=['incomplete', 'incomplete_expired', 'trialing', 'active', 'past_due', 'canceled', 'unpaid', 'paused']
\ No newline at end of file
+STRIPE_SUBSCRIPTION_STATUS_TYPES=['incomplete', 'incomplete_expired', 'trialing', 'active', 'past_due', 'canceled', 'unpaid', 'paused']
+STRIPE_ACTIVE_SUBSCRIPTION_STATUS_TYPES=['trialing', 'active']
\ No newline at end of file
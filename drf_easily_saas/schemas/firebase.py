@@ -1,17 +1,10 @@
 import os
 import json
-import firebase_admin
-from firebase_admin import credentials
 from typing import List, Dict, Any, Union
 from pydantic import BaseModel, Field, field_validator
 
 # Drf Easily Saas
 from drf_easily_saas.exceptions.firebase import InvalidFirebaseConfigurationError
-from drf_easily_saas.utils.db import (
-    check_table_exists, 
-    check_table_empty
-    )
-from drf_easily_saas.auth.firebase.protect import import_users
 
 
 # -------------------------------------------- #
@@ -21,11 +14,18 @@ class FirebaseConfig(BaseModel):
     """
     This class is used to validate the Firebase configuration.
 
-    On this class, we validate the Firebase configuration and import users from Firebase if import_users is True.
+    On this class, we validate the Firebase configuration. Validation has no side effect: the
+    Firebase app is initialised on first use (see `drf_easily_saas.auth.firebase.app.ensure_firebase_app`)
+    and users are imported if import_users is True by `syncfirebaseusers --if-configured`.
 
     Args:
     - config (Union[str, Dict[str, Any]]): Firebase configuration
     - import_users (bool): Import users from Firebase
+    - token_cache_size (int): Maximum number of verified tokens kept in memory
+    - revocation_check_interval (int): Seconds before a cached token is checked again for revocation (0 disables the cache)
+    - claims_debounce_window (float): Seconds the custom claims updates of a user are coalesced before being written (0 writes at once)
+    - claims_cache_alias (str): Django cache alias holding the last claims written for each user
+    - claims_cache_ttl (int): Seconds the last claims written for a user are remembered to skip identical writes (0 disables the skip)
 
     Returns:
     - config (Union[str, Dict[str, Any]]): Firebase configuration
@@ -34,6 +34,11 @@ class FirebaseConfig(BaseModel):
     config: Union[str, Dict[str, Any]]
     import_users: bool
     hot_reload_import: bool = False
+    token_cache_size: int = 1024
+    revocation_check_interval: int = 300
+    claims_debounce_window: float = 0.5
+    claims_cache_alias: str = "default"
+    claims_cache_ttl: int = 300
     
     @field_validator('config')
     def validate_config(cls, v):
@@ -56,34 +61,28 @@ class FirebaseConfig(BaseModel):
         else:   
             InvalidFirebaseConfigurationError("Firebase config must be a file path or a dictionary")
 
-        # Initialize Firebase Admin
-        firebase_admin.initialize_app(credentials.Certificate(config))
-
         return config
     
     @field_validator('import_users')
     def validate_import_users(cls, v):
         if not isinstance(v, bool):
             raise InvalidFirebaseConfigurationError("import_users must be a boolean")
-        # If import_users is True, import users from Firebase
-        if v:
-            try:
-                if check_table_exists("drf_easily_saas_firebaseuserinformations") and check_table_empty("drf_easily_saas_firebaseuserinformations"):
-                    import_users()
-            except Exception as e:
-                raise InvalidFirebaseConfigurationError(f"Error importing users from Firebase: {str(e)}")
         return v
 
     @field_validator('hot_reload_import')
     def validate_hot_reload_import(cls, v):
         if not isinstance(v, bool):
             raise InvalidFirebaseConfigurationError("hot_reload_import must be a boolean")
-        if v:
-            try:
-                if check_table_exists("drf_easily_saas_firebaseuserinformations") and not check_table_empty("drf_easily_saas_firebaseuserinformations"):
-                    import_users()
-                elif not check_table_exists("drf_easily_saas_firebaseuserinformations"):
-                    return v
-            except Exception as e:
-                raise InvalidFirebaseConfigurationError(f"Error importing users from Firebase: {str(e)}")
-        return v
\ No newline at end of file
+        return v
+
+    @field_validator('token_cache_size', 'revocation_check_interval')
+    def validate_token_cache(cls, v):
+        if v < 0:
+            raise InvalidFirebaseConfigurationError("Token cache settings must be positive integers")
+        return v
+
+    @field_validator('claims_debounce_window', 'claims_cache_ttl')
+    def validate_claims_coalescer(cls, v):
+        if v < 0:
+            raise InvalidFirebaseConfigurationError("Claims coalescer settings must be positive numbers")
+        return v
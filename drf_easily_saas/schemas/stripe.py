@@ -1,9 +1,9 @@
 from typing import List, Dict, Any, Union
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, Field, ValidationInfo, field_validator
 
 # Drf Easily Saas
 from drf_easily_saas.exceptions.stripe import InvalidStripeConfigurationError
-from drf_easily_saas.schemas.constants import STRIPE_VERIF_STRATEGY, STRIPE_PAYMENT_METHODS_ALLOWED
+from drf_easily_saas.schemas.constants import STRIPE_VERIF_STRATEGY, STRIPE_PAYMENT_METHODS_ALLOWED, STRIPE_WEBHOOK_MODES
 
 
 # -------------------------------------------- #
@@ -133,6 +133,19 @@ class StripeConfig(BaseModel):
     webhook_verif_strategy: str = "apikey"
     endpoint_secret: str = None
     subscription: StripeBaseSubscription = None
+    # Webhook ingestion: "sync" handles events in the request, "queue" stores them in the inbox
+    webhook_mode: str = "sync"
+    webhook_max_attempts: int = 5
+    webhook_retry_backoff: int = 30 # Seconds before the first retry, doubled on each attempt
+    # Processed events dedup: optional Django cache alias in front of the database index
+    event_dedup_cache: str = None
+    event_retention_days: int = 30
+    # HTTP client shared by every Stripe call of the process
+    http_connect_timeout: float = 5
+    http_read_timeout: float = 30
+    http_max_retries: int = 2
+    http_pool_size: int = 10
+    api_base: str = None
 
     @field_validator('public_key')
     def validate_public_key(cls, v):
@@ -152,6 +165,30 @@ class StripeConfig(BaseModel):
             raise InvalidStripeConfigurationError(f'Stripe webhook verification strategy is not valid use {STRIPE_VERIF_STRATEGY} instead')
         return v
 
+    @field_validator('webhook_mode')
+    def validate_webhook_mode(cls, v):
+        if v not in STRIPE_WEBHOOK_MODES:
+            raise InvalidStripeConfigurationError(f'Stripe webhook mode {v} is not valid use {STRIPE_WEBHOOK_MODES} instead')
+        return v
+
+    @field_validator('webhook_max_attempts', 'webhook_retry_backoff', 'event_retention_days')
+    def validate_webhook_retries(cls, v, info: ValidationInfo):
+        if v < 1:
+            raise InvalidStripeConfigurationError(f'Stripe {info.field_name} must be at least 1')
+        return v
+
+    @field_validator('http_connect_timeout', 'http_read_timeout', 'http_pool_size')
+    def validate_http_client(cls, v, info: ValidationInfo):
+        if v <= 0:
+            raise InvalidStripeConfigurationError(f'Stripe {info.field_name} must be positive')
+        return v
+
+    @field_validator('http_max_retries')
+    def validate_http_max_retries(cls, v):
+        if v < 0:
+            raise InvalidStripeConfigurationError('Stripe http_max_retries must be positive or zero')
+        return v
+
     @field_validator('subscription')
     def validate_subscription(cls, v):
         return v
\ No newline at end of file
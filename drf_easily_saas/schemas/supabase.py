@@ -1,14 +1,8 @@
-from supabase import create_client, Client
 from typing import List, Dict, Any, Union
 from pydantic import BaseModel, Field, field_validator
 
 # Drf Easily Saas
 from drf_easily_saas.exceptions.supabase import InvalidSupabaseConfigurationError
-from drf_easily_saas.utils.db import (
-    check_table_exists, 
-    check_table_empty
-    )
-from drf_easily_saas.auth.supabase.protect import import_users
 
 
 # -------------------------------------------- #
@@ -18,7 +12,8 @@ class SupabaseConfig(BaseModel):
     """
     This class is used to validate the Supabase configuration.
 
-    On this class, we validate the Supabase configuration and import users from Supabase if import_users is True.
+    On this class, we validate the Supabase configuration. Validation has no side effect: users
+    are imported if import_users is True by `syncsupabaseusers --if-configured`.
 
     Args:
     - url (str): Supabase URL
@@ -26,6 +21,9 @@ class SupabaseConfig(BaseModel):
     - service_role_key (str): Supabase service role key
     - import_users (bool): Import users from Supabase
     - hot_reload_import (bool): Hot reload import users
+    - jwt_secret (str): Supabase JWT secret, used to verify HS256 tokens locally
+    - jwt_audience (str): Expected audience of the access tokens
+    - jwks_refresh_interval (int): Seconds between two refreshes of the Supabase JWKS
 
     Returns:
     - url (str): Supabase URL
@@ -39,6 +37,9 @@ class SupabaseConfig(BaseModel):
     service_role_key: str
     import_users: bool
     hot_reload_import: bool = False
+    jwt_secret: str = None
+    jwt_audience: str = "authenticated"
+    jwks_refresh_interval: int = 600
     
     @field_validator('url')
     def validate_url(cls, v):
@@ -66,25 +67,16 @@ class SupabaseConfig(BaseModel):
     def validate_import_users(cls, v):
         if not isinstance(v, bool):
             raise InvalidSupabaseConfigurationError("import_users must be a boolean")
-        # If import_users is True, import users from Supabase
-        if v:
-            try:
-                if check_table_exists("drf_easily_saas_supabaseuserinformations") and check_table_empty("drf_easily_saas_supabaseuserinformations"):
-                    import_users()
-            except Exception as e:
-                raise InvalidSupabaseConfigurationError(f"Error importing users from Supabase: {str(e)}")
         return v
 
     @field_validator('hot_reload_import')
     def validate_hot_reload_import(cls, v):
         if not isinstance(v, bool):
             raise InvalidSupabaseConfigurationError("hot_reload_import must be a boolean")
-        if v:
-            try:
-                if check_table_exists("drf_easily_saas_supabaseuserinformations") and not check_table_empty("drf_easily_saas_supabaseuserinformations"):
-                    import_users()
-                elif not check_table_exists("drf_easily_saas_supabaseuserinformations"):
-                    return v
-            except Exception as e:
-                raise InvalidSupabaseConfigurationError(f"Error importing users from Supabase: {str(e)}")
-        return v
\ No newline at end of file
+        return v
+
+    @field_validator('jwks_refresh_interval')
+    def validate_jwks_refresh_interval(cls, v):
+        if v <= 0:
+            raise InvalidSupabaseConfigurationError("jwks_refresh_interval must be a positive integer")
+        return v
@@ -1,24 +1,58 @@
+import threading
 from django.conf import settings as dj_setting
-from drf_easily_saas.schemas.utils import validate_settings
 
 # -------------------------------------------- #
 # Settings
 # -------------------------------------------- #
-EASILY_CONFIG = validate_settings(dj_setting.EASILY)
-FRONTEND_URL = EASILY_CONFIG.frontend_url
+# The EASILY settings are validated on first access, once per process: importing this
+# module (or a module importing names from it) has no side effect. Validation does not
+# initialise the providers (see `ensure_firebase_app`) nor import their users.
+_easily_config = None
+_easily_config_lock = threading.Lock()
 
-# -------------------------------------------- #
-# Authentication
-# -------------------------------------------- #
-AUTH_PROVIDER = EASILY_CONFIG.auth_provider
-# _ Firebase
-FIREBASE_CONFIG = EASILY_CONFIG.firebase_config
+def get_easily_config():
+    """
+    Return the validated EASILY settings, validated on the first call only.
+    """
+    global _easily_config
+    if _easily_config is None:
+        with _easily_config_lock:
+            if _easily_config is None:
+                from drf_easily_saas.schemas.utils import validate_settings
+                _easily_config = validate_settings(dj_setting.EASILY)
+    return _easily_config
 
 
-# -------------------------------------------- #
-# Payments
-# -------------------------------------------- #
-PAYMENT_PROVIDER = EASILY_CONFIG.payment_provider
-# Stripe
-STRIPE_CONFIG = EASILY_CONFIG.stripe_config
-STRIPE_SUBSCRIPTION_CONFIG = STRIPE_CONFIG.subscription
+LAZY_SETTINGS = {
+    'EASILY_CONFIG': lambda config: config,
+    'FRONTEND_URL': lambda config: config.frontend_url,
+    # -------------------------------------------- #
+    # Authentication
+    # -------------------------------------------- #
+    'AUTH_PROVIDER': lambda config: config.auth_provider,
+    # _ Firebase
+    'FIREBASE_CONFIG': lambda config: config.firebase_config,
+    # _ Supabase
+    'SUPABASE_CONFIG': lambda config: config.supabase_config,
+    # -------------------------------------------- #
+    # Payments
+    # -------------------------------------------- #
+    'PAYMENT_PROVIDER': lambda config: config.payment_provider,
+    # Stripe
+    'STRIPE_CONFIG': lambda config: config.stripe_config,
+    'STRIPE_SUBSCRIPTION_CONFIG': lambda config: config.stripe_config.subscription,
+    # -------------------------------------------- #
+    # Caches
+    # -------------------------------------------- #
+    'USER_CACHE_CONFIG': lambda config: config.user_cache,
+    'ENTITLEMENT_CACHE_CONFIG': lambda config: config.entitlement_cache,
+}
+
+
+def __getattr__(name):
+    # Module attributes are resolved on first access then memoized in the module
+    if name not in LAZY_SETTINGS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = LAZY_SETTINGS[name](get_easily_config())
+    globals()[name] = value
+    return value
@@ -0,0 +1,72 @@
+"""
+Stripe round trips of checkout completion, against a local stub Stripe server.
+
+Compares the previous flow (retrieve + save of the customer, then of the subscription:
+four sequential requests) with `StripeManager._add_checkout_metadata` (two concurrent
+`modify` requests, none when the session carries expanded objects already tagged).
+
+Usage:
+    python -m drf_easily_saas.tests.benchmarks.bench_checkout_completion [--latency 0.05] [--rounds 20]
+"""
+import argparse
+import warnings
+
+from drf_easily_saas.tests.benchmarks.utils import StubStripeServer, measure, setup_django, summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds the stub server waits per request')
+    parser.add_argument('--rounds', type=int, default=20, help='Number of checkout events per flow')
+    args = parser.parse_args()
+    # `save` is deprecated by stripe-python, it is only used to reproduce the previous flow
+    warnings.filterwarnings('ignore', category=DeprecationWarning)
+
+    setup_django()
+    import stripe
+    from drf_easily_saas.settings import STRIPE_CONFIG
+    from drf_easily_saas.payment.stripe.client import reset_stripe_client
+    from drf_easily_saas.payment.manager import StripeManager
+
+    def legacy_flow(index):
+        metadata = {'uid': f'uid_{index}'}
+        customer = stripe.Customer.retrieve(f'cus_legacy_{index}')
+        customer.metadata = metadata
+        customer.save()
+        subscription = stripe.Subscription.retrieve(f'sub_legacy_{index}')
+        subscription.metadata = metadata
+        subscription.save()
+
+    def modify_flow(index):
+        session = {'customer': f'cus_modify_{index}', 'subscription': f'sub_modify_{index}'}
+        manager._add_checkout_metadata(session, {'uid': f'uid_{index}'})
+
+    def expanded_flow(index):
+        metadata = {'uid': f'uid_{index}'}
+        session = {
+            'customer': {'id': f'cus_expanded_{index}', 'object': 'customer', 'metadata': metadata},
+            'subscription': {'id': f'sub_expanded_{index}', 'object': 'subscription', 'metadata': metadata},
+        }
+        manager._add_checkout_metadata(session, metadata)
+
+    with StubStripeServer(latency=args.latency) as server:
+        # Previous flow: global stripe-python configuration
+        stripe.api_base = server.url
+        stripe.api_key = STRIPE_CONFIG.secret_key
+        # Current flow: pooled client of the package
+        STRIPE_CONFIG.api_base = server.url
+        reset_stripe_client()
+        manager = StripeManager()
+        print(f"Stub Stripe server at {server.url}, {args.latency * 1000:.0f} ms per request, {args.rounds} events per flow\n")
+        for label, flow in [
+            ('retrieve + save, sequential (before)', legacy_flow),
+            ('modify, concurrent', modify_flow),
+            ('expanded session objects', expanded_flow),
+        ]:
+            requests_before = server.requests
+            durations = measure(flow, args.rounds)
+            print(summary(label, durations) + f"   {(server.requests - requests_before) / args.rounds:.0f} requests/event")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""
+Query plans and timings of the hot Stripe mirror lookups, without and with the mirror indexes.
+
+Fills the mirror with `--rows` subscriptions (half as many customers), then runs each
+lookup with the schema of migration 0007 (primary keys and foreign keys only) and with
+the indexes of migration 0008, printing the plan reported by the database.
+
+Runs on an in-memory SQLite database unless DJANGO_SETTINGS_MODULE points to a project.
+The `metadata -> 'uid'` expression indexes and the GIN indexes are created on PostgreSQL
+only, and the partial indexes are ignored by MySQL. The indexes target PostgreSQL: only a
+PostgreSQL run at the default size measures them, SQLite plans only tell whether a lookup
+uses an index at all.
+
+Usage:
+    python -m drf_easily_saas.tests.benchmarks.bench_mirror_indexes [--rows 1000000] [--rounds 5]
+"""
+import argparse
+import random
+import time
+from datetime import timedelta
+
+from drf_easily_saas.tests.benchmarks.utils import measure, setup_django, summary
+
+BATCH_SIZE = 10000
+STATUSES = ['active'] * 6 + ['trialing', 'past_due', 'canceled', 'canceled', 'unpaid', 'incomplete_expired']
+
+
+def populate(rows: int) -> None:
+    from django.db import transaction
+    from django.utils import timezone
+    from drf_easily_saas.models import (
+        StripeCustomerModel,
+        StripePlanModel,
+        StripeProductModel,
+        StripeSubscriptionModel,
+    )
+
+    now = timezone.now()
+    rng = random.Random(42)
+    customers = max(rows // 2, 1)
+    with transaction.atomic():
+        for product_index in range(10):
+            product = StripeProductModel.objects.create(
+                id=f'prod_{product_index}', name=f'Product {product_index}', object='product',
+                active=product_index % 3 != 0, created=now - timedelta(days=product_index), updated=now,
+            )
+            for plan_index in range(10):
+                StripePlanModel.objects.create(
+                    id=f'price_{product_index}_{plan_index}', product=product, currency='usd', interval='month',
+                    billing_scheme='per_unit', active=plan_index % 2 == 0, created=now - timedelta(days=plan_index),
+                )
+
+    started_at = time.perf_counter()
+    for start in range(0, customers, BATCH_SIZE):
+        with transaction.atomic():
+            StripeCustomerModel.objects.bulk_create([
+                StripeCustomerModel(id=f'cus_{index}', email=f'user{index}@example.com', metadata={'uid': f'uid_{index}'})
+                for index in range(start, min(start + BATCH_SIZE, customers))
+            ])
+    for start in range(0, rows, BATCH_SIZE):
+        with transaction.atomic():
+            StripeSubscriptionModel.objects.bulk_create([
+                StripeSubscriptionModel(
+                    id=f'sub_{index}',
+                    currency='usd',
+                    current_period_start=now - timedelta(days=30),
+                    current_period_end=now + timedelta(minutes=rng.randrange(60 * 24 * 365)),
+                    customer_id=f'cus_{index % customers}',
+                    items={'object': 'list', 'data': []},
+                    metadata={'uid': f'uid_{index % customers}'},
+                    status=rng.choice(STATUSES),
+                )
+                for index in range(start, min(start + BATCH_SIZE, rows))
+            ])
+        print(f"\r{min(start + BATCH_SIZE, rows)} / {rows} subscriptions", end='', flush=True)
+    print(f"\n{customers} customers and {rows} subscriptions written in {time.perf_counter() - started_at:.0f}s\n")
+
+
+def lookups(rows: int):
+    from drf_easily_saas.models import StripeCustomerModel, StripePlanModel, StripeProductModel, StripeSubscriptionModel
+
+    customers = max(rows // 2, 1)
+    uid = f'uid_{customers // 3}'
+    customer_id = f'cus_{customers // 3}'
+    return [
+        ('subscriptions of a uid', lambda: StripeSubscriptionModel.objects.for_uid(uid)),
+        ('customer of a uid', lambda: StripeCustomerModel.objects.for_uid(uid)),
+        ('customer by email', lambda: StripeCustomerModel.objects.filter(email=f'user{customers // 3}@example.com')),
+        ('active subscriptions of a customer', lambda: StripeSubscriptionModel.objects.active().filter(customer_id=customer_id)),
+        ('next 50 active renewals', lambda: StripeSubscriptionModel.objects.active().order_by('current_period_end')[:50]),
+        ('50 latest past_due', lambda: StripeSubscriptionModel.objects.filter(status='past_due')[:50]),
+        ('50 latest subscriptions', lambda: StripeSubscriptionModel.objects.all()[:50]),
+        ('active plans of a product', lambda: StripePlanModel.objects.filter(product_id='prod_1', active=True)),
+        ('active products', lambda: StripeProductModel.objects.filter(active=True)),
+        ('metadata contains uid', lambda: StripeSubscriptionModel.objects.filter(metadata__contains={'uid': uid})),
+    ]
+
+
+def run_lookups(rows: int, rounds: int) -> None:
+    from django.db import connection
+    from django.db.utils import NotSupportedError
+
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    for label, queryset in lookups(rows):
+        try:
+            plan = queryset().explain()
+        except NotSupportedError:
+            # `contains` on JSON needs PostgreSQL (or MySQL/Oracle)
+            print(f"{label:<40} not supported by {connection.vendor}\n")
+            continue
+        durations = measure(lambda index: list(queryset()), rounds)
+        print(summary(label, durations))
+        for line in plan.splitlines():
+            print(f"    {line}")
+        print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000, help='Number of subscriptions')
+    parser.add_argument('--rounds', type=int, default=5, help='Number of runs per lookup')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.core.management import call_command
+    from django.db import connection
+
+    if connection.vendor != 'postgresql':
+        print(f"{connection.vendor}: the PostgreSQL only indexes are not created, their lookups are not measured\n")
+    call_command('migrate', verbosity=0)
+    populate(args.rows)
+    for title, migration in [
+        ('Without mirror indexes (0007)', '0007_stripe_relation_accessors'),
+        ('With mirror indexes (0008)', '0008_stripe_mirror_indexes'),
+    ]:
+        call_command('migrate', 'drf_easily_saas', migration, verbosity=0)
+        print(f"{'=' * 20} {title} {'=' * 20}\n")
+        run_lookups(args.rows, args.rounds)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Startup cost of a process with drf_easily_saas installed.
+
+Each round starts a fresh interpreter (module caches are per process) and measures:
+- `django.setup()` with the app config installed (`ready()` validates the settings)
+- importing the URLconf and the authentication classes, as the system checks and the
+  first request of a worker do
+- the first use of the auth provider (Firebase app initialisation)
+
+A throwaway Firebase service account is generated, no network call is made.
+
+Usage:
+    python -m drf_easily_saas.tests.benchmarks.bench_startup [--rounds 10]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from drf_easily_saas.tests.benchmarks.utils import BENCHMARK_EASILY, summary
+
+PHASES = ['django.setup()', 'URLconf and authentications', 'first provider use']
+
+
+def service_account() -> dict:
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    return {
+        'type': 'service_account',
+        'project_id': 'benchmark',
+        'private_key_id': 'benchmark',
+        'private_key': private_key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        ).decode(),
+        'client_email': 'benchmark@benchmark.iam.gserviceaccount.com',
+        'client_id': '1',
+        'token_uri': 'https://oauth2.googleapis.com/token',
+    }
+
+
+def child(config_path: str) -> None:
+    """
+    Measure the phases in this (fresh) process and print them as JSON.
+    """
+    import firebase_admin
+
+    from drf_easily_saas.tests.benchmarks.utils import setup_django
+
+    easily = {
+        **BENCHMARK_EASILY,
+        'auth_provider': 'firebase',
+        'firebase_config': {'config': config_path, 'import_users': True},
+    }
+    durations = {}
+    started_at = time.perf_counter()
+    setup_django(
+        EASILY=easily,
+        INSTALLED_APPS=[
+            'django.contrib.auth',
+            'django.contrib.contenttypes',
+            'rest_framework',
+            'drf_easily_saas.app.DrfEasilyAuthConfig',
+        ],
+    )
+    durations[PHASES[0]] = time.perf_counter() - started_at
+    initialised = {PHASES[0]: bool(firebase_admin._apps)}
+
+    started_at = time.perf_counter()
+    import drf_easily_saas.payment.urls  # noqa: F401
+    import drf_easily_saas.auth.firebase.protect  # noqa: F401
+    durations[PHASES[1]] = time.perf_counter() - started_at
+    initialised[PHASES[1]] = bool(firebase_admin._apps)
+
+    started_at = time.perf_counter()
+    from drf_easily_saas.auth.firebase.verifier import get_token_verifier
+    get_token_verifier()
+    durations[PHASES[2]] = time.perf_counter() - started_at
+    initialised[PHASES[2]] = bool(firebase_admin._apps)
+
+    print(json.dumps({'durations': durations, 'initialised': initialised}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rounds', type=int, default=10, help='Number of fresh processes')
+    parser.add_argument('--child', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(args.child)
+
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as config_file:
+        json.dump(service_account(), config_file)
+    try:
+        results = []
+        for _ in range(args.rounds):
+            output = subprocess.run(
+                [sys.executable, '-m', __spec__.name, '--child', config_file.name],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+    finally:
+        os.unlink(config_file.name)
+
+    for phase in PHASES:
+        durations = [result['durations'][phase] * 1000 for result in results]
+        print(f"{summary(phase, durations)}   Firebase app initialised: {results[-1]['initialised'][phase]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+import json
+import time
+import statistics
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List
+from urllib.parse import parse_qs
+
+# -------------------------------------------- #
+# Django
+# -------------------------------------------- #
+BENCHMARK_EASILY = {
+    'auth_provider': 'supabase',
+    'payment_provider': 'stripe',
+    'frontend_url': 'http://localhost:3000',
+    'supabase_config': {
+        'url': 'https://benchmark.supabase.co',
+        'anon_key': 'anon',
+        'service_role_key': 'service-role',
+        'import_users': False,
+        'jwt_secret': 'benchmark-jwt-secret-with-at-least-32-characters',
+    },
+    'stripe_config': {'public_key': 'pk_test_benchmark', 'secret_key': 'sk_test_benchmark'},
+}
+
+
+def setup_django(**overrides) -> None:
+    """
+    Configure a throwaway Django project (in-memory SQLite) unless DJANGO_SETTINGS_MODULE is set.
+    """
+    import django
+    from django.conf import settings
+
+    if not settings.configured:
+        options = {
+            'SECRET_KEY': 'benchmark',
+            'USE_TZ': True,
+            'INSTALLED_APPS': [
+                'django.contrib.auth',
+                'django.contrib.contenttypes',
+                'rest_framework',
+                'drf_easily_saas',
+            ],
+            'DATABASES': {'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}},
+            'DEFAULT_AUTO_FIELD': 'django.db.models.BigAutoField',
+            'EASILY': BENCHMARK_EASILY,
+        }
+        options.update(overrides)
+        settings.configure(**options)
+    django.setup()
+
+
+# -------------------------------------------- #
+# Stub Stripe server
+# -------------------------------------------- #
+class StubStripeServer:
+    """
+    Minimal local Stripe API answering customers and subscriptions calls after `latency` seconds.
+
+    Usage:
+        with StubStripeServer(latency=0.05) as server:
+            stripe.api_base = server.url
+    """
+    def __init__(self, latency: float = 0.05):
+        self.latency = latency
+        self.objects: Dict[str, Dict[str, Any]] = {}
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def get_object(self, resource: str, object_id: str) -> Dict[str, Any]:
+        if object_id not in self.objects:
+            stripe_object = {'id': object_id, 'object': resource.rstrip('s'), 'metadata': {}}
+            if resource == 'subscriptions':
+                stripe_object.update({'status': 'active', 'plan': {'id': 'plan_benchmark', 'object': 'plan'}})
+            self.objects[object_id] = stripe_object
+        return self.objects[object_id]
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _respond(self):
+                time.sleep(server.latency)
+                _, _, resource, object_id = self.path.split('?')[0].split('/')[:4]
+                length = int(self.headers.get('Content-Length') or 0)
+                params = parse_qs(self.rfile.read(length).decode()) if length else {}
+                with server._lock:
+                    server.requests += 1
+                    stripe_object = server.get_object(resource, object_id)
+                    for key, values in params.items():
+                        if key.startswith('metadata['):
+                            stripe_object['metadata'][key[len('metadata['):-1]] = values[0]
+                    body = json.dumps(stripe_object).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_GET = _respond
+            do_POST = _respond
+
+        return Handler
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+# -------------------------------------------- #
+# Measures
+# -------------------------------------------- #
+def measure(func: Callable[[int], Any], rounds: int) -> List[float]:
+    """
+    Call `func(round_index)` `rounds` times and return the durations in milliseconds.
+    """
+    durations = []
+    for index in range(rounds):
+        started_at = time.perf_counter()
+        func(index)
+        durations.append((time.perf_counter() - started_at) * 1000)
+    return durations
+
+
+def summary(label: str, durations: List[float]) -> str:
+    ordered = sorted(durations)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return f"{label:<40} mean {statistics.mean(durations):8.2f} ms   p50 {statistics.median(durations):8.2f} ms   p95 {p95:8.2f} ms"
@@ -0,0 +1,137 @@
+"""
+Firebase custom claims writes of the Stripe webhooks.
+
+Run from a project with `drf_easily_saas` installed:
+    python manage.py test drf_easily_saas.tests.test_claims
+"""
+import threading
+from collections import Counter
+from unittest import mock
+
+# Django
+from django.core.cache import caches
+from django.test import SimpleTestCase
+
+# Drf Easily Saas
+from drf_easily_saas.auth.firebase import claims as firebase_claims
+from drf_easily_saas.auth.firebase.claims import ClaimsCoalescer
+
+ACTIVE = {'status': 'active', 'plan_id': 'price_pro'}
+CANCELED = {'status': 'canceled', 'plan_id': 'price_pro'}
+
+
+class FakeFirebaseAuth:
+    """
+    In-memory stand-in of `firebase_admin.auth` counting the Admin SDK calls.
+    """
+    def __init__(self, fail=False):
+        self.claims = {}
+        self.calls = Counter()
+        self.fail = fail
+
+    def get_user(self, uid, app=None):
+        self.calls['get_user'] += 1
+        raise AssertionError('claims are not read back')
+
+    def set_custom_user_claims(self, uid, claims, app=None):
+        self.calls['set_custom_user_claims'] += 1
+        if self.fail:
+            raise RuntimeError('Firebase unavailable')
+        self.claims[uid] = claims
+
+    def revoke_refresh_tokens(self, uid, app=None):
+        self.calls['revoke_refresh_tokens'] += 1
+
+
+class ClaimsCoalescerTests(SimpleTestCase):
+    def setUp(self):
+        self.auth = FakeFirebaseAuth()
+        for target, value in [
+            ('auth', self.auth),
+            ('ensure_firebase_app', lambda: None),
+            ('get_token_cache', lambda: mock.Mock()),
+        ]:
+            patcher = mock.patch.object(firebase_claims, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        caches['default'].clear()
+        self.coalescer = ClaimsCoalescer(window=0)
+
+    def submit_concurrently(self, coalescer, updates):
+        # One thread per Stripe event, as the webhook requests or the inbox workers
+        results, errors = [], []
+
+        def submit(claims):
+            try:
+                results.append(coalescer.submit('uid_0', claims))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=submit, args=(claims,)) for claims in updates]
+        threads[0].start()
+        # The first update opens the window, the others join it
+        while 'uid_0' not in coalescer._pending:
+            pass
+        for thread in threads[1:]:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, errors
+
+    def test_write_is_two_sdk_calls(self):
+        self.assertTrue(self.coalescer.submit('uid_0', ACTIVE))
+        self.assertEqual(self.auth.calls, Counter(set_custom_user_claims=1, revoke_refresh_tokens=1))
+        self.assertEqual(self.auth.claims['uid_0'], ACTIVE)
+
+    def test_last_written_claims_are_skipped_without_sdk_call(self):
+        self.coalescer.submit('uid_0', ACTIVE)
+        self.assertFalse(self.coalescer.submit('uid_0', ACTIVE))
+        self.assertEqual(self.auth.calls['set_custom_user_claims'], 1)
+        self.assertEqual(self.auth.calls['get_user'], 0)
+
+    def test_claims_changed_by_another_worker_are_written(self):
+        # Workers share the Django cache: A writes active, B cancels, A's next active is written
+        other_worker = ClaimsCoalescer(window=0)
+        self.coalescer.submit('uid_0', ACTIVE)
+        other_worker.submit('uid_0', CANCELED)
+        self.assertTrue(self.coalescer.submit('uid_0', ACTIVE))
+        self.assertEqual(self.auth.claims['uid_0'], ACTIVE)
+
+    def test_updates_of_several_events_are_coalesced(self):
+        coalescer = ClaimsCoalescer(window=0.2)
+        results, errors = self.submit_concurrently(coalescer, [ACTIVE, CANCELED, ACTIVE, CANCELED, ACTIVE])
+        self.assertEqual(errors, [])
+        self.assertEqual(len(results), 5)
+        # 5 subscription changes of a user, one write
+        self.assertEqual(self.auth.calls, Counter(set_custom_user_claims=1, revoke_refresh_tokens=1))
+        self.assertEqual(coalescer.stats()['coalesced'], 4)
+
+    def test_failed_write_fails_every_coalesced_event(self):
+        self.auth.fail = True
+        coalescer = ClaimsCoalescer(window=0.2)
+        results, errors = self.submit_concurrently(coalescer, [ACTIVE, CANCELED, ACTIVE])
+        self.assertEqual(results, [])
+        self.assertEqual(len(errors), 3)
+        # Nothing is remembered, the redelivered events write again
+        self.assertIsNone(caches['default'].get(coalescer.make_key('uid_0')))
+
+    def test_batch_keeps_the_last_update_of_a_user(self):
+        with self.coalescer.batch():
+            self.coalescer.submit('uid_0', ACTIVE)
+            self.coalescer.submit('uid_0', CANCELED)
+            self.coalescer.submit('uid_1', ACTIVE)
+            self.assertEqual(self.auth.calls['set_custom_user_claims'], 0)
+        self.assertEqual(self.auth.claims, {'uid_0': CANCELED, 'uid_1': ACTIVE})
+
+    def test_failed_write_raises_at_the_end_of_the_batch(self):
+        self.auth.fail = True
+        with self.assertRaises(RuntimeError):
+            with self.coalescer.batch():
+                self.coalescer.submit('uid_0', ACTIVE)
+
+    def test_nothing_is_written_when_the_batch_fails(self):
+        with self.assertRaises(ValueError):
+            with self.coalescer.batch():
+                self.coalescer.submit('uid_0', ACTIVE)
+                raise ValueError('handler failed')
+        self.assertEqual(self.auth.calls, Counter())
@@ -0,0 +1,157 @@
+"""
+Entitlement lookup and subscription permissions.
+
+Run from a project with `drf_easily_saas` installed:
+    python manage.py test drf_easily_saas.tests.test_entitlements
+"""
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+
+# Django
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+
+# Drf Easily Saas
+from drf_easily_saas.models import StripeCustomerModel, StripeSubscriptionModel
+from drf_easily_saas.payment import entitlements
+from drf_easily_saas.payment.entitlements import (
+    NO_ENTITLEMENT,
+    EntitlementCache,
+    entitlement_from_claims,
+    get_entitlement,
+    refresh_entitlement,
+)
+from drf_easily_saas.payment.permissions import HasActiveSubscription, HasPlan
+
+
+def token(**claims):
+    return {'uid': 'uid_0', 'sub': 'uid_0', 'exp': time.time() + 3600, **claims}
+
+
+SUBSCRIPTION_CLAIMS = {'status': 'active', 'plan_id': 'price_pro', 'customer_id': 'cus_0', 'subscription_id': 'sub_0'}
+
+
+class EntitlementTestCase(TestCase):
+    def setUp(self):
+        # Fresh process-wide cache for each test
+        entitlements._entitlement_cache = EntitlementCache(alias='default', ttl=3600)
+        entitlements._entitlement_cache.shared.clear()
+        self.addCleanup(setattr, entitlements, '_entitlement_cache', None)
+        self.user = User.objects.create(username='uid_0')
+
+    def mirror_subscription(self, status='active', plan_id='price_basic', customer_id='cus_0', subscription_id='sub_0'):
+        now = timezone.now()
+        customer = StripeCustomerModel.objects.create(id=customer_id, email='user@example.com', user=self.user)
+        return StripeSubscriptionModel.objects.create(
+            id=subscription_id,
+            currency='usd',
+            current_period_start=now,
+            current_period_end=now + timedelta(days=30),
+            customer=customer,
+            items={'object': 'list', 'data': [{'id': 'si_0', 'plan': {'id': plan_id}}]},
+            metadata={'uid': 'uid_0'},
+            status=status,
+        )
+
+
+class EntitlementFromClaimsTests(EntitlementTestCase):
+    def test_firebase_custom_claims(self):
+        entitlement = entitlement_from_claims(token(**SUBSCRIPTION_CLAIMS))
+        self.assertTrue(entitlement.has_plan('price_pro'))
+
+    def test_supabase_app_metadata(self):
+        entitlement = entitlement_from_claims(token(app_metadata={'provider': 'email', **SUBSCRIPTION_CLAIMS}))
+        self.assertTrue(entitlement.has_plan('price_pro'))
+
+    def test_supabase_user_metadata_is_ignored(self):
+        # Any signed-in Supabase user can write its own user_metadata
+        forged = token(app_metadata={'provider': 'email'}, user_metadata=SUBSCRIPTION_CLAIMS)
+        self.assertIsNone(entitlement_from_claims(forged))
+
+    def test_incomplete_claims(self):
+        self.assertIsNone(entitlement_from_claims(token(status='active')))
+        self.assertIsNone(entitlement_from_claims(None))
+
+
+class GetEntitlementTests(EntitlementTestCase):
+    def test_forged_user_metadata_grants_nothing(self):
+        forged = token(app_metadata={'provider': 'email'}, user_metadata=SUBSCRIPTION_CLAIMS)
+        self.assertEqual(get_entitlement(self.user, forged), NO_ENTITLEMENT)
+        # The refusal is cached, the next request does not query
+        with self.assertNumQueries(0):
+            self.assertFalse(get_entitlement(self.user, forged).is_active)
+
+    def test_forged_user_metadata_does_not_extend_the_mirror(self):
+        self.mirror_subscription(plan_id='price_basic')
+        forged = token(user_metadata=SUBSCRIPTION_CLAIMS)
+        entitlement = get_entitlement(self.user, forged)
+        self.assertTrue(entitlement.has_plan('price_basic'))
+        self.assertFalse(entitlement.has_plan('price_pro'))
+
+    def test_claims_are_used_without_query(self):
+        with self.assertNumQueries(0):
+            entitlement = get_entitlement(self.user, token(**SUBSCRIPTION_CLAIMS))
+        self.assertTrue(entitlement.has_plan('price_pro'))
+
+    def test_mirror_is_used_without_claims(self):
+        self.mirror_subscription()
+        # One indexed join, then nothing once cached
+        with self.assertNumQueries(1):
+            entitlement = get_entitlement(self.user, token())
+            get_entitlement(self.user, token())
+        self.assertEqual(entitlement.subscription_id, 'sub_0')
+        self.assertTrue(entitlement.has_plan('price_basic'))
+
+    def test_mirror_refreshed_by_webhook_wins_over_claims(self):
+        self.mirror_subscription(status='canceled')
+        refresh_entitlement('uid_0')
+        entitlement = get_entitlement(self.user, token(**SUBSCRIPTION_CLAIMS))
+        self.assertEqual(entitlement.status, 'canceled')
+        self.assertFalse(entitlement.is_active)
+
+    def test_subscriptions_of_every_customer_of_the_user(self):
+        # Each checkout made with the email only creates a new customer
+        self.mirror_subscription(plan_id='price_basic')
+        self.mirror_subscription(status='canceled', plan_id='price_old', customer_id='cus_1', subscription_id='sub_1')
+        self.mirror_subscription(plan_id='price_pro', customer_id='cus_2', subscription_id='sub_2')
+        entitlement = get_entitlement(self.user, token())
+        self.assertTrue(entitlement.has_plan('price_basic'))
+        self.assertTrue(entitlement.has_plan('price_pro'))
+        self.assertFalse(entitlement.has_plan('price_old'))
+
+    def test_without_subscription(self):
+        self.assertEqual(get_entitlement(self.user, token()), NO_ENTITLEMENT)
+
+
+class PermissionTests(EntitlementTestCase):
+    def request(self, decoded_token):
+        return SimpleNamespace(user=self.user, auth=decoded_token)
+
+    def test_has_active_subscription(self):
+        self.assertTrue(HasActiveSubscription().has_permission(self.request(token(**SUBSCRIPTION_CLAIMS)), None))
+
+    def test_has_active_subscription_refuses_forged_user_metadata(self):
+        forged = token(user_metadata=SUBSCRIPTION_CLAIMS)
+        self.assertFalse(HasActiveSubscription().has_permission(self.request(forged), None))
+
+    def test_has_active_subscription_refuses_anonymous(self):
+        request = SimpleNamespace(user=SimpleNamespace(is_authenticated=False), auth=None)
+        self.assertFalse(HasActiveSubscription().has_permission(request, None))
+
+    def test_has_plan(self):
+        request = self.request(token(**SUBSCRIPTION_CLAIMS))
+        self.assertTrue(HasPlan.of('price_pro', 'price_team')().has_permission(request, None))
+        self.assertFalse(HasPlan.of('price_team')().has_permission(request, None))
+
+    def test_has_plan_of_view(self):
+        request = self.request(token(**SUBSCRIPTION_CLAIMS))
+        view = SimpleNamespace(required_plans=['price_pro'])
+        self.assertTrue(HasPlan().has_permission(request, view))
+
+    def test_has_plan_refuses_forged_user_metadata(self):
+        self.mirror_subscription(plan_id='price_basic')
+        request = self.request(token(user_metadata=SUBSCRIPTION_CLAIMS))
+        self.assertFalse(HasPlan.of('price_pro')().has_permission(request, None))
+        self.assertTrue(HasPlan.of('price_basic')().has_permission(request, None))
@@ -0,0 +1,61 @@
+"""
+Signing keys fetched and refreshed by the token verifiers.
+
+Run from a project with `drf_easily_saas` installed:
+    python manage.py test drf_easily_saas.tests.test_keys
+"""
+import threading
+from unittest import mock
+
+import httpx
+from asgiref.sync import async_to_sync
+
+# Django
+from django.test import SimpleTestCase
+
+# Drf Easily Saas
+from drf_easily_saas.auth import keys
+from drf_easily_saas.auth.keys import AsyncKeySet
+
+
+class AsyncKeySetTests(SimpleTestCase):
+    def setUp(self):
+        self.documents = [{'kid_0': 'key_0'}, {'kid_0': 'key_1'}]
+        self.fetches = 0
+        self.refresh_allowed = threading.Event()
+        self.refresh_allowed.set()
+
+        def handler(request):
+            self.fetches += 1
+            self.refresh_allowed.wait(timeout=5)
+            return httpx.Response(200, json=self.documents[min(self.fetches, len(self.documents)) - 1])
+
+        transport = httpx.MockTransport(handler)
+        client_class = httpx.AsyncClient
+        patcher = mock.patch.object(
+            keys.httpx, 'AsyncClient', lambda **kwargs: client_class(transport=transport, **kwargs),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.key_set = AsyncKeySet('https://keys.example.com', parse=lambda data: data)
+
+    def test_background_refresh_outlives_the_sync_request(self):
+        # Each sync authentication runs on its own event loop, closed after the request
+        get = async_to_sync(self.key_set.get)
+        self.assertEqual(get('kid_0'), 'key_0')
+
+        self.key_set._expires_at = 0
+        self.refresh_allowed.clear()
+        # The expired keys are served while the refresh runs
+        self.assertEqual(get('kid_0'), 'key_0')
+        self.refresh_allowed.set()
+        self.key_set._future.result(timeout=5)
+        self.assertEqual(get('kid_0'), 'key_1')
+        self.assertEqual(self.fetches, 2)
+
+    def test_unknown_key_id_is_fetched_inline(self):
+        get = async_to_sync(self.key_set.get)
+        self.assertEqual(get('kid_0'), 'key_0')
+        self.key_set._fetched_at -= keys.KEYS_MIN_REFRESH_INTERVAL
+        self.assertIsNone(get('kid_1'))
+        self.assertEqual(self.fetches, 2)
@@ -0,0 +1,82 @@
+"""
+Webhook write-through of the Stripe mirror with events delivered out of order.
+
+Run from a project with `drf_easily_saas` installed:
+    python manage.py test drf_easily_saas.tests.test_stripe_mirror
+"""
+import time
+
+# Django
+from django.test import TestCase
+
+# Drf Easily Saas
+from drf_easily_saas.models import StripeCustomerModel, StripeMirrorTombstoneModel, StripeSubscriptionModel
+from drf_easily_saas.payment.stripe.mirror import mirror_event, purge_tombstones
+
+NOW = int(time.time())
+
+
+def customer_event(event_type, created, email='user@example.com'):
+    return {
+        'id': f'evt_{event_type}_{created}',
+        'type': event_type,
+        'created': created,
+        'data': {'object': {'id': 'cus_0', 'object': 'customer', 'email': email, 'metadata': {}, 'name': 'User'}},
+    }
+
+
+def subscription_event(created):
+    return {
+        'id': f'evt_sub_{created}',
+        'type': 'customer.subscription.updated',
+        'created': created,
+        'data': {'object': {
+            'id': 'sub_0',
+            'object': 'subscription',
+            'cancel_at_period_end': False,
+            'currency': 'usd',
+            'current_period_start': created,
+            'current_period_end': created + 30 * 86400,
+            'customer': 'cus_0',
+            'default_payment_method': None,
+            'items': {'object': 'list', 'data': []},
+            'metadata': {},
+            'status': 'active',
+        }},
+    }
+
+
+class MirrorDeleteTests(TestCase):
+    def test_older_update_after_delete_does_not_resurrect(self):
+        self.assertTrue(mirror_event(customer_event('customer.created', NOW - 20)))
+        self.assertTrue(mirror_event(customer_event('customer.deleted', NOW)))
+        self.assertFalse(mirror_event(customer_event('customer.updated', NOW - 10, email='old@example.com')))
+        self.assertFalse(StripeCustomerModel.objects.filter(id='cus_0').exists())
+
+    def test_delete_before_create_is_kept(self):
+        self.assertTrue(mirror_event(customer_event('customer.deleted', NOW)))
+        self.assertFalse(mirror_event(customer_event('customer.created', NOW - 20)))
+        self.assertFalse(StripeCustomerModel.objects.filter(id='cus_0').exists())
+
+    def test_newer_write_than_delete_is_applied(self):
+        mirror_event(customer_event('customer.deleted', NOW - 20))
+        self.assertTrue(mirror_event(customer_event('customer.updated', NOW)))
+        self.assertTrue(StripeCustomerModel.objects.filter(id='cus_0').exists())
+
+    def test_older_delete_keeps_newer_state(self):
+        mirror_event(customer_event('customer.updated', NOW))
+        self.assertFalse(mirror_event(customer_event('customer.deleted', NOW - 20)))
+        self.assertTrue(StripeCustomerModel.objects.filter(id='cus_0').exists())
+        self.assertFalse(StripeMirrorTombstoneModel.objects.exists())
+
+    def test_child_of_deleted_customer_does_not_create_placeholder(self):
+        mirror_event(customer_event('customer.deleted', NOW))
+        self.assertFalse(mirror_event(subscription_event(NOW - 10)))
+        self.assertFalse(StripeCustomerModel.objects.exists())
+        self.assertFalse(StripeSubscriptionModel.objects.exists())
+
+    def test_purge_tombstones(self):
+        mirror_event(customer_event('customer.deleted', NOW))
+        self.assertEqual(purge_tombstones(1), 0)
+        StripeMirrorTombstoneModel.objects.update(deleted_at='2000-01-01T00:00:00Z')
+        self.assertEqual(purge_tombstones(1), 1)
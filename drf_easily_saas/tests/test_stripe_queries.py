@@ -0,0 +1,180 @@
+"""
+Query-count regression tests of the Stripe mirror relationship accessors.
+
+Run from a project with `drf_easily_saas` installed:
+    python manage.py test drf_easily_saas.tests.test_stripe_queries
+"""
+from datetime import timedelta
+from io import StringIO
+
+# Django
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+# Drf Easily Saas
+from drf_easily_saas.models import (
+    StripeCustomerModel,
+    StripePlanModel,
+    StripeProductModel,
+    StripeSubscriptionItemModel,
+    StripeSubscriptionModel,
+)
+from drf_easily_saas.payment.stripe.sync.customers import link_customer_user, link_customer_users
+
+
+class StripeQueriesTestCase(TestCase):
+    customers = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.product = StripeProductModel.objects.create(
+            id='prod_queries', name='Queries', object='product', created=now, updated=now, default_price='price_month',
+        )
+        for plan_id, interval in [('price_month', 'month'), ('price_year', 'year')]:
+            StripePlanModel.objects.create(
+                id=plan_id, currency='usd', interval=interval, billing_scheme='per_unit', created=now, product=cls.product,
+            )
+        for index in range(cls.customers):
+            cls.create_customer(index, now)
+
+    @classmethod
+    def create_customer(cls, index, now):
+        customer = StripeCustomerModel.objects.create(id=f'cus_{index}', email=f'customer{index}@example.com')
+        for status in ['active', 'canceled']:
+            subscription = StripeSubscriptionModel.objects.create(
+                id=f'sub_{status}_{index}',
+                currency='usd',
+                current_period_start=now,
+                current_period_end=now + timedelta(days=30),
+                customer=customer,
+                items={'object': 'list', 'data': []},
+                status=status,
+            )
+            for plan_id in ['price_month', 'price_year']:
+                StripeSubscriptionItemModel.objects.create(
+                    id=f'si_{status}_{index}_{plan_id}', subscription=subscription, plan_id=plan_id,
+                )
+        return customer
+
+
+class SubscriptionPlansTests(StripeQueriesTestCase):
+    def test_get_plans_without_prefetch(self):
+        subscription = StripeSubscriptionModel.objects.get(id='sub_active_0')
+        with self.assertNumQueries(1):
+            plans = subscription.get_plans()
+        self.assertEqual({plan.id for plan in plans}, {'price_month', 'price_year'})
+
+    def test_with_plans(self):
+        with self.assertNumQueries(2):
+            plans = [subscription.get_plans() for subscription in StripeSubscriptionModel.objects.with_plans()]
+        self.assertEqual(len(plans), self.customers * 2)
+        self.assertTrue(all(len(subscription_plans) == 2 for subscription_plans in plans))
+
+    def test_with_plans_query_count_does_not_grow(self):
+        self.create_customer(self.customers, timezone.now())
+        with self.assertNumQueries(2):
+            for subscription in StripeSubscriptionModel.objects.with_plans():
+                subscription.get_plans()
+
+    def test_active(self):
+        self.assertEqual(StripeSubscriptionModel.objects.active().count(), self.customers)
+
+
+class CustomerPlansTests(StripeQueriesTestCase):
+    def test_get_plans_without_prefetch(self):
+        customer = StripeCustomerModel.objects.get(id='cus_0')
+        with self.assertNumQueries(2):
+            plans = customer.get_plans()
+        self.assertEqual(len(plans), 4)
+
+    def test_with_plans(self):
+        with self.assertNumQueries(3):
+            plans = [customer.get_plans() for customer in StripeCustomerModel.objects.with_plans()]
+        self.assertEqual(len(plans), self.customers)
+        self.assertTrue(all(len(customer_plans) == 4 for customer_plans in plans))
+
+    def test_with_plans_query_count_does_not_grow(self):
+        self.create_customer(self.customers, timezone.now())
+        with self.assertNumQueries(3):
+            for customer in StripeCustomerModel.objects.with_plans():
+                customer.get_plans()
+
+    def test_with_active_subscription(self):
+        StripeCustomerModel.objects.create(id='cus_without_subscription', email='none@example.com')
+        with self.assertNumQueries(3):
+            customers = list(StripeCustomerModel.objects.with_active_subscription())
+            plans = [
+                plan.id
+                for customer in customers
+                for subscription in customer.active_subscriptions
+                for plan in subscription.get_plans()
+            ]
+        self.assertEqual(len(customers), self.customers)
+        self.assertTrue(all(len(customer.active_subscriptions) == 1 for customer in customers))
+        self.assertEqual(len(plans), self.customers * 2)
+
+
+class ProductPricesTests(StripeQueriesTestCase):
+    def test_get_default_price_without_join(self):
+        product = StripeProductModel.objects.get(id='prod_queries')
+        with self.assertNumQueries(1):
+            self.assertEqual(product.get_default_price().id, 'price_month')
+
+    def test_with_default_price(self):
+        with self.assertNumQueries(1):
+            prices = [product.get_default_price() for product in StripeProductModel.objects.with_default_price()]
+        self.assertEqual([price.id for price in prices], ['price_month'])
+
+    def test_with_default_price_without_default(self):
+        now = timezone.now()
+        StripeProductModel.objects.create(id='prod_free', name='Free', object='product', created=now - timedelta(days=1), updated=now)
+        with self.assertNumQueries(1):
+            prices = {product.id: product.get_default_price() for product in StripeProductModel.objects.with_default_price()}
+        self.assertIsNone(prices['prod_free'])
+
+    def test_get_subscriptions(self):
+        with self.assertNumQueries(2):
+            product_subscriptions = list(self.product.get_subscriptions())
+            plan_subscriptions = list(StripePlanModel(id='price_month').get_subscriptions())
+        # Each subscription holds both plans of the product: listed once
+        self.assertEqual(len(product_subscriptions), self.customers * 2)
+        self.assertEqual(len(plan_subscriptions), self.customers * 2)
+
+
+class CustomerUserTests(StripeQueriesTestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='uid_0')
+        StripeCustomerModel.objects.filter(id='cus_0').update(metadata={'uid': 'uid_0'})
+
+    def test_link_customer_users(self):
+        with self.assertNumQueries(2):
+            linked = link_customer_users([{'id': 'cus_0', 'metadata': {'uid': 'uid_0'}}, {'id': 'cus_1', 'metadata': {}}])
+        self.assertEqual(linked, 1)
+        self.assertEqual(StripeCustomerModel.objects.get(user=self.user).id, 'cus_0')
+
+    def test_link_customer_users_keeps_other_customers(self):
+        link_customer_users([{'id': 'cus_0', 'metadata': {'uid': 'uid_0'}}])
+        self.assertEqual(link_customer_users([{'id': 'cus_1', 'metadata': {'uid': 'uid_0'}}]), 1)
+        self.assertEqual(set(self.user.stripe_customers.values_list('id', flat=True)), {'cus_0', 'cus_1'})
+
+    def test_link_customer_user_keeps_other_customers(self):
+        link_customer_users([{'id': 'cus_0', 'metadata': {'uid': 'uid_0'}}])
+        self.assertTrue(link_customer_user('cus_1', 'uid_0'))
+        self.assertEqual(set(StripeCustomerModel.objects.for_user(self.user).values_list('id', flat=True)), {'cus_0', 'cus_1'})
+        self.assertFalse(link_customer_user('cus_1', 'unknown_uid'))
+
+    def test_backfill_command(self):
+        call_command('linkstripecustomers', chunk_size=1, stdout=StringIO())
+        self.assertEqual(StripeCustomerModel.objects.get(user=self.user).id, 'cus_0')
+
+    def test_current_user_subscription(self):
+        link_customer_users([{'id': 'cus_0', 'metadata': {'uid': 'uid_0'}}])
+        with self.assertNumQueries(1):
+            by_user = [subscription.id for subscription in StripeSubscriptionModel.objects.for_user(self.user).active()]
+        with self.assertNumQueries(1):
+            by_uid = [subscription.id for subscription in StripeSubscriptionModel.objects.for_user('uid_0').active()]
+        self.assertEqual(by_user, ['sub_active_0'])
+        self.assertEqual(by_uid, by_user)
@@ -0,0 +1,169 @@
+"""
+Incremental Stripe sync from the persisted high-water marks.
+
+Run from a project with `drf_easily_saas` installed:
+    python manage.py test drf_easily_saas.tests.test_stripe_sync
+"""
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+import stripe
+
+# Django
+from django.test import TestCase
+from django.utils import timezone
+
+# Drf Easily Saas
+from drf_easily_saas.models import (
+    StripeCustomerModel,
+    StripeMirrorTombstoneModel,
+    StripeProductModel,
+    StripeSubscriptionModel,
+    StripeSyncStateModel,
+)
+from drf_easily_saas.payment.stripe.sync import customers as sync_customers
+from drf_easily_saas.payment.stripe.sync import incremental
+from drf_easily_saas.payment.stripe.sync.incremental import sync_incremental
+
+
+class FakeList(dict):
+    def __init__(self, data):
+        super().__init__(data=data, has_more=False)
+
+    def auto_paging_iter(self):
+        return iter(self['data'])
+
+
+class FakeStripeClient:
+    """
+    Stand-in of the StripeClient serving the events and customers it holds.
+    """
+    def __init__(self):
+        self.event_list = []
+        self.customer_objects = {}
+        self.unavailable = False
+        self.events = SimpleNamespace(list=self.list_events)
+        self.customers = SimpleNamespace(retrieve=self.retrieve_customer)
+
+    def add_event(self, event_id, event_type, stripe_object, created):
+        # Stripe lists the events newest first
+        self.event_list.insert(0, {'id': event_id, 'type': event_type, 'created': created, 'data': {'object': stripe_object}})
+
+    def list_events(self, params=None):
+        events = [event for event in self.event_list if event['type'] in params['types']]
+        if 'created' in params:
+            events = [event for event in events if event['created'] >= params['created']['gte']]
+        return FakeList(events[:params['limit']] if params['limit'] == 1 else events)
+
+    def retrieve_customer(self, customer_id):
+        if self.unavailable:
+            raise stripe.APIConnectionError('Stripe unavailable')
+        return self.customer_objects.get(customer_id, {'id': customer_id, 'deleted': True})
+
+
+def customer(customer_id):
+    return {'id': customer_id, 'email': f'{customer_id}@example.com', 'metadata': {}, 'name': customer_id}
+
+
+def subscription(subscription_id, customer_id, created):
+    return {
+        'id': subscription_id,
+        'cancel_at_period_end': False,
+        'currency': 'usd',
+        'current_period_start': created,
+        'current_period_end': created + 30 * 86400,
+        'customer': customer_id,
+        'default_payment_method': None,
+        'items': {'object': 'list', 'data': []},
+        'metadata': {},
+        'status': 'active',
+    }
+
+
+class IncrementalSubscriptionSyncTests(TestCase):
+    def setUp(self):
+        self.client = FakeStripeClient()
+        for module in [incremental, sync_customers]:
+            patcher = mock.patch.object(module, 'get_stripe_client', lambda: self.client)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.started_at = int((timezone.now() - timedelta(hours=1)).timestamp())
+        self.client.add_event('evt_start', 'customer.subscription.created', subscription('sub_old', 'cus_0', self.started_at), self.started_at)
+        StripeCustomerModel.objects.create(id='cus_0', email='cus_0@example.com')
+        StripeSyncStateModel.objects.create(
+            object_type=StripeSyncStateModel.ObjectType.SUBSCRIPTION,
+            last_event_id='evt_start',
+            last_event_created=incremental.stripe_timestamp(self.started_at),
+        )
+
+    def sync(self):
+        return sync_incremental(StripeSyncStateModel.ObjectType.SUBSCRIPTION)
+
+    def state(self):
+        return StripeSyncStateModel.objects.get(object_type=StripeSyncStateModel.ObjectType.SUBSCRIPTION)
+
+    def test_missing_customer_is_fetched(self):
+        self.client.customer_objects['cus_1'] = customer('cus_1')
+        self.client.add_event('evt_1', 'customer.subscription.created', subscription('sub_1', 'cus_1', self.started_at), self.started_at + 10)
+        report = self.sync()
+        self.assertEqual(report['parents_fetched'], 1)
+        self.assertTrue(StripeSubscriptionModel.objects.filter(id='sub_1', customer_id='cus_1').exists())
+        self.assertEqual(self.state().last_event_id, 'evt_1')
+
+    def test_subscription_of_a_deleted_customer_is_dropped(self):
+        StripeSubscriptionModel.objects.create(
+            id='sub_1', currency='usd', customer_id='cus_0', items={'object': 'list', 'data': []}, status='active',
+            current_period_start=incremental.stripe_timestamp(self.started_at),
+            current_period_end=incremental.stripe_timestamp(self.started_at + 86400),
+        )
+        # Moved to a customer deleted since then
+        self.client.add_event('evt_1', 'customer.subscription.updated', subscription('sub_1', 'cus_gone', self.started_at), self.started_at + 10)
+        self.client.add_event('evt_2', 'customer.subscription.created', subscription('sub_2', 'cus_0', self.started_at), self.started_at + 20)
+        report = self.sync()
+        self.assertEqual((report['orphans'], report['skipped']), (1, 0))
+        self.assertFalse(StripeSubscriptionModel.objects.filter(id='sub_1').exists())
+        self.assertTrue(StripeSubscriptionModel.objects.filter(id='sub_2').exists())
+        self.assertEqual(
+            set(StripeMirrorTombstoneModel.objects.values_list('object_id', flat=True)), {'sub_1', 'cus_gone'},
+        )
+        # The mark moves on, the next run has nothing to replay
+        self.assertEqual(self.state().last_event_id, 'evt_2')
+        self.assertEqual(self.sync()['rows'], 0)
+
+    def test_mark_is_kept_before_a_stripe_error(self):
+        self.client.unavailable = True
+        self.client.customer_objects['cus_1'] = customer('cus_1')
+        self.client.add_event('evt_1', 'customer.subscription.created', subscription('sub_1', 'cus_1', self.started_at), self.started_at + 10)
+        self.client.add_event('evt_2', 'customer.subscription.created', subscription('sub_2', 'cus_0', self.started_at), self.started_at + 20)
+        report = self.sync()
+        self.assertEqual((report['orphans'], report['skipped']), (0, 1))
+        self.assertTrue(StripeSubscriptionModel.objects.filter(id='sub_2').exists())
+        state = self.state()
+        self.assertIsNone(state.last_event_id)
+        self.assertEqual(state.last_event_created, incremental.stripe_timestamp(self.started_at + 10))
+
+        # Once Stripe answers, the next run writes the held subscription
+        self.client.unavailable = False
+        report = self.sync()
+        self.assertEqual(report['skipped'], 0)
+        self.assertTrue(StripeSubscriptionModel.objects.filter(id='sub_1').exists())
+        self.assertEqual(self.state().last_event_id, 'evt_2')
+
+
+class IncrementalDeletionTests(TestCase):
+    def test_deleted_product_is_tombstoned(self):
+        client = FakeStripeClient()
+        patcher = mock.patch.object(incremental, 'get_stripe_client', lambda: client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        started_at = int((timezone.now() - timedelta(hours=1)).timestamp())
+        now = incremental.stripe_timestamp(started_at)
+        StripeProductModel.objects.create(id='prod_0', name='Pro', object='product', created=now, updated=now)
+        StripeSyncStateModel.objects.create(object_type=StripeSyncStateModel.ObjectType.PRODUCT, last_event_created=now)
+        client.add_event('evt_1', 'product.deleted', {'id': 'prod_0', 'object': 'product'}, started_at + 10)
+
+        report = sync_incremental(StripeSyncStateModel.ObjectType.PRODUCT)
+        self.assertEqual(report['deleted'], 1)
+        self.assertFalse(StripeProductModel.objects.exists())
+        self.assertTrue(StripeMirrorTombstoneModel.objects.filter(object_id='prod_0').exists())
@@ -0,0 +1,64 @@
+"""
+Django users created on the first login of a provider user.
+
+Run from a project with `drf_easily_saas` installed:
+    python manage.py test drf_easily_saas.tests.test_users
+"""
+from types import SimpleNamespace
+from unittest import mock
+
+# Django
+from django.contrib.auth.models import User
+from django.db import IntegrityError
+from django.test import TestCase
+
+# Drf Easily Saas
+from drf_easily_saas import settings as easily_settings
+from drf_easily_saas.auth import users
+from drf_easily_saas.auth.users import UserLookupCache, aget_or_create_user, get_or_create_user
+from drf_easily_saas.exceptions.config import InvalidConfigurationError
+from drf_easily_saas.models import SupabaseUserInformations
+from drf_easily_saas.schemas.cache import UserCacheConfig
+
+BrokenInformations = SimpleNamespace(objects=SimpleNamespace(create=mock.Mock(side_effect=IntegrityError('informations'))))
+
+
+class GetOrCreateUserTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(users, '_user_cache', UserLookupCache(ttl=0))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_creates_user_and_informations(self):
+        user = get_or_create_user('uid_0', 'user@example.com', SupabaseUserInformations, True, 'email')
+        self.assertFalse(user.has_usable_password())
+        self.assertTrue(SupabaseUserInformations.objects.filter(user=user, sign_in_provider='email').exists())
+
+    async def test_async_creates_user_and_informations(self):
+        user = await aget_or_create_user('uid_0', 'user@example.com', SupabaseUserInformations, True, 'email')
+        self.assertFalse(user.has_usable_password())
+        self.assertTrue(await SupabaseUserInformations.objects.filter(user=user, sign_in_provider='email').aexists())
+        # The second login finds the user
+        self.assertEqual((await aget_or_create_user('uid_0', 'user@example.com', SupabaseUserInformations, True, 'email')).pk, user.pk)
+
+    def test_user_is_rolled_back_when_informations_fail(self):
+        with self.assertRaises(IntegrityError):
+            get_or_create_user('uid_0', 'user@example.com', BrokenInformations, True, 'email')
+        self.assertFalse(User.objects.filter(username='uid_0').exists())
+
+    async def test_async_user_is_rolled_back_when_informations_fail(self):
+        with self.assertRaises(IntegrityError):
+            await aget_or_create_user('uid_0', 'user@example.com', BrokenInformations, True, 'email')
+        self.assertFalse(await User.objects.filter(username='uid_0').aexists())
+
+
+class UserCacheConfigTests(TestCase):
+    def test_cache_is_built_from_the_validated_settings(self):
+        with mock.patch.object(easily_settings, 'USER_CACHE_CONFIG', UserCacheConfig(ttl=10, local_ttl=5), create=True), \
+                mock.patch.object(users, '_user_cache', None):
+            user_cache = users.get_user_cache()
+            self.assertEqual((user_cache.ttl, user_cache.local.ttl), (10, 5))
+
+    def test_negative_ttl_is_rejected(self):
+        with self.assertRaises(InvalidConfigurationError):
+            UserCacheConfig(ttl=-1)
@@ -0,0 +1,180 @@
+"""
+Stripe webhook events dispatch and deduplication.
+
+Run from a project with `drf_easily_saas` installed:
+    python manage.py test drf_easily_saas.tests.test_webhooks
+"""
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+# Django
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+# Drf Easily Saas
+from drf_easily_saas.exceptions.stripe import StripePaymentProcessingError
+from drf_easily_saas.models import StripeProcessedEventModel, StripeWebhookInboxModel
+from drf_easily_saas.payment.manager import StripeManager
+from drf_easily_saas.payment.stripe.dedup import CLAIM_LEASE
+from drf_easily_saas.payment.stripe import views as stripe_views
+from drf_easily_saas.payment.stripe.inbox import PROCESSING_TIMEOUT, claim_events, process_entry, purge_inbox
+
+
+class RecordingStripeManager(StripeManager):
+    """
+    Manager whose `test.event` handler returns the next queued result (or raises it).
+    """
+    results = []
+    calls = 0
+
+
+@RecordingStripeManager.register_handler('test.event')
+def handle_test_event(manager, event):
+    RecordingStripeManager.calls += 1
+    result = RecordingStripeManager.results.pop(0)
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+
+def event(event_id='evt_0'):
+    return {'id': event_id, 'type': 'test.event', 'data': {'object': {}}}
+
+
+class HandleStripeEventTests(TestCase):
+    def setUp(self):
+        RecordingStripeManager.calls = 0
+        self.manager = RecordingStripeManager()
+
+    def test_succeeded_event_is_skipped_on_redelivery(self):
+        RecordingStripeManager.results = [True]
+        self.assertTrue(self.manager.handle_stripe_event(event()))
+        self.assertIsNone(self.manager.handle_stripe_event(event()))
+        self.assertEqual(RecordingStripeManager.calls, 1)
+        self.assertTrue(StripeProcessedEventModel.objects.filter(id='evt_0').exists())
+
+    def test_handler_returning_none_is_retried(self):
+        RecordingStripeManager.results = [None, True]
+        with self.assertRaises(StripePaymentProcessingError):
+            self.manager.handle_stripe_event(event())
+        self.assertFalse(StripeProcessedEventModel.objects.filter(id='evt_0').exists())
+        # The next delivery runs the handler again
+        self.assertTrue(self.manager.handle_stripe_event(event()))
+        self.assertEqual(RecordingStripeManager.calls, 2)
+
+    def test_handler_raising_is_retried(self):
+        RecordingStripeManager.results = [RuntimeError('Stripe unavailable'), True]
+        with self.assertRaises(RuntimeError):
+            self.manager.handle_stripe_event(event())
+        self.assertFalse(StripeProcessedEventModel.objects.filter(id='evt_0').exists())
+        self.assertTrue(self.manager.handle_stripe_event(event()))
+
+    def test_event_without_handler_is_ignored(self):
+        self.assertIsNone(self.manager.handle_stripe_event({'id': 'evt_1', 'type': 'unknown.event'}))
+        self.assertFalse(StripeProcessedEventModel.objects.exists())
+
+    def test_done_event_is_marked(self):
+        RecordingStripeManager.results = [True]
+        self.manager.handle_stripe_event(event())
+        self.assertEqual(StripeProcessedEventModel.objects.get(id='evt_0').status, StripeProcessedEventModel.Status.DONE)
+
+
+class ClaimLeaseTests(TestCase):
+    def setUp(self):
+        RecordingStripeManager.calls = 0
+        self.manager = RecordingStripeManager()
+
+    def crashed_claim(self, age):
+        # Claim left by a worker killed mid-handler
+        StripeProcessedEventModel.objects.create(id='evt_0', type='test.event', claimed_at=timezone.now() - age)
+
+    def test_expired_claim_is_taken_over(self):
+        self.crashed_claim(CLAIM_LEASE + timedelta(seconds=1))
+        RecordingStripeManager.results = [True]
+        self.assertTrue(self.manager.handle_stripe_event(event()))
+        self.assertEqual(RecordingStripeManager.calls, 1)
+        self.assertEqual(StripeProcessedEventModel.objects.get(id='evt_0').status, StripeProcessedEventModel.Status.DONE)
+
+    def test_live_claim_is_not_acknowledged(self):
+        self.crashed_claim(timedelta(seconds=1))
+        with self.assertRaises(StripePaymentProcessingError):
+            self.manager.handle_stripe_event(event())
+        self.assertEqual(RecordingStripeManager.calls, 0)
+        # The claim is kept for its holder
+        self.assertTrue(StripeProcessedEventModel.objects.filter(id='evt_0').exists())
+
+    def test_reclaimed_inbox_entry_runs_the_handlers(self):
+        stale = timezone.now() - PROCESSING_TIMEOUT - timedelta(seconds=1)
+        StripeWebhookInboxModel.objects.create(
+            id='evt_0', type='test.event', payload=event(), status=StripeWebhookInboxModel.Status.PROCESSING, attempts=1,
+        )
+        StripeWebhookInboxModel.objects.update(updated_at=stale)
+        self.crashed_claim(PROCESSING_TIMEOUT + timedelta(seconds=1))
+
+        RecordingStripeManager.results = [True]
+        [entry] = claim_events()
+        process_entry(entry, self.manager)
+        self.assertEqual(entry.status, StripeWebhookInboxModel.Status.DONE)
+        self.assertEqual(RecordingStripeManager.calls, 1)
+
+
+class ProviderWithoutClaimsTests(TestCase):
+    def test_subscription_deleted_is_acknowledged(self):
+        manager = StripeManager()
+        manager.auth_provider = 'keycloak'
+        created = int(timezone.now().timestamp())
+        subscription = {
+            'id': 'sub_0',
+            'object': 'subscription',
+            'cancel_at_period_end': False,
+            'currency': 'usd',
+            'current_period_start': created,
+            'current_period_end': created + 30 * 86400,
+            'customer': 'cus_0',
+            'default_payment_method': None,
+            'items': {'object': 'list', 'data': []},
+            'metadata': {'uid': 'uid_0'},
+            'status': 'canceled',
+        }
+        deleted = {'id': 'evt_0', 'type': 'customer.subscription.deleted', 'created': created, 'data': {'object': subscription}}
+        self.assertEqual(manager.handle_stripe_event(deleted), subscription)
+        self.assertEqual(StripeProcessedEventModel.objects.get(id='evt_0').status, StripeProcessedEventModel.Status.DONE)
+
+
+class InboxRetentionTests(TestCase):
+    def setUp(self):
+        Status = StripeWebhookInboxModel.Status
+        for event_id, status, age in [
+            ('evt_done_old', Status.DONE, 40),
+            ('evt_dead_old', Status.DEAD, 40),
+            ('evt_retry_old', Status.RETRY, 40),
+            ('evt_pending_old', Status.PENDING, 40),
+            ('evt_done_recent', Status.DONE, 1),
+        ]:
+            StripeWebhookInboxModel.objects.create(id=event_id, type='test.event', payload=event(event_id), status=status)
+            StripeWebhookInboxModel.objects.filter(id=event_id).update(updated_at=timezone.now() - timedelta(days=age))
+
+    def test_purge_terminal_entries_only(self):
+        self.assertEqual(purge_inbox(30), 2)
+        self.assertEqual(
+            set(StripeWebhookInboxModel.objects.values_list('id', flat=True)),
+            {'evt_retry_old', 'evt_pending_old', 'evt_done_recent'},
+        )
+
+    def test_purge_command(self):
+        stdout = StringIO()
+        call_command('purgestripeevents', days=30, stdout=stdout)
+        self.assertIn('2 done and dead-lettered Stripe webhook inbox events purged', stdout.getvalue())
+        self.assertEqual(StripeWebhookInboxModel.objects.count(), 3)
+
+
+class LazyStripeManagerTests(SimpleTestCase):
+    def test_manager_is_built_on_first_use(self):
+        for view_class in [stripe_views.CheckoutView, stripe_views.WebhookView]:
+            with mock.patch.object(stripe_views, 'StripeManager') as manager_class:
+                view = view_class()
+                manager_class.assert_not_called()
+                self.assertIs(view.stripe_manager, view.stripe_manager)
+                manager_class.assert_called_once_with()